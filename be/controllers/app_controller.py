@@ -1,27 +1,150 @@
-from be.utils import k8s_resource_manager
-from be.utils.helpers import get_changes
+from be.utils import ingress_writer, k8s_resource_manager, keyed_executor, operations
+from common.helpers import diff_ports, get_changes, port_flag_changed
+from starlette.concurrency import run_in_threadpool
+from fastapi import HTTPException
+from functools import partial, wraps
+import asyncio
+import logging
 import os
 
+
 group = os.environ.get("CRD_GROUP")
 version = os.environ.get("CRD_VERSION")
-TEMPLATE_DIR = os.environ.get("TEMPLATE_DIR")
+# Maximum number of components of a batch request processed at the same time
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "10"))
+# Maximum number of calls of an application operation (clusters, components) running at the same time
+FANOUT_CONCURRENCY = int(os.environ.get("FANOUT_CONCURRENCY", "20"))
 
 
 # ------------------------------------------------------------ #
-def create_app(spec: dict):
+# The kubernetes client is blocking, so every call runs in the threadpool while the event
+# loop keeps serving other requests. Calls that don't depend on each other are gathered.
+async def _gather(*calls):
+    """
+    Runs the calls concurrently and waits for all of them (so no call is left running
+    in the background), then re-raises the first error if any.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def _fan_out(calls: dict):
+    """
+    Runs the calls ({label: function without arguments}) in the threadpool, at most
+    FANOUT_CONCURRENCY at a time, and waits for all of them. The errors are aggregated in a
+    single HTTPException: the common status code of the errors (500 if they differ), and
+    the error of each failed call as detail.
+    """
+    semaphore = asyncio.Semaphore(FANOUT_CONCURRENCY)
+
+    async def run(call):
+        async with semaphore:
+            return await run_in_threadpool(call)
+
+    labels = list(calls)
+    results = await asyncio.gather(
+        *[run(calls[label]) for label in labels], return_exceptions=True
+    )
+    errors = []
+    for label, result in zip(labels, results):
+        if isinstance(result, HTTPException):
+            errors.append(
+                {
+                    "call": label,
+                    "status_code": result.status_code,
+                    "detail": result.detail,
+                }
+            )
+        elif isinstance(result, BaseException):
+            logging.error(f"Error: [{label}] {result!r}")
+            errors.append(
+                {"call": label, "status_code": 500, "detail": "Internal Server Error"}
+            )
+    if errors:
+        status_codes = {error["status_code"] for error in errors}
+        raise HTTPException(
+            status_code=status_codes.pop() if len(status_codes) == 1 else 500,
+            detail={"errors": errors},
+        )
+    return results
+
+
+# ------------------------------------------------------------ #
+# The operations of the same application run one after the other, in arrival order, so
+# that they never read-modify-write its objects (ingress ...) at the same time. Different
+# applications run in parallel, at most APP_CONCURRENCY at a time, see keyed_executor.
+def _per_application(key_of):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await keyed_executor.executor.run(
+                key_of(*args, **kwargs), func, *args, **kwargs
+            )
+
+        # Used by the operations run in the background, see operations
+        wrapper.key_of = key_of
+        return wrapper
+
+    return decorator
+
+
+def _app_of_app(spec, *_, **__):
+    return spec["name"]
+
+
+def _app_of_comp(spec, *_, **__):
+    return spec["application"]
+
+
+def _app_name(app_name, *_, **__):
+    return app_name
+
+
+async def _get_app_cluster_client(spec: dict):
+    app_cluster, _ = await run_in_threadpool(
+        k8s_resource_manager.get_app_and_comp_cluster,
+        app_name=spec["application"],
+        component_name=spec["name"],
+        management_cluster_client=await run_in_threadpool(
+            k8s_resource_manager.get_cluster_client
+        ),
+    )
+    return await run_in_threadpool(
+        k8s_resource_manager.get_cluster_client, cluster=app_cluster
+    )
+
+
+# ------------------------------------------------------------ #
+@_per_application(_app_of_app)
+async def create_app(spec: dict):
     # Retireving application cluster and application name from the body
     app_cluster = spec["cluster"]
     app_name = spec["name"]
 
-    # Get the context of the app_cluster
-    app_cluster_context = k8s_resource_manager.get_context(cluster=app_cluster)
-    # Create namesapce in the app_cluster
-    k8s_resource_manager.create_namespace(
-        namespace_name=app_name, app_cluster_context=app_cluster_context
+    # Get the clients of the app_cluster and the management cluster
+    app_cluster_client = await run_in_threadpool(
+        k8s_resource_manager.get_cluster_client, cluster=app_cluster
     )
-    # Create namesapce in the management cluster
-    k8s_resource_manager.create_namespace(
-        namespace_name=app_name, app_cluster_context=None
+    management_cluster_client = await run_in_threadpool(
+        k8s_resource_manager.get_cluster_client
+    )
+    # Create the namespace in the app_cluster and in the management cluster at the same time
+    await _fan_out(
+        {
+            f"create_namespace [{app_cluster}]": partial(
+                k8s_resource_manager.create_namespace,
+                namespace_name=app_name,
+                app_cluster_client=app_cluster_client,
+            ),
+            "create_namespace [management cluster]": partial(
+                k8s_resource_manager.create_namespace,
+                namespace_name=app_name,
+                app_cluster_client=management_cluster_client,
+            ),
+        }
     )
     # Linking between the app_cluster and the components clusters
     components_list = spec["components"]
@@ -37,32 +160,47 @@ def create_app(spec: dict):
             pass
 
 
-def delete_app(spec: dict):
+@_per_application(_app_of_app)
+async def delete_app(spec: dict):
     # Retireving application cluster and application name from the body
     app_name = spec["name"]
     app_cluster = spec["cluster"]
+    management_cluster_client = await run_in_threadpool(
+        k8s_resource_manager.get_cluster_client
+    )
 
-    for component in spec["components"]:
-        # Delete the component CRD from the management cluster
-        k8s_resource_manager.delete_component(
-            component_name=component["name"], app_name=app_name
-        )
+    # Delete the component CRDs from the management cluster, all in one request
+    await run_in_threadpool(
+        k8s_resource_manager.delete_components,
+        app_name=app_name,
+        management_cluster_client=management_cluster_client,
+    )
     # TODO: .......
     # Deleting the namespace
 
-    # Get the context of the app_cluster
-    app_cluster_context = k8s_resource_manager.get_context(cluster=app_cluster)
-    # Delete the namespace from the management cluster
-    k8s_resource_manager.delete_namespace(
-        namespace_name=app_name, app_cluster_context=None
+    # Get the client of the app_cluster
+    app_cluster_client = await run_in_threadpool(
+        k8s_resource_manager.get_cluster_client, cluster=app_cluster
     )
-    # Delete the namespace from the app_cluster
-    k8s_resource_manager.delete_namespace(
-        namespace_name=app_name, app_cluster_context=app_cluster_context
+    # Delete the namespace from the management cluster and from the app_cluster at the same time
+    await _fan_out(
+        {
+            "delete_namespace [management cluster]": partial(
+                k8s_resource_manager.delete_namespace,
+                namespace_name=app_name,
+                app_cluster_client=management_cluster_client,
+            ),
+            f"delete_namespace [{app_cluster}]": partial(
+                k8s_resource_manager.delete_namespace,
+                namespace_name=app_name,
+                app_cluster_client=app_cluster_client,
+            ),
+        }
     )
 
 
-def update_app(spec: dict, old: list, new: list):
+@_per_application(_app_of_app)
+async def update_app(spec: dict, old: list, new: list):
     added_components, removed_components, migrated_components = get_changes(old, new)
 
     # New components added to the application
@@ -77,11 +215,21 @@ def update_app(spec: dict, old: list, new: list):
 
     # Some components removed from the application
     # Here we have to delete the component, and un-offload the namespace and unpeer the clusters if this is not already done
-    for component in removed_components:
-        # Delete the component
-        k8s_resource_manager.delete_component(
-            component_name=component["name"], app_name=spec["name"]
-        )
+    management_cluster_client = await run_in_threadpool(
+        k8s_resource_manager.get_cluster_client
+    )
+    # Delete the components, at the same time
+    await _fan_out(
+        {
+            f"delete_component [{component['name']}]": partial(
+                k8s_resource_manager.delete_component,
+                component_name=component["name"],
+                app_name=spec["name"],
+                management_cluster_client=management_cluster_client,
+            )
+            for component in removed_components
+        }
+    )
 
     # TODO: unpeer and un-offload the namespace if it's not needed by the current or another application (removed component)
 
@@ -92,27 +240,39 @@ def update_app(spec: dict, old: list, new: list):
 
 
 # ------------------------------------------------------------ #
-def create_comp(spec: dict):
-    # get context
-    app_cluster, _ = k8s_resource_manager.get_app_and_comp_cluster(
-        app_name=spec["application"], component_name=spec["name"]
-    )
-    app_cluster_context = k8s_resource_manager.get_context(cluster=app_cluster)
-    application = spec["application"]
+@_per_application(_app_of_comp)
+async def create_comp(spec: dict):
+    # get the client of the app_cluster
+    app_cluster_client = await _get_app_cluster_client(spec)
+    await _create_comp(spec, app_cluster_client)
+
+
+async def _create_comp(spec: dict, app_cluster_client):
+    # The deployment, service, servicemonitor and ingress don't depend on each other,
+    # so they are all applied at the same time.
+    calls = []
+
     # apply the deployment
-    k8s_resource_manager.apply_deployment(
-        component=spec, app_cluster_context=app_cluster_context
+    calls.append(
+        run_in_threadpool(
+            k8s_resource_manager.apply_deployment,
+            component=spec,
+            app_cluster_client=app_cluster_client,
+        )
     )
 
     # Applying service
     # First, we need to filter only the ports where "is-peered" is set to True (is-peered=True)
     peered_ports = [port for port in spec["expose"] if port["is-peered"] == True]
     if len(peered_ports):
-        k8s_resource_manager.apply_service(
-            component_name=spec["name"],
-            app_name=spec["application"],
-            app_cluster_context=app_cluster_context,
-            ports_list=peered_ports,
+        calls.append(
+            run_in_threadpool(
+                k8s_resource_manager.apply_service,
+                component_name=spec["name"],
+                app_name=spec["application"],
+                app_cluster_client=app_cluster_client,
+                ports_list=peered_ports,
+            )
         )
 
     # Applying ServiceMonitor
@@ -121,41 +281,53 @@ def create_comp(spec: dict):
         item for item in spec["expose"] if item["is-exposing-metrics"] == True
     ]
     if len(exposing_metrics_ports):
-        k8s_resource_manager.apply_servicemonitor(
-            app_name=spec["application"],
-            app_cluster_context=app_cluster_context,
-            component_name=spec["name"],
-            ports_list=exposing_metrics_ports,
+        calls.append(
+            run_in_threadpool(
+                k8s_resource_manager.apply_servicemonitor,
+                app_name=spec["application"],
+                app_cluster_client=app_cluster_client,
+                component_name=spec["name"],
+                ports_list=exposing_metrics_ports,
+            )
         )
 
     # Ingress
     for exp in spec["expose"]:
         if exp["is-public"] == True:
-            k8s_resource_manager.add_host_to_ingress(
-                app_name=spec["application"],
-                app_cluster_context=app_cluster_context,
-                component_name=spec["name"],
-                port=exp["clusterPort"],
+            calls.append(
+                run_in_threadpool(
+                    k8s_resource_manager.add_host_to_ingress,
+                    app_name=spec["application"],
+                    app_cluster_client=app_cluster_client,
+                    component_name=spec["name"],
+                    port=exp["clusterPort"],
+                )
             )
 
             # Break because is-public could be true only once. [see validation admission webhook]
             break
 
+    await _gather(*calls)
 
-def delete_comp(spec):
-    # get context
-    app_cluster, _ = k8s_resource_manager.get_app_and_comp_cluster(
-        app_name=spec["application"], component_name=spec["name"]
-    )
-    app_cluster_context = k8s_resource_manager.get_context(cluster=app_cluster)
 
-    #
+@_per_application(_app_of_comp)
+async def delete_comp(spec):
+    # get the client of the app_cluster
+    app_cluster_client = await _get_app_cluster_client(spec)
+    await _delete_comp(spec, app_cluster_client)
+
+
+async def _delete_comp(spec: dict, app_cluster_client):
     application = spec["application"]
+    calls = []
     # delete the deployment
-    k8s_resource_manager.delete_deployment(
-        component_name=spec["name"],
-        app_name=application,
-        app_cluster_context=app_cluster_context,
+    calls.append(
+        run_in_threadpool(
+            k8s_resource_manager.delete_deployment,
+            component_name=spec["name"],
+            app_name=application,
+            app_cluster_client=app_cluster_client,
+        )
     )
 
     # Deleting services, servicemonitors, ingresses ...
@@ -163,10 +335,13 @@ def delete_comp(spec):
         # Delete service
         for exp in spec["expose"]:
             if exp["is-peered"] == True:
-                k8s_resource_manager.delete_service(
-                    component_name=spec["name"],
-                    app_name=spec["application"],
-                    app_cluster_context=app_cluster_context,
+                calls.append(
+                    run_in_threadpool(
+                        k8s_resource_manager.delete_service,
+                        component_name=spec["name"],
+                        app_name=spec["application"],
+                        app_cluster_client=app_cluster_client,
+                    )
                 )
                 # Break since we have only one service for each component
                 break
@@ -174,10 +349,13 @@ def delete_comp(spec):
         # Delete ServiceMonitor
         for exp in spec["expose"]:
             if exp["is-exposing-metrics"] == True:
-                k8s_resource_manager.delete_servicemonitor(
-                    component_name=spec["name"],
-                    app_name=spec["application"],
-                    app_cluster_context=app_cluster_context,
+                calls.append(
+                    run_in_threadpool(
+                        k8s_resource_manager.delete_servicemonitor,
+                        component_name=spec["name"],
+                        app_name=spec["application"],
+                        app_cluster_client=app_cluster_client,
+                    )
                 )
                 # Break since we have only one ServiceMonitor for each component
                 break
@@ -185,61 +363,82 @@ def delete_comp(spec):
         # Ingress
         for exp in spec["expose"]:
             if exp["is-public"] == True:
-                k8s_resource_manager.remove_host_from_ingress(
-                    app_name=spec["application"],
-                    component_name=spec["name"],
-                    app_cluster_context=app_cluster_context,
+                calls.append(
+                    run_in_threadpool(
+                        k8s_resource_manager.remove_host_from_ingress,
+                        app_name=spec["application"],
+                        component_name=spec["name"],
+                        app_cluster_client=app_cluster_client,
+                    )
                 )
                 break
 
+    await _gather(*calls)
 
-def update_comp_deployment(spec: dict):
-    # get context
-    app_cluster, _ = k8s_resource_manager.get_app_and_comp_cluster(
-        app_name=spec["application"], component_name=spec["name"]
-    )
-    app_cluster_context = k8s_resource_manager.get_context(cluster=app_cluster)
-    # Re-apply the deployment
-    k8s_resource_manager.apply_deployment(
-        component=spec, app_cluster_context=app_cluster_context, update=True
-    )
+
+@_per_application(_app_of_comp)
+async def update_comp_deployment(spec: dict):
+    # get the client of the app_cluster
+    app_cluster_client = await _get_app_cluster_client(spec)
+    return await _update_comp_deployment(spec, app_cluster_client)
 
 
-def update_comp_expose_field(spec: dict, old: list, new: list):
-    # get context
-    app_cluster, _ = k8s_resource_manager.get_app_and_comp_cluster(
-        app_name=spec["application"], component_name=spec["name"]
+async def _update_comp_deployment(spec: dict, app_cluster_client):
+    # Re-apply the deployment ("unchanged" when the live deployment already matches the spec)
+    result = await run_in_threadpool(
+        k8s_resource_manager.apply_deployment,
+        component=spec,
+        app_cluster_client=app_cluster_client,
     )
-    app_cluster_context = k8s_resource_manager.get_context(cluster=app_cluster)
+    return {"status": result}
+
+
+@_per_application(_app_of_comp)
+async def update_comp_expose_field(spec: dict, old: list, new: list):
+    # get the client of the app_cluster
+    app_cluster_client = await _get_app_cluster_client(spec)
+    await _update_comp_expose_field(spec, old, new, app_cluster_client)
+
+
+async def _update_comp_expose_field(
+    spec: dict, old: list, new: list, app_cluster_client
+):
     # Update
     component_name = spec["name"]
     application = spec["application"]
+    # The service, servicemonitor and ingress updates are independent, they run at the same time.
+    calls = []
+    # Only the resources whose ports changed are re-applied (ports matched by containerPort)
+    ports_diff = diff_ports(old, new)
     # ------------- UPDATE SERVICE -------------#
     # filter only the ports where "is-peered" is set to True (is-peered=True)
     peered_ports = [port for port in new if port["is-peered"] == True]
     old_peered_ports = [port for port in old if port["is-peered"] == True]
     if len(peered_ports):
-        if len(old_peered_ports):
-            update = True
-        else:
-            update = False
-        k8s_resource_manager.apply_service(
-            component_name=component_name,
-            app_name=application,
-            app_cluster_context=app_cluster_context,
-            ports_list=peered_ports,
-            update=update,
-        )
+        # Applied whether the service existed or not, if the peered ports changed
+        if port_flag_changed(ports_diff, "is-peered"):
+            calls.append(
+                run_in_threadpool(
+                    k8s_resource_manager.apply_service,
+                    component_name=component_name,
+                    app_name=application,
+                    app_cluster_client=app_cluster_client,
+                    ports_list=peered_ports,
+                )
+            )
 
     else:
         # len(peered_ports) = 0 => no port is peered => DELETE the service if it was existing before.
         # Check whether the service was created before
         if len(old_peered_ports):
             # Delete the service
-            k8s_resource_manager.delete_service(
-                component_name=component_name,
-                app_name=application,
-                app_cluster_context=app_cluster_context,
+            calls.append(
+                run_in_threadpool(
+                    k8s_resource_manager.delete_service,
+                    component_name=component_name,
+                    app_name=application,
+                    app_cluster_client=app_cluster_client,
+                )
             )
 
     # ------------- UPDATE SERVICEMONITOR -------------#
@@ -251,26 +450,28 @@ def update_comp_expose_field(spec: dict, old: list, new: list):
         port for port in old if port["is-exposing-metrics"] == True
     ]
     if len(exposing_metrics_ports):
-        if len(old_exposing_metrics_ports):
-            update = True
-        else:
-            update = False
-        # Re-aplly the ServiceMonitor
-        k8s_resource_manager.apply_servicemonitor(
-            app_name=application,
-            app_cluster_context=app_cluster_context,
-            component_name=component_name,
-            ports_list=exposing_metrics_ports,
-            update=update,
-        )
+        # Re-aplly the ServiceMonitor, if the ports exposing metrics changed
+        if port_flag_changed(ports_diff, "is-exposing-metrics"):
+            calls.append(
+                run_in_threadpool(
+                    k8s_resource_manager.apply_servicemonitor,
+                    app_name=application,
+                    app_cluster_client=app_cluster_client,
+                    component_name=component_name,
+                    ports_list=exposing_metrics_ports,
+                )
+            )
 
     else:
         if len(old_exposing_metrics_ports):
             # Delete the ServiceMonitor
-            k8s_resource_manager.delete_servicemonitor(
-                component_name=component_name,
-                app_name=application,
-                app_cluster_context=app_cluster_context,
+            calls.append(
+                run_in_threadpool(
+                    k8s_resource_manager.delete_servicemonitor,
+                    component_name=component_name,
+                    app_name=application,
+                    app_cluster_client=app_cluster_client,
+                )
             )
 
     # ------------- UPDATE INGRESS -------------#
@@ -290,19 +491,25 @@ def update_comp_expose_field(spec: dict, old: list, new: list):
 
     # The component was not public, and updated to be public
     if new_public_port is not None and old_public_port is None:
-        k8s_resource_manager.add_host_to_ingress(
-            app_name=application,
-            app_cluster_context=app_cluster_context,
-            component_name=component_name,
-            port=new_public_port["clusterPort"],
+        calls.append(
+            run_in_threadpool(
+                k8s_resource_manager.add_host_to_ingress,
+                app_name=application,
+                app_cluster_client=app_cluster_client,
+                component_name=component_name,
+                port=new_public_port["clusterPort"],
+            )
         )
 
     # The component was public, and updated to be not public
     if new_public_port is None and old_public_port is not None:
-        k8s_resource_manager.remove_host_from_ingress(
-            app_name=application,
-            app_cluster_context=app_cluster_context,
-            component_name=component_name,
+        calls.append(
+            run_in_threadpool(
+                k8s_resource_manager.remove_host_from_ingress,
+                app_name=application,
+                app_cluster_client=app_cluster_client,
+                component_name=component_name,
+            )
         )
 
     # The port updated
@@ -311,9 +518,191 @@ def update_comp_expose_field(spec: dict, old: list, new: list):
         and old_public_port is not None
         and new_public_port["clusterPort"] != old_public_port["clusterPort"]
     ):
-        k8s_resource_manager.update_host_in_ingress(
-            app_name=application,
-            app_cluster_context=app_cluster_context,
+        calls.append(
+            run_in_threadpool(
+                k8s_resource_manager.update_host_in_ingress,
+                app_name=application,
+                app_cluster_client=app_cluster_client,
+                component_name=component_name,
+                new_port=new_public_port["clusterPort"],
+            )
+        )
+
+    await _gather(*calls)
+
+
+# ------------------------------------------------------------ #
+# Batch requests: the clusters of the application are resolved once for all the components,
+# then the components are processed concurrently (at most BATCH_CONCURRENCY at a time).
+# The ingress hosts of the components are merged into one write by the ingress_writer.
+async def _run_batch(app_name: str, items: list, spec_of, action, status_code: int):
+    """
+    Runs action(item, app_cluster_client) for every item of the batch and returns one result
+    per item (in the same order): {"name", "status_code", "detail"}.
+    A failing item doesn't stop the others.
+    """
+    if not items:
+        return {"results": []}
+
+    try:
+        # The application cluster doesn't depend on the component
+        app_cluster_client = await _get_app_cluster_client(
+            {"application": app_name, "name": spec_of(items[0]).get("name")}
+        )
+    except HTTPException as e:
+        # Nothing can be done without the application cluster: every item fails the same way
+        return {
+            "results": [
+                {
+                    "name": spec_of(item).get("name"),
+                    "status_code": e.status_code,
+                    "detail": e.detail,
+                }
+                for item in items
+            ]
+        }
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(item):
+        spec = spec_of(item)
+        result = {"name": spec.get("name"), "status_code": status_code, "detail": None}
+        if spec.get("application") != app_name:
+            result["status_code"] = 400
+            result["detail"] = f"component doesn't belong to the application {app_name}"
+            return result
+        async with semaphore:
+            try:
+                result["detail"] = await action(item, app_cluster_client)
+            except HTTPException as e:
+                result["status_code"] = e.status_code
+                result["detail"] = e.detail
+            except Exception as e:
+                logging.error(f"Error: batch [{spec.get('name')}] {e!r}")
+                result["status_code"] = 500
+                result["detail"] = "Internal Server Error"
+        return result
+
+    # The ingress hosts of the components are written together once they are all processed
+    async with ingress_writer.coalescing() as collector:
+        results = await asyncio.gather(*[run(item) for item in items])
+    failures = collector.failures()
+    for result in results:
+        if result["name"] in failures and result["status_code"] < 400:
+            result["status_code"] = failures[result["name"]]
+            result["detail"] = "ingress not updated"
+    return {"results": results}
+
+
+@_per_application(_app_name)
+async def create_comps(app_name: str, specs: list):
+    return await _run_batch(
+        app_name,
+        specs,
+        spec_of=lambda spec: spec,
+        action=_create_comp,
+        status_code=201,
+    )
+
+
+@_per_application(_app_name)
+async def delete_comps(app_name: str, specs: list):
+    return await _run_batch(
+        app_name,
+        specs,
+        spec_of=lambda spec: spec,
+        action=_delete_comp,
+        status_code=204,
+    )
+
+
+@_per_application(_app_name)
+async def update_comps(app_name: str, items: list):
+    """
+    Each item is {"spec": ..., "old": [...], "new": [...]}: the deployment is re-applied
+    (no-op if unchanged), and the expose field is updated when old and new are given.
+    """
+
+    async def update(item, app_cluster_client):
+        spec = item["spec"]
+        calls = [_update_comp_deployment(spec, app_cluster_client)]
+        if "old" in item and "new" in item:
+            calls.append(
+                _update_comp_expose_field(
+                    spec, item["old"], item["new"], app_cluster_client
+                )
+            )
+        results = await _gather(*calls)
+        return results[0]
+
+    return await _run_batch(
+        app_name,
+        items,
+        spec_of=lambda item: item["spec"],
+        action=update,
+        status_code=200,
+    )
+
+
+# ------------------------------------------------------------ #
+# Asynchronous mode (202 + operation id, see operations): the outcome of the operations
+# on components is written to the Component objects (status.component_watch).
+COMPONENT_PENDING = "Pending"
+COMPONENT_RUNNING = "Running"
+COMPONENT_FAILED = "Failed"
+
+
+async def _write_component_status(
+    app_name: str, component_name: str, current_status: str, details: str = ""
+):
+    try:
+        management_cluster_client = await run_in_threadpool(
+            k8s_resource_manager.get_cluster_client
+        )
+        await run_in_threadpool(
+            k8s_resource_manager.set_component_status,
+            app_name=app_name,
             component_name=component_name,
-            new_port=new_public_port["clusterPort"],
+            current_status=current_status,
+            details=details,
+            management_cluster_client=management_cluster_client,
+        )
+    except HTTPException as e:
+        # The status is informative, the operation keeps its own outcome
+        logging.error(
+            f"Error: [status of component {app_name}/{component_name}] {e.status_code}"
+        )
+
+
+def component_status_reporter(app_name: str, component_names: list):
+    """
+    Returns the on_update callback of an operation on the given components: Pending when
+    accepted, then Running or Failed (with the error) for each component.
+    """
+
+    async def report(operation):
+        if not operation.done:
+            statuses = {
+                name: (COMPONENT_PENDING, f"operation {operation.id}")
+                for name in component_names
+            }
+        elif operation.state == operations.FAILED:
+            details = f"{operation.status_code}: {operation.error}"
+            statuses = {name: (COMPONENT_FAILED, details) for name in component_names}
+        else:
+            statuses = {name: (COMPONENT_RUNNING, "") for name in component_names}
+            # Batch: one result per component
+            result = operation.result
+            results = result.get("results") if isinstance(result, dict) else None
+            for item in results or []:
+                if item["status_code"] >= 400:
+                    details = f"{item['status_code']}: {item['detail']}"
+                    statuses[item["name"]] = (COMPONENT_FAILED, details)
+        await _gather(
+            *[
+                _write_component_status(app_name, name, current_status, details)
+                for name, (current_status, details) in statuses.items()
+            ]
         )
+
+    return report
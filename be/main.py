@@ -1,6 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from be.routes.app_routes import router
+from be.utils import metrics
+from common import tracing
+
 
 app = FastAPI()
 
 app.include_router(router, prefix="/api/v1")
+app.add_middleware(metrics.MetricsMiddleware)
+# Outermost: its span covers the whole request, see the Server-Timing header
+app.add_middleware(tracing.TracingMiddleware)
+
+
+# Scraped by prometheus (ServiceMonitor), outside of the versioned api
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Collected in the event loop, which is needed to read the state of the threadpool
+    data, content_type = metrics.render()
+    return Response(content=data, headers={"Content-Type": content_type})
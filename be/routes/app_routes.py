@@ -1,70 +1,275 @@
-from fastapi import APIRouter, Body, status
+from fastapi import APIRouter, Body, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from be.controllers import app_controller
+from be.utils import content_hash, crd_cache, ingress_cache, ingress_writer, operations
+from be.utils.keyed_executor import executor
+from be.utils.k8s_client_pool import pool
 import logging
 
+
 router = APIRouter()
 log = logging.getLogger(__name__)
 
 
+# -------------------------------------------------------------------- #
+# Asynchronous mode: with "Prefer: respond-async" (or ASYNC_OPERATIONS=true) the mutating
+# routes answer 202 + the operation right away, and the work is done in the background.
+# The operation is polled at /operations/{operation_id} (Location header).
+def _is_async(request: Request) -> bool:
+    return operations.wants_async(request.headers.get("prefer"))
+
+
+def _accepted(
+    request: Request,
+    func,
+    kwargs: dict,
+    status_code: int,
+    target: dict,
+    on_update=None,
+) -> JSONResponse:
+    operation = operations.store.submit(
+        func.__name__,
+        func,
+        kwargs,
+        status_code=status_code,
+        target=target,
+        on_update=on_update,
+    )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=operation.to_dict(),
+        headers={
+            "Location": str(
+                request.url_for("get_operation", operation_id=operation.id)
+            ),
+            "Preference-Applied": "respond-async",
+        },
+    )
+
+
+def _comp_reporter(spec: dict):
+    return app_controller.component_status_reporter(spec["application"], [spec["name"]])
+
+
+def _batch_reporter(app_name: str, specs: list):
+    return app_controller.component_status_reporter(
+        app_name, [spec.get("name") for spec in specs]
+    )
+
+
 # -------------------------------------------------------------------- #
 @router.post("/apps", status_code=status.HTTP_201_CREATED, tags=["Apps"])
-def create_app(
+async def create_app(
+    request: Request,
     spec: dict = Body(...),
 ):
     logging.info("/apps POST")
-    return app_controller.create_app(spec=spec)
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.create_app,
+            {"spec": spec},
+            status_code=status.HTTP_201_CREATED,
+            target={"application": spec["name"]},
+        )
+    return await app_controller.create_app(spec=spec)
 
 
 @router.delete(
     "/apps/{app_name}", status_code=status.HTTP_204_NO_CONTENT, tags=["Apps"]
 )
-def delete_app(
+async def delete_app(
+    request: Request,
     app_name: str,
     spec: dict = Body(...),
 ):
     logging.info(f"/apps/{app_name} DELETE")
-    return app_controller.delete_app(spec=spec)
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.delete_app,
+            {"spec": spec},
+            status_code=status.HTTP_204_NO_CONTENT,
+            target={"application": app_name},
+        )
+    return await app_controller.delete_app(spec=spec)
 
 
 @router.put("/apps/{app_name}", status_code=status.HTTP_200_OK, tags=["Apps"])
-def update_app(
-    app_name: str, spec: dict = Body(...), old: list = Body(...), new: list = Body(...)
+async def update_app(
+    request: Request,
+    app_name: str,
+    spec: dict = Body(...),
+    old: list = Body(...),
+    new: list = Body(...),
 ):
     logging.info(f"/apps/{app_name} PUT")
-    return app_controller.update_app(spec=spec, old=old, new=new)
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.update_app,
+            {"spec": spec, "old": old, "new": new},
+            status_code=status.HTTP_200_OK,
+            target={"application": app_name},
+        )
+    return await app_controller.update_app(spec=spec, old=old, new=new)
 
 
 # -------------------------------------------------------------------- #
 @router.post("/comps", status_code=status.HTTP_201_CREATED, tags=["Comps"])
-def create_comp(
+async def create_comp(
+    request: Request,
     spec: dict = Body(...),
 ):
     logging.info("/comps POST")
-    return app_controller.create_comp(spec=spec)
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.create_comp,
+            {"spec": spec},
+            status_code=status.HTTP_201_CREATED,
+            target={"application": spec["application"], "component": spec["name"]},
+            on_update=_comp_reporter(spec),
+        )
+    return await app_controller.create_comp(spec=spec)
 
 
 @router.delete(
     "/comps/{comp_name}", status_code=status.HTTP_204_NO_CONTENT, tags=["Comps"]
 )
-def delete_comp(
+async def delete_comp(
+    request: Request,
     comp_name: str,
     spec: dict = Body(...),
 ):
     logging.info(f"/comps/{comp_name} DELETE")
-    return app_controller.delete_comp(spec=spec)
+    if _is_async(request):
+        # No status: the Component object is being deleted
+        return _accepted(
+            request,
+            app_controller.delete_comp,
+            {"spec": spec},
+            status_code=status.HTTP_204_NO_CONTENT,
+            target={"application": spec["application"], "component": comp_name},
+        )
+    return await app_controller.delete_comp(spec=spec)
 
 
 @router.put(
     "/comps/{comp_name}/deployment", status_code=status.HTTP_200_OK, tags=["Comps"]
 )
-def update_comp_deployment(comp_name: str, spec: dict = Body(...)):
+async def update_comp_deployment(
+    request: Request, comp_name: str, spec: dict = Body(...)
+):
     logging.info(f"/comps/{comp_name}/deployment PUT")
-    return app_controller.update_comp_deployment(spec=spec)
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.update_comp_deployment,
+            {"spec": spec},
+            status_code=status.HTTP_200_OK,
+            target={"application": spec["application"], "component": comp_name},
+            on_update=_comp_reporter(spec),
+        )
+    return await app_controller.update_comp_deployment(spec=spec)
 
 
 @router.put("/comps/{comp_name}/expose", status_code=status.HTTP_200_OK, tags=["Comps"])
-def update_comp_expose_field(
-    comp_name: str, spec: dict = Body(...), old: list = Body(...), new: list = Body(...)
+async def update_comp_expose_field(
+    request: Request,
+    comp_name: str,
+    spec: dict = Body(...),
+    old: list = Body(...),
+    new: list = Body(...),
 ):
     logging.info(f"/comps/{comp_name}/expose PUT")
-    return app_controller.update_comp_expose_field(spec=spec, old=old, new=new)
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.update_comp_expose_field,
+            {"spec": spec, "old": old, "new": new},
+            status_code=status.HTTP_200_OK,
+            target={"application": spec["application"], "component": comp_name},
+            on_update=_comp_reporter(spec),
+        )
+    return await app_controller.update_comp_expose_field(spec=spec, old=old, new=new)
+
+
+# -------------------------------------------------------------------- #
+# Batch endpoints: many components of the same application in one request.
+# The response holds one result per component: {"name", "status_code", "detail"}.
+@router.post(
+    "/apps/{app_name}/comps:batch", status_code=status.HTTP_200_OK, tags=["Comps"]
+)
+async def create_comps(request: Request, app_name: str, specs: list = Body(...)):
+    logging.info(f"/apps/{app_name}/comps:batch POST [{len(specs)}]")
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.create_comps,
+            {"app_name": app_name, "specs": specs},
+            status_code=status.HTTP_200_OK,
+            target={"application": app_name, "components": len(specs)},
+            on_update=_batch_reporter(app_name, specs),
+        )
+    return await app_controller.create_comps(app_name=app_name, specs=specs)
+
+
+@router.put(
+    "/apps/{app_name}/comps:batch", status_code=status.HTTP_200_OK, tags=["Comps"]
+)
+async def update_comps(request: Request, app_name: str, items: list = Body(...)):
+    logging.info(f"/apps/{app_name}/comps:batch PUT [{len(items)}]")
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.update_comps,
+            {"app_name": app_name, "items": items},
+            status_code=status.HTTP_200_OK,
+            target={"application": app_name, "components": len(items)},
+            on_update=_batch_reporter(app_name, [item["spec"] for item in items]),
+        )
+    return await app_controller.update_comps(app_name=app_name, items=items)
+
+
+@router.delete(
+    "/apps/{app_name}/comps:batch", status_code=status.HTTP_200_OK, tags=["Comps"]
+)
+async def delete_comps(request: Request, app_name: str, specs: list = Body(...)):
+    logging.info(f"/apps/{app_name}/comps:batch DELETE [{len(specs)}]")
+    if _is_async(request):
+        return _accepted(
+            request,
+            app_controller.delete_comps,
+            {"app_name": app_name, "specs": specs},
+            status_code=status.HTTP_200_OK,
+            target={"application": app_name, "components": len(specs)},
+        )
+    return await app_controller.delete_comps(app_name=app_name, specs=specs)
+
+
+# -------------------------------------------------------------------- #
+@router.get(
+    "/operations/{operation_id}", status_code=status.HTTP_200_OK, tags=["Operations"]
+)
+async def get_operation(operation_id: str):
+    # State, steps done so far and outcome of an operation accepted with 202
+    operation = operations.store.get(operation_id)
+    if operation is None:
+        raise HTTPException(status_code=404, detail="operation not found")
+    return operation.to_dict()
+
+
+# -------------------------------------------------------------------- #
+@router.get("/status", status_code=status.HTTP_200_OK, tags=["Status"])
+async def get_status():
+    # Sync state and counters of the caches kept by the backend
+    return {
+        "client_pool": pool.stats(),
+        "ingress_writer": ingress_writer.writer.stats(),
+        "ingress_cache": ingress_cache.cache.stats(),
+        "crd_cache": crd_cache.cache.stats(),
+        "content_hash": content_hash.cache.stats(),
+        "app_executor": executor.stats(),
+        "operations": operations.store.stats(),
+    }
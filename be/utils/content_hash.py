@@ -0,0 +1,82 @@
+import threading
+import hashlib
+import json
+import time
+import os
+
+
+ANNOTATION = "miro.onesource.pt/content-hash"
+# Seconds during which the last applied hash of an object is kept (it spares reading the
+# live object when the manifest changed)
+CONTENT_HASH_TTL = float(os.environ.get("CONTENT_HASH_TTL", "300"))
+
+
+def stamp(body: dict) -> str:
+    """
+    Computes the hash of the manifest and stores it in its content-hash annotation.
+    """
+    digest = hashlib.sha256(
+        json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+    annotations = body["metadata"].setdefault("annotations", {})
+    annotations[ANNOTATION] = digest
+    return digest
+
+
+def read(obj: dict) -> str | None:
+    return ((obj.get("metadata") or {}).get("annotations") or {}).get(ANNOTATION)
+
+
+class HashCache:
+    """
+    Last hash applied for each object: (context, plural, namespace, name) -> hash.
+    Only a hint: the object may have been edited or deleted since (kubectl, namespace
+    deleted ...), so a hash equal to the new one is confirmed with the live object.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hashes: dict[tuple, tuple[str, float]] = {}
+        self.unchanged = 0
+        self.applied = 0
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            entry = self._hashes.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def set(self, key: tuple, digest: str):
+        with self._lock:
+            self._hashes[key] = (digest, time.monotonic())
+
+    def forget(self, key: tuple):
+        with self._lock:
+            self._hashes.pop(key, None)
+
+    def forget_namespace(self, context: str | None, namespace: str):
+        with self._lock:
+            for key in [
+                key for key in self._hashes if key[0] == context and key[2] == namespace
+            ]:
+                del self._hashes[key]
+
+    def count(self, changed: bool):
+        with self._lock:
+            if changed:
+                self.applied += 1
+            else:
+                self.unchanged += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._hashes),
+                "applied": self.applied,
+                "unchanged": self.unchanged,
+            }
+
+
+cache = HashCache(ttl=CONTENT_HASH_TTL)
@@ -0,0 +1,103 @@
+from be.utils.k8s_client_pool import ClusterClient
+from be.utils.informer import Informer
+import threading
+import os
+
+
+group = os.environ.get("CRD_GROUP")
+version = os.environ.get("CRD_VERSION")
+CRD_CACHE_ENABLED = os.environ.get("CRD_CACHE_ENABLED", "true") == "true"
+
+
+class ApplicationInformer(Informer):
+    """
+    Watches the Application CRs (default namespace) of the management cluster and indexes
+    them as: app -> (app_cluster, {component: comp_cluster}).
+    """
+
+    def __init__(self, management_cluster_client: ClusterClient):
+        super().__init__(
+            name="applications",
+            list_func=management_cluster_client.custom_objects.list_namespaced_custom_object,
+            group=group,
+            version=version,
+            namespace="default",
+            plural="applications",
+        )
+        self.index: dict[str, tuple[str, dict]] = {}
+
+    def on_reset(self, objects: list):
+        self.index = {}
+        for obj in objects:
+            self.on_upsert(obj)
+
+    def on_upsert(self, obj: dict):
+        spec = obj.get("spec") or {}
+        components = {
+            component["name"]: component["cluster"]
+            for component in spec.get("components") or []
+        }
+        self.index[obj["metadata"]["name"]] = (spec.get("cluster"), components)
+
+    def on_delete(self, obj: dict):
+        self.index.pop(obj["metadata"]["name"], None)
+
+    def get(self, app_name: str) -> tuple[str, dict] | None:
+        with self._lock:
+            return self.index.get(app_name)
+
+
+class CrdCache:
+    """
+    In-memory store of the Application CRs of the management cluster.
+    The informer is started by the first lookup. Lookups return None when the store
+    isn't synced (or doesn't know the object yet), so that the caller reads it live.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.applications = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, management_cluster_client: ClusterClient):
+        with self._lock:
+            if self.applications is None:
+                self.applications = ApplicationInformer(management_cluster_client)
+        self.applications.start()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_app_and_comp_cluster(
+        self,
+        management_cluster_client: ClusterClient,
+        app_name: str,
+        component_name: str,
+    ) -> tuple[str | None, str | None] | None:
+        if not self.enabled:
+            return None
+        self.start(management_cluster_client)
+        entry = None
+        if self.applications.is_synced():
+            entry = self.applications.get(app_name)
+        self._count(entry is not None)
+        if entry is None:
+            return None
+        app_cluster, components = entry
+        return app_cluster, components.get(component_name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"hits": self.hits, "misses": self.misses}
+        if self.applications is not None:
+            stats["applications"] = self.applications.stats()
+        return stats
+
+
+cache = CrdCache(enabled=CRD_CACHE_ENABLED)
@@ -0,0 +1,141 @@
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+import threading
+import logging
+import json
+import time
+import os
+
+
+# The watch is restarted after this many seconds, which also proves the cache is still alive
+WATCH_TIMEOUT = int(os.environ.get("INFORMER_WATCH_TIMEOUT", "60"))
+# A cache that didn't hear from the api server for longer than this is considered stale
+MAX_STALENESS = float(os.environ.get("INFORMER_MAX_STALENESS", "120"))
+
+
+class Informer:
+    """
+    Keeps an in-memory copy of a kind of object, like the informers of client-go:
+        - Lists the objects once, then watches the changes from the listed resourceVersion.
+        - Lists again when the watch expires (410 Gone) or fails.
+    Runs in a daemon thread. Subclasses maintain their own indexes by overriding
+    on_reset / on_upsert / on_delete, which are called with the informer lock held.
+    Objects are handled as plain dicts (the json returned by the api server).
+    """
+
+    def __init__(self, name: str, list_func, **list_kwargs):
+        self.name = name
+        self._list_func = list_func
+        self._list_kwargs = list_kwargs
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._synced = False
+        self.resource_version = None
+        self.last_contact = None
+        self.events = 0
+        self.relists = 0
+        self.errors = 0
+
+    # ---------------- hooks ---------------- #
+    def on_reset(self, objects: list):
+        pass
+
+    def on_upsert(self, obj: dict):
+        pass
+
+    def on_delete(self, obj: dict):
+        pass
+
+    # ---------------- state ---------------- #
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"informer-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def staleness(self) -> float | None:
+        """Seconds since the api server was last heard from, None if never synced."""
+        if self.last_contact is None:
+            return None
+        return time.monotonic() - self.last_contact
+
+    def is_synced(self) -> bool:
+        staleness = self.staleness()
+        return self._synced and staleness is not None and staleness <= MAX_STALENESS
+
+    def stats(self) -> dict:
+        return {
+            "synced": self.is_synced(),
+            "staleness": self.staleness(),
+            "resource_version": self.resource_version,
+            "events": self.events,
+            "relists": self.relists,
+            "errors": self.errors,
+        }
+
+    # ---------------- list & watch ---------------- #
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                self._list()
+                backoff = 1
+                while not self._stop.is_set():
+                    self._watch()
+            except ApiException as e:
+                if e.status == 410:
+                    logging.info(f"informer {self.name}: watch expired, listing again.")
+                else:
+                    self._fail(f"api error {e.status}")
+            except Exception as e:
+                self._fail(repr(e))
+            if not self._synced:
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _fail(self, reason: str):
+        logging.error(f"Error: informer {self.name} [{reason}]")
+        with self._lock:
+            self._synced = False
+            self.errors += 1
+
+    def _list(self):
+        response = self._list_func(**self._list_kwargs, _preload_content=False)
+        result = json.loads(response.data)
+        with self._lock:
+            self.resource_version = result["metadata"]["resourceVersion"]
+            self.on_reset(result.get("items") or [])
+            self._synced = True
+            self.last_contact = time.monotonic()
+            self.relists += 1
+
+    def _watch(self):
+        stream = watch.Watch().stream(
+            self._list_func,
+            resource_version=self.resource_version,
+            timeout_seconds=WATCH_TIMEOUT,
+            allow_watch_bookmarks=True,
+            **self._list_kwargs,
+        )
+        for event in stream:
+            obj = event["raw_object"]
+            with self._lock:
+                if event["type"] in ("ADDED", "MODIFIED"):
+                    self.on_upsert(obj)
+                elif event["type"] == "DELETED":
+                    self.on_delete(obj)
+                self.resource_version = obj["metadata"]["resourceVersion"]
+                self.last_contact = time.monotonic()
+                self.events += 1
+            if self._stop.is_set():
+                return
+        # The watch reached its timeout: the connection was still healthy
+        with self._lock:
+            self.last_contact = time.monotonic()
@@ -0,0 +1,143 @@
+from be.utils.k8s_client_pool import ClusterClient
+from be.utils.informer import Informer
+import threading
+import os
+
+
+INGRESS_CACHE_ENABLED = os.environ.get("INGRESS_CACHE_ENABLED", "true") == "true"
+
+
+def _parse_hosts(ingress: dict) -> dict:
+    hosts = {}
+    for rule in (ingress.get("spec") or {}).get("rules") or []:
+        service = rule["http"]["paths"][0]["backend"]["service"]
+        hosts[service["name"]] = service["port"]["number"]
+    return hosts
+
+
+def _is_newer(resource_version: str, than: str | None) -> bool:
+    # resourceVersions are opaque, but they are increasing integers on etcd
+    if than is None:
+        return True
+    try:
+        return int(resource_version) >= int(than)
+    except ValueError:
+        return True
+
+
+class IngressInformer(Informer):
+    """
+    Watches the ingresses of one cluster and indexes the application ingresses
+    ({app}-ingress in the {app} namespace) as: app -> ({component: port}, resourceVersion).
+    """
+
+    def __init__(self, app_cluster_client: ClusterClient):
+        super().__init__(
+            name=f"ingresses@{app_cluster_client.context}",
+            list_func=app_cluster_client.networking.list_ingress_for_all_namespaces,
+        )
+        self.index: dict[str, tuple[dict, str]] = {}
+
+    @staticmethod
+    def _app_name(ingress: dict) -> str | None:
+        metadata = ingress["metadata"]
+        if metadata["name"] != f"{metadata.get('namespace')}-ingress":
+            return None
+        return metadata["namespace"]
+
+    def on_reset(self, objects: list):
+        self.index = {}
+        for obj in objects:
+            self.on_upsert(obj)
+
+    def on_upsert(self, obj: dict):
+        app_name = self._app_name(obj)
+        if app_name is None:
+            return
+        resource_version = obj["metadata"]["resourceVersion"]
+        current = self.index.get(app_name)
+        if current is None or _is_newer(resource_version, current[1]):
+            self.index[app_name] = (_parse_hosts(obj), resource_version)
+
+    def on_delete(self, obj: dict):
+        app_name = self._app_name(obj)
+        if app_name is not None:
+            self.index.pop(app_name, None)
+
+    def record(self, obj: dict):
+        with self._lock:
+            self.on_upsert(obj)
+
+    def forget(self, app_name: str):
+        with self._lock:
+            self.index.pop(app_name, None)
+
+    def get(self, app_name: str) -> tuple[list, str | None]:
+        with self._lock:
+            hosts, resource_version = self.index.get(app_name, ({}, None))
+            return [
+                {"component_name": component_name, "port": port}
+                for component_name, port in hosts.items()
+            ], resource_version
+
+
+class IngressCache:
+    """
+    Host tables of the application ingresses of every workload cluster, kept up to date
+    by one IngressInformer per cluster (started the first time the cluster is used).
+    get_hosts returns None when the cache of the cluster isn't synced, so that the
+    caller falls back to a live read.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._informers: dict[str | None, IngressInformer] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _informer(self, app_cluster_client: ClusterClient) -> IngressInformer:
+        with self._lock:
+            informer = self._informers.get(app_cluster_client.context)
+            if informer is None:
+                informer = IngressInformer(app_cluster_client)
+                self._informers[app_cluster_client.context] = informer
+        informer.start()
+        return informer
+
+    def get_hosts(
+        self, app_cluster_client: ClusterClient, app_name: str
+    ) -> tuple[list, str | None] | None:
+        if not self.enabled:
+            return None
+        informer = self._informer(app_cluster_client)
+        if not informer.is_synced():
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return informer.get(app_name)
+
+    def record(self, app_cluster_client: ClusterClient, ingress: dict):
+        """Stores an ingress just written, without waiting for its watch event."""
+        informer = self._informers.get(app_cluster_client.context)
+        if informer is not None:
+            informer.record(ingress)
+
+    def forget(self, app_cluster_client: ClusterClient, app_name: str):
+        informer = self._informers.get(app_cluster_client.context)
+        if informer is not None:
+            informer.forget(app_name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            informers = dict(self._informers)
+            stats = {"hits": self.hits, "misses": self.misses}
+        stats["clusters"] = {
+            context: informer.stats() for context, informer in informers.items()
+        }
+        return stats
+
+
+cache = IngressCache(enabled=INGRESS_CACHE_ENABLED)
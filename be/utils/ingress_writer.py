@@ -0,0 +1,269 @@
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from be.utils.k8s_client_pool import ClusterClient
+from be.utils import ingress_cache, manifests
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from starlette.concurrency import run_in_threadpool
+import threading
+import logging
+import os
+
+
+# How many times a write is retried when the ingress changed since it was read (409)
+INGRESS_CONFLICT_RETRIES = int(os.environ.get("INGRESS_CONFLICT_RETRIES", "5"))
+
+ADD = "add"
+REMOVE = "remove"
+UPDATE = "update"
+
+
+def _get_existing_hosts(
+    app_cluster_client: ClusterClient, app_name: str, use_cache: bool = True
+) -> tuple[list, str | None]:
+    """
+    Returns the hosts of the application ingress and its resourceVersion.
+    ([], None) is returned when the ingress doesn't exist.
+    The watch-backed cache is used when it is synced, otherwise the ingress is read.
+    """
+    if use_cache:
+        cached = ingress_cache.cache.get_hosts(
+            app_cluster_client=app_cluster_client, app_name=app_name
+        )
+        if cached is not None:
+            return cached
+    try:
+        ingress = app_cluster_client.networking.read_namespaced_ingress(
+            name=f"{app_name}-ingress", namespace=app_name
+        )
+    except ApiException as e:
+        if e.status == 404:
+            return [], None
+        raise e
+    hosts = []
+    for host in ingress.spec.rules or []:
+        hosts.append(
+            {
+                "component_name": host.http.paths[0].backend.service.name,
+                "port": host.http.paths[0].backend.service.port.number,
+            }
+        )
+    return hosts, ingress.metadata.resource_version
+
+
+def apply_mutations(hosts: list, mutations: list) -> list:
+    """
+    Applies the (operation, component_name, port) mutations in order to a copy of hosts.
+    """
+    hosts = [dict(host) for host in hosts]
+    for operation, component_name, port in mutations:
+        existing = None
+        for host in hosts:
+            if host["component_name"] == component_name:
+                existing = host
+                break
+        if operation == REMOVE:
+            hosts = [host for host in hosts if host["component_name"] != component_name]
+        elif existing is not None:
+            existing["port"] = port
+        elif operation == ADD:
+            hosts.append({"component_name": component_name, "port": port})
+    return hosts
+
+
+class _Batch:
+    def __init__(self, app_cluster_client: ClusterClient, app_name: str):
+        self.app_cluster_client = app_cluster_client
+        self.app_name = app_name
+        self.mutations = []
+        self.error = None
+
+
+class Collector:
+    """
+    Host changes submitted inside coalescing(), by ingress: (context, app) -> batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches: dict[tuple, _Batch] = {}
+
+    def add(
+        self, key: tuple, app_cluster_client: ClusterClient, app_name: str, mutation
+    ):
+        with self._lock:
+            batch = self.batches.get(key)
+            if batch is None:
+                batch = self.batches[key] = _Batch(app_cluster_client, app_name)
+            batch.mutations.append(mutation)
+
+    def failures(self) -> dict[str, int]:
+        """
+        Status code of the failed write holding the host change of each component.
+        """
+        return {
+            component_name: getattr(batch.error, "status", None) or 500
+            for batch in self.batches.values()
+            if batch.error is not None
+            for _, component_name, _ in batch.mutations
+        }
+
+
+# The collector of the request being processed, if it coalesces its host changes
+_collector = ContextVar("ingress_collector", default=None)
+
+
+@asynccontextmanager
+async def coalescing():
+    """
+    The host changes submitted in this context (batch requests) aren't written right away:
+    they are collected, and each ingress is written once when the context exits, in a
+    single threadpool call. Nothing waits for the other changes meanwhile, and the write
+    errors are given per component by the failures() of the collector.
+    Elsewhere a change is written right away: the operations of an application run one
+    at a time (keyed_executor), so there is nothing to merge it with.
+    """
+    collector = Collector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+    await run_in_threadpool(writer.write_collected, collector)
+
+
+class IngressWriter:
+    """
+    Writes the host changes of the application ingresses.
+        - The changes of an ingress are written with a single read + apply (or
+          create/delete): one change at a time, or all the changes collected by
+          coalescing().
+        - Writes are conditional on the resourceVersion that was read, and retried
+          when another writer changed the ingress in the meantime.
+    Nothing is kept per ingress between the writes.
+    """
+
+    def __init__(self, retries: int):
+        self.retries = retries
+        self._lock = threading.Lock()
+        self.mutations = 0
+        self.batches = 0
+        self.writes = 0
+        self.conflicts = 0
+
+    def submit(
+        self,
+        app_cluster_client: ClusterClient,
+        app_name: str,
+        operation: str,
+        component_name: str,
+        port: int | None = None,
+    ):
+        key = (app_cluster_client.context, app_name)
+        mutation = (operation, component_name, port)
+        with self._lock:
+            self.mutations += 1
+        collector = _collector.get()
+        if collector is not None:
+            # Written when the request leaves coalescing()
+            collector.add(key, app_cluster_client, app_name, mutation)
+            return
+        batch = _Batch(app_cluster_client, app_name)
+        batch.mutations.append(mutation)
+        self._write(batch)
+        if batch.error is not None:
+            raise batch.error
+
+    def write_collected(self, collector: Collector):
+        for batch in list(collector.batches.values()):
+            self._write(batch)
+
+    def _write(self, batch: _Batch):
+        with self._lock:
+            self.batches += 1
+        try:
+            self._flush(batch)
+        except Exception as e:
+            logging.error(f"Error: [ingress of {batch.app_name}] {e!r}")
+            batch.error = e
+
+    def _flush(self, batch: _Batch):
+        app_name = batch.app_name
+        api_instance = batch.app_cluster_client.networking
+        name = f"{app_name}-ingress"
+        for attempt in range(self.retries + 1):
+            # After a conflict the cache is obviously behind, read the live object
+            hosts, resource_version = _get_existing_hosts(
+                app_cluster_client=batch.app_cluster_client,
+                app_name=app_name,
+                use_cache=attempt == 0,
+            )
+            new_hosts = apply_mutations(hosts, batch.mutations)
+            if new_hosts == hosts:
+                return
+            try:
+                if len(new_hosts) == 0:
+                    # Remove the ingress
+                    api_instance.delete_namespaced_ingress(
+                        name=name,
+                        namespace=app_name,
+                        body=client.V1DeleteOptions(
+                            preconditions=client.V1Preconditions(
+                                resource_version=resource_version
+                            )
+                        ),
+                    )
+                    ingress_cache.cache.forget(batch.app_cluster_client, app_name)
+                    logging.info("ingress deleted successfully")
+                elif resource_version is None:
+                    # Created (not applied) so that a concurrent creation fails with 409
+                    body = manifests.ingress_manifest(
+                        app_name=app_name, hosts=new_hosts
+                    )
+                    ingress = api_instance.create_namespaced_ingress(
+                        namespace=app_name, body=body
+                    )
+                    self._record(batch, ingress)
+                    logging.info("ingress created successfully!")
+                else:
+                    body = manifests.ingress_manifest(
+                        app_name=app_name, hosts=new_hosts
+                    )
+                    # The resourceVersion makes the apply fail (409) if the ingress changed since it was read
+                    body["metadata"]["namespace"] = app_name
+                    body["metadata"]["resourceVersion"] = resource_version
+                    ingress = batch.app_cluster_client.apply(
+                        body=body, plural="ingresses"
+                    )
+                    self._record(batch, ingress)
+                    logging.info("ingress updated successfully!")
+                with self._lock:
+                    self.writes += 1
+                return
+            except ApiException as e:
+                # 409: changed (or created) by someone else since it was read, 404: deleted meanwhile
+                if e.status not in (404, 409) or attempt == self.retries:
+                    raise e
+                with self._lock:
+                    self.conflicts += 1
+                logging.info(f"ingress {name} changed meanwhile, retrying.")
+
+    @staticmethod
+    def _record(batch: _Batch, ingress):
+        # Saves a conflict when the next batch is flushed before the watch event arrives
+        ingress_cache.cache.record(
+            batch.app_cluster_client,
+            batch.app_cluster_client.api_client.sanitize_for_serialization(ingress),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mutations": self.mutations,
+                "batches": self.batches,
+                "writes": self.writes,
+                "conflicts": self.conflicts,
+            }
+
+
+writer = IngressWriter(retries=INGRESS_CONFLICT_RETRIES)
@@ -0,0 +1,203 @@
+from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+from be.utils import metrics
+from common import tracing
+from common.cluster_registry import kubeconfig_signature
+import threading
+import time
+import logging
+import os
+
+
+# Name under which the backend owns the fields it applies (server-side apply)
+FIELD_MANAGER = os.environ.get("FIELD_MANAGER", "miro-backend")
+
+
+class InstrumentedApiClient(client.ApiClient):
+    """
+    ApiClient observing the latency and the errors of each call (see metrics),
+    labeled by verb, kind and cluster, and tracing it when called within a trace.
+    """
+
+    def __init__(self, configuration: client.Configuration, cluster: str | None):
+        super().__init__(configuration=configuration)
+        self.cluster = cluster
+
+    def call_api(
+        self,
+        resource_path,
+        method,
+        path_params=None,
+        query_params=None,
+        *args,
+        **kwargs,
+    ):
+        verb, kind = metrics.describe_call(
+            resource_path, method, path_params, query_params
+        )
+        if not tracing.in_trace():
+            # Background calls (informers ...) don't open a trace of their own
+            return self._observed_call(
+                verb,
+                kind,
+                resource_path,
+                method,
+                path_params,
+                query_params,
+                *args,
+                **kwargs,
+            )
+        with tracing.start_span(f"{verb} {kind}", cluster=self.cluster or "management"):
+            return self._observed_call(
+                verb,
+                kind,
+                resource_path,
+                method,
+                path_params,
+                query_params,
+                *args,
+                **kwargs,
+            )
+
+    def _observed_call(self, verb, kind, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().call_api(*args, **kwargs)
+        except Exception as e:
+            metrics.observe_call(self.cluster, verb, kind, start, error=e)
+            raise e
+        metrics.observe_call(self.cluster, verb, kind, start)
+        return response
+
+
+class ClusterClient:
+    """
+    Kubernetes API handles bound to a single kubeconfig context.
+    Nothing here touches the process-wide default configuration, so instances can be
+    shared between threads serving requests for different clusters.
+    """
+
+    def __init__(self, context: str | None, api_client: client.ApiClient):
+        self.context = context
+        self.api_client = api_client
+        self.core = client.CoreV1Api(api_client)
+        self.apps = client.AppsV1Api(api_client)
+        self.networking = client.NetworkingV1Api(api_client)
+        self.custom_objects = client.CustomObjectsApi(api_client)
+
+    @staticmethod
+    def _object_path(body: dict, plural: str) -> str:
+        api_version = body["apiVersion"]
+        # Core group objects live under /api, the others under /apis
+        prefix = "/apis" if "/" in api_version else "/api"
+        return f"{prefix}/{api_version}/namespaces/{{namespace}}/{plural}/{{name}}"
+
+    def apply(
+        self, body: dict, plural: str, field_manager: str = FIELD_MANAGER
+    ) -> dict:
+        """
+        Server-side apply (PATCH application/apply-patch+yaml) of a namespaced object:
+        creates it or updates the fields owned by field_manager in a single request.
+        The generated api methods can't send this content type, hence call_api.
+        """
+        metadata = body["metadata"]
+        return self.api_client.call_api(
+            self._object_path(body, plural),
+            "PATCH",
+            path_params={"namespace": metadata["namespace"], "name": metadata["name"]},
+            query_params=[("fieldManager", field_manager), ("force", "true")],
+            header_params={
+                "Accept": "application/json",
+                "Content-Type": "application/apply-patch+yaml",
+            },
+            body=body,
+            response_type="object",
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
+        )
+
+    def read(self, body: dict, plural: str) -> dict | None:
+        """
+        Reads the live version of the object described by body, None if it doesn't exist.
+        """
+        metadata = body["metadata"]
+        try:
+            return self.api_client.call_api(
+                self._object_path(body, plural),
+                "GET",
+                path_params={
+                    "namespace": metadata["namespace"],
+                    "name": metadata["name"],
+                },
+                header_params={"Accept": "application/json"},
+                response_type="object",
+                auth_settings=["BearerToken"],
+                _return_http_data_only=True,
+            )
+        except ApiException as e:
+            if e.status == 404:
+                return None
+            raise e
+
+
+class ClientPool:
+    """
+    Keeps one long-lived ApiClient per kubeconfig context, so that:
+        - The kubeconfig file is parsed once per context instead of once per call.
+        - HTTP connections (and TLS sessions) to each cluster are reused between calls.
+    The whole pool is invalidated when the kubeconfig file changes on disk.
+    The context None stands for the current-context (the management cluster).
+    """
+
+    def __init__(self):
+        self._clients: dict[str | None, ClusterClient] = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, context: str | None = None) -> ClusterClient:
+        signature = kubeconfig_signature()
+        with self._lock:
+            if signature != self._signature:
+                if self._clients:
+                    logging.info("kubeconfig changed, dropping cached api clients.")
+                    self.invalidations += 1
+                self._clients = {}
+                self._signature = signature
+
+            cluster_client = self._clients.get(context)
+            if cluster_client is not None:
+                self.hits += 1
+                return cluster_client
+
+            self.misses += 1
+            # ConfigException propagates to the caller, like load_kube_config did
+            configuration = client.Configuration()
+            config.load_kube_config(
+                context=context,
+                client_configuration=configuration,
+                persist_config=False,
+            )
+            api_client = InstrumentedApiClient(configuration, cluster=context)
+            cluster_client = ClusterClient(context=context, api_client=api_client)
+            self._clients[context] = cluster_client
+            return cluster_client
+
+    def clear(self):
+        with self._lock:
+            self._clients = {}
+            self._signature = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._clients),
+            }
+
+
+pool = ClientPool()
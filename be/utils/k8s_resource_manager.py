@@ -1,474 +1,410 @@
-from kubernetes import client, config
-from kubernetes.client.rest import ApiException
-from kubernetes.config.config_exception import ConfigException
-from jinja2 import Environment, FileSystemLoader
-from fastapi import HTTPException
-import yaml
-import os
-import logging
-
-
-group = os.environ.get("CRD_GROUP")
-version = os.environ.get("CRD_VERSION")
-TEMPLATE_DIR = os.environ.get("TEMPLATE_DIR")
-
-
-def create_namespace(namespace_name: str, app_cluster_context: str):
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.CoreV1Api()
-        new_namespace = client.V1Namespace(
-            metadata=client.V1ObjectMeta(name=namespace_name)
-        )
-        api_instance.create_namespace(body=new_namespace)
-        logging.info(f"Namespace {namespace_name} created successfully!.")
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [create_namespace]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: [create_namespace function].")
-        raise HTTPException(status_code=e.status)
-
-
-def delete_namespace(namespace_name: str, app_cluster_context: str):
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.CoreV1Api()
-        api_instance.delete_namespace(
-            name=namespace_name, body=client.V1DeleteOptions()
-        )
-        logging.info(f"Namespace {namespace_name} deleted successfully!")
-    except ConfigException as _:
-        logging.error(f"Error: load_kube_config [delete_namespace]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: delete_namespace.")
-        raise HTTPException(status_code=e.status)
-
-
-def apply_deployment(component: dict, app_cluster_context: str, update: bool = False):
-    # Loading the template
-    try:
-        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-        deployment_template = environment.get_template("deployment_template.yaml")
-        # Configure fields
-        rendered_deployment = deployment_template.render(
-            name=component["name"],
-            image=component["image"],
-            expose=component.get("expose", ""),
-            env=component.get("env", ""),
-            namespace=component["application"],
-            # secretName=secretName,
-            clusterLabel=component.get("cluster-selector", ""),
-            # service_list=service_list
-            service_list=[],
-        )
-
-        yaml_output = yaml.safe_load(rendered_deployment)
-
-    except Exception as _:
-        logging.error("Error: <<install_deployment>> when generating the yaml file.")
-        raise HTTPException(status_code=500)
-
-    # Applying the output yaml file
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.AppsV1Api()
-        if update == False:
-            api_instance.create_namespaced_deployment(
-                body=yaml_output, namespace=component["application"], pretty="true"
-            )
-            logging.info("Deployment created successfully!")
-        else:
-            api_instance.replace_namespaced_deployment(
-                body=yaml_output,
-                namespace=component["application"],
-                name=component["name"],
-                pretty="true",
-            )
-            logging.info("Deployment updated successfully!")
-
-    except ConfigException as _:
-        logging.error(f"Error: load_kube_config [install_deployment]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: install_deployment")
-        raise HTTPException(e.status)
-
-
-def delete_deployment(component_name: str, app_name: str, app_cluster_context: str):
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.AppsV1Api()
-        api_instance.delete_namespaced_deployment(
-            name=component_name, namespace=app_name
-        )
-        logging.info("Deployment uninstalled successfully!")
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [uninstall_deployment]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: uninstall_deployment")
-        raise HTTPException(status_code=e.status)
-
-
-def apply_service(
-    component_name: str,
-    app_name: str,
-    app_cluster_context: str,
-    ports_list: list,
-    update: bool = False,
-):
-    # Loading the template
-    try:
-        # Get template
-        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-        service_template = environment.get_template("service_template.yaml")
-        rendered_service = service_template.render(
-            name=component_name,
-            expose=ports_list,
-            namespace=app_name,
-        )
-
-        yaml_output = yaml.safe_load(rendered_service)
-    except Exception as _:
-        logging.error("Error: <<install_service>> when generating the yaml file")
-        raise HTTPException(status_code=500)
-
-    # Applying the output yaml_output
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.CoreV1Api()
-        if update == False:
-            api_instance.create_namespaced_service(
-                body=yaml_output, namespace=app_name, pretty="true"
-            )
-            logging.info("Service created successfully!")
-        else:
-            api_instance.replace_namespaced_service(
-                body=yaml_output, namespace=app_name, name=component_name, pretty="true"
-            )
-            logging.info("Service updated successfully!")
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [install_service]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: install_service")
-        raise HTTPException(status_code=e.status)
-
-
-def delete_service(component_name: str, app_name: str, app_cluster_context: str):
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.CoreV1Api()
-        api_instance.delete_namespaced_service(name=component_name, namespace=app_name)
-        logging.info("Service uninstalled successfully!")
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [uninstall_service]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: uninstall_service")
-        raise HTTPException(status_code=e.status)
-
-
-# Still other apps to be implemented
-def apply_servicemonitor(
-    app_name: str,
-    app_cluster_context: str,
-    component_name: str,
-    ports_list: list,
-    update: bool = False,
-):
-    # Get the ServiceMonitor template
-    try:
-        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-        service_monitor_template = environment.get_template(
-            "ServiceMonitor_template.yaml"
-        )
-        rendered_service_monitor = service_monitor_template.render(
-            namespace=app_name,
-            component_name=component_name,
-            expose=ports_list,
-        )
-
-        yaml_output = yaml.safe_load(rendered_service_monitor)
-    except Exception as _:
-        logging.error("Error: <<install_servicemonitor>> when generating the yaml file")
-        raise HTTPException(status_code=500)
-
-    try:
-        # Apply the CRD using the Kubernetes Python client library
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.CustomObjectsApi()
-        api_version = yaml_output["apiVersion"]
-        if update == False:
-            api_instance.create_namespaced_custom_object(
-                group=api_version.split("/")[0],
-                version=api_version.split("/")[1],
-                namespace=app_name,
-                plural="servicemonitors",
-                body=yaml_output,
-            )
-            logging.info("ServiceMonitor created successfully!")
-        else:
-            # First get the resourceVersion of the serviceMonitor
-            existing_servicemonitor = api_instance.get_namespaced_custom_object(
-                group=api_version.split("/")[0],
-                version=api_version.split("/")[1],
-                namespace=app_name,
-                name=component_name,
-                plural="servicemonitors",
-            )
-            resource_version = existing_servicemonitor["metadata"]["resourceVersion"]
-            yaml_output["metadata"]["resourceVersion"] = resource_version
-            # Update
-            api_instance.replace_namespaced_custom_object(
-                group=api_version.split("/")[0],
-                version=api_version.split("/")[1],
-                namespace=app_name,
-                name=component_name,
-                plural="servicemonitors",
-                body=yaml_output,
-            )
-            logging.info("ServiceMonitor updated successfully!")
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [install_servicemonitor]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: install_servicemonitor")
-        raise HTTPException(status_code=e.status)
-
-
-def delete_servicemonitor(component_name: str, app_name: str, app_cluster_context: str):
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.CustomObjectsApi()
-        api_instance.delete_namespaced_custom_object(
-            group="monitoring.coreos.com",
-            version="v1",
-            namespace=app_name,
-            name=component_name,
-            plural="servicemonitors",
-            body=client.V1DeleteOptions(),
-        )
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [install_servicemonitor]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: install_servicemonitor")
-        raise HTTPException(status_code=e.status)
-
-
-def delete_component(component_name: str, app_name: str):
-    try:
-        # default context : Management cluster
-        config.load_kube_config()
-        api_instance = client.CustomObjectsApi()
-        api_instance.delete_namespaced_custom_object(
-            group=group,
-            version=version,
-            namespace=app_name,
-            name=component_name,
-            plural="components",
-            body=client.V1DeleteOptions(),
-        )
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [delete_component]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        if e.status == 404:
-            logging.info("Component doesn't exist.")
-        else:
-            logging.error("Exception: [delete_component function]")
-            raise HTTPException(status_code=e.status)
-
-
-def add_host_to_ingress(
-    app_name: str, app_cluster_context: str, component_name: str, port: int
-):
-    # Getting the ingress of the application if it exists
-    ingress_exist = True
-    try:
-        hosts = _get_existing_hosts(
-            app_cluster_context=app_cluster_context, app_name=app_name
-        )
-        hosts.append({"component_name": component_name, "port": port})
-    except ApiException as e:
-        if e.status == 404:
-            ingress_exist = False
-            hosts = [{"component_name": component_name, "port": port}]
-        else:
-            raise HTTPException(status_code=e.status)
-
-    try:
-        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-        ingress_template = environment.get_template("ingress_template.yaml")
-        rendered_ingress = ingress_template.render(
-            app_name=app_name,
-            component_name=component_name,
-            hosts=hosts,
-        )
-        yaml_output = yaml.safe_load(rendered_ingress)
-    except Exception as _:
-        logging.error("Error: <<add_host_to_ingress>> when generating the yaml file")
-        raise HTTPException(status_code=500)
-
-    try:
-        api_instance = client.NetworkingV1Api()
-        if ingress_exist == False:
-            api_instance.create_namespaced_ingress(namespace=app_name, body=yaml_output)
-            logging.info(f"ingress created successfully!")
-        else:
-            api_instance.replace_namespaced_ingress(
-                name=f"{app_name}-ingress", namespace=app_name, body=yaml_output
-            )
-            logging.info("ingress updated successfully!")
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [add_host_to_ingress]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: add_host_to_ingress")
-        raise HTTPException(status_code=e.status)
-
-
-def remove_host_from_ingress(
-    component_name: str, app_name: str, app_cluster_context: str
-):
-    try:
-        hosts = _get_existing_hosts(
-            app_cluster_context=app_cluster_context, app_name=app_name
-        )
-        hosts_list = [
-            host for host in hosts if host["component_name"] != component_name
-        ]
-
-        # Updating or Deleting the ingress
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.NetworkingV1Api()
-        if len(hosts_list) == 0:
-            # Remove the ingress
-            api_instance.delete_namespaced_ingress(
-                name=f"{app_name}-ingress", namespace=app_name
-            )
-            logging.info("ingress deleted successfully")
-        else:
-            environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-            ingress_template = environment.get_template("ingress_template.yaml")
-            rendered_ingress = ingress_template.render(
-                app_name=app_name,
-                component_name=component_name,
-                hosts=hosts_list,
-            )
-            yaml_output = yaml.safe_load(rendered_ingress)
-            api_instance.replace_namespaced_ingress(
-                name=f"{app_name}-ingress", namespace=app_name, body=yaml_output
-            )
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [remove_host_from_ingress]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        raise HTTPException(status_code=e.status)
-    except Exception as _:
-        raise HTTPException(status_code=500)
-
-
-def update_host_in_ingress(
-    component_name: str, app_name: str, app_cluster_context: str, new_port: int
-):
-    try:
-        hosts = _get_existing_hosts(
-            app_cluster_context=app_cluster_context, app_name=app_name
-        )
-
-        for host in hosts:
-            if host["component_name"] == component_name:
-                host["port"] = new_port
-                break
-
-        # Updating or Deleting the ingress
-        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-        ingress_template = environment.get_template("ingress_template.yaml")
-        rendered_ingress = ingress_template.render(
-            app_name=app_name,
-            component_name=component_name,
-            hosts=hosts,
-        )
-        yaml_output = yaml.safe_load(rendered_ingress)
-        # Updating the ingress
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.NetworkingV1Api()
-        api_instance.replace_namespaced_ingress(
-            name=f"{app_name}-ingress", namespace=app_name, body=yaml_output
-        )
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [update_host_in_ingress]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        raise HTTPException(status_code=e.status)
-    except Exception as _:
-        raise HTTPException(status_code=500)
-
-
-def get_context(cluster: str) -> str:
-    contexts, _ = config.list_kube_config_contexts()
-    for context in contexts:
-        cluster_name = context["context"]["cluster"]
-        if cluster_name == cluster:
-            return context["name"]
-    # Raise exception if cluster not found
-    logging.error("ERROR: cluster context not found! [get_context]")
-    raise HTTPException(status_code=500)
-
-
-def get_app_and_comp_cluster(
-    app_name: str, component_name: str
-) -> tuple[str | None, str | None]:
-    try:
-        config.load_kube_config()
-        custom_objects_api = client.CustomObjectsApi()
-        # Get the Custom Resource
-        app_instance = custom_objects_api.get_namespaced_custom_object(
-            group=group,
-            version=version,
-            namespace="default",
-            plural="applications",
-            name=app_name,
-        )
-        # Application cluster
-        app_cluster = app_instance["spec"]["cluster"]
-        # Component cluster
-        comp_cluster = None
-        for component in app_instance["spec"]["components"]:
-            if component["name"] == component_name:
-                comp_cluster = component["cluster"]
-                break
-        return app_cluster, comp_cluster
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [get_app_and_comp_cluster]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        logging.error("Error: get_app_and_comp_cluster")
-        raise HTTPException(status_code=e.status)
-
-
-def _get_existing_hosts(app_cluster_context: str, app_name: str):
-    try:
-        config.load_kube_config(context=app_cluster_context)
-        api_instance = client.NetworkingV1Api()
-        ingress = api_instance.read_namespaced_ingress(
-            name=f"{app_name}-ingress", namespace=app_name
-        )
-        hosts = []
-        for host in ingress.spec.rules:
-            hosts.append(
-                {
-                    "component_name": host.http.paths[0].backend.service.name,
-                    "port": host.http.paths[0].backend.service.port.number,
-                }
-            )
-        return hosts
-    except ConfigException as _:
-        logging.error("Error: load_kube_config [add_host_to_ingress (_get_ingress)]")
-        raise HTTPException(status_code=500)
-    except ApiException as e:
-        raise e
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from kubernetes.config.config_exception import ConfigException
+from be.utils.k8s_client_pool import ClusterClient, pool
+from be.utils import content_hash, crd_cache, ingress_writer, manifests
+from common import cluster_registry, tracing
+from fastapi import HTTPException
+import os
+import logging
+
+
+group = os.environ.get("CRD_GROUP")
+version = os.environ.get("CRD_VERSION")
+
+# Results of the apply functions
+APPLIED = "applied"
+UNCHANGED = "unchanged"
+
+
+@tracing.traced()
+def create_namespace(namespace_name: str, app_cluster_client: ClusterClient):
+    try:
+        api_instance = app_cluster_client.core
+        new_namespace = client.V1Namespace(
+            metadata=client.V1ObjectMeta(name=namespace_name)
+        )
+        api_instance.create_namespace(body=new_namespace)
+        logging.info(f"Namespace {namespace_name} created successfully!.")
+    except ApiException as e:
+        logging.error("Error: [create_namespace function].")
+        raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def delete_namespace(namespace_name: str, app_cluster_client: ClusterClient):
+    try:
+        api_instance = app_cluster_client.core
+        # The objects of the namespace go with it
+        content_hash.cache.forget_namespace(app_cluster_client.context, namespace_name)
+        api_instance.delete_namespace(
+            name=namespace_name, body=client.V1DeleteOptions()
+        )
+        logging.info(f"Namespace {namespace_name} deleted successfully!")
+    except ApiException as e:
+        logging.error("Error: delete_namespace.")
+        raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def apply_deployment(component: dict, app_cluster_client: ClusterClient):
+    # Building the manifest
+    try:
+        yaml_output = manifests.deployment_manifest(component=component)
+    except Exception as _:
+        logging.error("Error: <<install_deployment>> when generating the yaml file.")
+        raise HTTPException(status_code=500)
+
+    # Applying the manifest (created or updated, see ClusterClient.apply)
+    try:
+        result = _apply_if_changed(
+            app_cluster_client=app_cluster_client,
+            body=yaml_output,
+            plural="deployments",
+        )
+        logging.info(f"Deployment {result}!")
+        return result
+    except ApiException as e:
+        logging.error("Error: install_deployment")
+        raise HTTPException(e.status)
+
+
+@tracing.traced()
+def delete_deployment(
+    component_name: str, app_name: str, app_cluster_client: ClusterClient
+):
+    try:
+        api_instance = app_cluster_client.apps
+        # Forgotten even if the delete fails (the object may be gone already)
+        content_hash.cache.forget(
+            (app_cluster_client.context, "deployments", app_name, component_name)
+        )
+        api_instance.delete_namespaced_deployment(
+            name=component_name, namespace=app_name
+        )
+        logging.info("Deployment uninstalled successfully!")
+    except ApiException as e:
+        logging.error("Error: uninstall_deployment")
+        raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def apply_service(
+    component_name: str,
+    app_name: str,
+    app_cluster_client: ClusterClient,
+    ports_list: list,
+):
+    # Building the manifest
+    try:
+        yaml_output = manifests.service_manifest(
+            component_name=component_name, app_name=app_name, ports_list=ports_list
+        )
+    except Exception as _:
+        logging.error("Error: <<install_service>> when generating the yaml file")
+        raise HTTPException(status_code=500)
+
+    # Applying the output yaml_output
+    try:
+        result = _apply_if_changed(
+            app_cluster_client=app_cluster_client, body=yaml_output, plural="services"
+        )
+        logging.info(f"Service {result}!")
+        return result
+    except ApiException as e:
+        logging.error("Error: install_service")
+        raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def delete_service(
+    component_name: str, app_name: str, app_cluster_client: ClusterClient
+):
+    try:
+        api_instance = app_cluster_client.core
+        # Forgotten even if the delete fails (the object may be gone already)
+        content_hash.cache.forget(
+            (app_cluster_client.context, "services", app_name, component_name)
+        )
+        api_instance.delete_namespaced_service(name=component_name, namespace=app_name)
+        logging.info("Service uninstalled successfully!")
+    except ApiException as e:
+        logging.error("Error: uninstall_service")
+        raise HTTPException(status_code=e.status)
+
+
+# Still other apps to be implemented
+@tracing.traced()
+def apply_servicemonitor(
+    app_name: str,
+    app_cluster_client: ClusterClient,
+    component_name: str,
+    ports_list: list,
+):
+    # Building the ServiceMonitor manifest
+    try:
+        yaml_output = manifests.servicemonitor_manifest(
+            app_name=app_name, component_name=component_name, ports_list=ports_list
+        )
+    except Exception as _:
+        logging.error("Error: <<install_servicemonitor>> when generating the yaml file")
+        raise HTTPException(status_code=500)
+
+    try:
+        # No need to fetch the resourceVersion first, the apply works on the fields it owns
+        result = _apply_if_changed(
+            app_cluster_client=app_cluster_client,
+            body=yaml_output,
+            plural="servicemonitors",
+        )
+        logging.info(f"ServiceMonitor {result}!")
+        return result
+    except ApiException as e:
+        logging.error("Error: install_servicemonitor")
+        raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def delete_servicemonitor(
+    component_name: str, app_name: str, app_cluster_client: ClusterClient
+):
+    try:
+        api_instance = app_cluster_client.custom_objects
+        # Forgotten even if the delete fails (the object may be gone already)
+        content_hash.cache.forget(
+            (app_cluster_client.context, "servicemonitors", app_name, component_name)
+        )
+        api_instance.delete_namespaced_custom_object(
+            group="monitoring.coreos.com",
+            version="v1",
+            namespace=app_name,
+            name=component_name,
+            plural="servicemonitors",
+            body=client.V1DeleteOptions(),
+        )
+    except ApiException as e:
+        logging.error("Error: install_servicemonitor")
+        raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def delete_component(
+    component_name: str, app_name: str, management_cluster_client: ClusterClient
+):
+    try:
+        api_instance = management_cluster_client.custom_objects
+        api_instance.delete_namespaced_custom_object(
+            group=group,
+            version=version,
+            namespace=app_name,
+            name=component_name,
+            plural="components",
+            body=client.V1DeleteOptions(),
+        )
+    except ApiException as e:
+        if e.status == 404:
+            logging.info("Component doesn't exist.")
+        else:
+            logging.error("Exception: [delete_component function]")
+            raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def delete_components(app_name: str, management_cluster_client: ClusterClient):
+    # All the Component CRs of the application (its namespace) in one request
+    try:
+        api_instance = management_cluster_client.custom_objects
+        api_instance.delete_collection_namespaced_custom_object(
+            group=group,
+            version=version,
+            namespace=app_name,
+            plural="components",
+            body=client.V1DeleteOptions(),
+        )
+    except ApiException as e:
+        if e.status == 404:
+            logging.info("No component to delete.")
+        else:
+            logging.error("Exception: [delete_components function]")
+            raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def set_component_status(
+    app_name: str,
+    component_name: str,
+    current_status: str,
+    details: str,
+    management_cluster_client: ClusterClient,
+):
+    # Shown by "kubectl get comps" (printer columns of the CRD)
+    body = {
+        "status": {
+            "component_watch": {"current_status": current_status, "details": details}
+        }
+    }
+    try:
+        api_instance = management_cluster_client.custom_objects
+        api_instance.patch_namespaced_custom_object(
+            group=group,
+            version=version,
+            namespace=app_name,
+            plural="components",
+            name=component_name,
+            body=body,
+        )
+    except ApiException as e:
+        if e.status == 404:
+            logging.info("Component doesn't exist, status not written.")
+        else:
+            logging.error("Exception: [set_component_status function]")
+            raise HTTPException(status_code=e.status)
+
+
+@tracing.traced()
+def add_host_to_ingress(
+    app_name: str, app_cluster_client: ClusterClient, component_name: str, port: int
+):
+    _write_ingress(
+        app_name=app_name,
+        app_cluster_client=app_cluster_client,
+        operation=ingress_writer.ADD,
+        component_name=component_name,
+        port=port,
+    )
+
+
+@tracing.traced()
+def remove_host_from_ingress(
+    component_name: str, app_name: str, app_cluster_client: ClusterClient
+):
+    _write_ingress(
+        app_name=app_name,
+        app_cluster_client=app_cluster_client,
+        operation=ingress_writer.REMOVE,
+        component_name=component_name,
+    )
+
+
+@tracing.traced()
+def update_host_in_ingress(
+    component_name: str, app_name: str, app_cluster_client: ClusterClient, new_port: int
+):
+    _write_ingress(
+        app_name=app_name,
+        app_cluster_client=app_cluster_client,
+        operation=ingress_writer.UPDATE,
+        component_name=component_name,
+        port=new_port,
+    )
+
+
+@tracing.traced()
+def get_context(cluster: str) -> str:
+    context = cluster_registry.registry.get_context(cluster)
+    if context is not None:
+        return context
+    # Raise exception if cluster not found
+    logging.error("ERROR: cluster context not found! [get_context]")
+    raise HTTPException(status_code=500)
+
+
+@tracing.traced()
+def get_cluster_client(cluster: str | None = None) -> ClusterClient:
+    """
+    Returns the api client bound to the context of the given cluster.
+    cluster=None returns the client of the management cluster (default context).
+    The client is passed explicitly to every function of this module, so concurrent
+    requests targeting different clusters never share any global configuration.
+    """
+    context = get_context(cluster=cluster) if cluster is not None else None
+    try:
+        return pool.get(context)
+    except ConfigException as _:
+        logging.error("Error: load_kube_config [get_cluster_client]")
+        raise HTTPException(status_code=500)
+
+
+@tracing.traced()
+def get_app_and_comp_cluster(
+    app_name: str, component_name: str, management_cluster_client: ClusterClient
+) -> tuple[str | None, str | None]:
+    # Served from the watch-backed store when it is synced, see crd_cache
+    cached = crd_cache.cache.get_app_and_comp_cluster(
+        management_cluster_client=management_cluster_client,
+        app_name=app_name,
+        component_name=component_name,
+    )
+    if cached is not None:
+        return cached
+    try:
+        custom_objects_api = management_cluster_client.custom_objects
+        # Get the Custom Resource
+        app_instance = custom_objects_api.get_namespaced_custom_object(
+            group=group,
+            version=version,
+            namespace="default",
+            plural="applications",
+            name=app_name,
+        )
+        # Application cluster
+        app_cluster = app_instance["spec"]["cluster"]
+        # Component cluster
+        comp_cluster = None
+        for component in app_instance["spec"]["components"]:
+            if component["name"] == component_name:
+                comp_cluster = component["cluster"]
+                break
+        return app_cluster, comp_cluster
+    except ApiException as e:
+        logging.error("Error: get_app_and_comp_cluster")
+        raise HTTPException(status_code=e.status)
+
+
+def _write_ingress(
+    app_name: str,
+    app_cluster_client: ClusterClient,
+    operation: str,
+    component_name: str,
+    port: int | None = None,
+):
+    # The change is merged with the other changes of the same ingress, see ingress_writer
+    try:
+        ingress_writer.writer.submit(
+            app_cluster_client=app_cluster_client,
+            app_name=app_name,
+            operation=operation,
+            component_name=component_name,
+            port=port,
+        )
+    except ApiException as e:
+        logging.error(f"Error: [{operation} host of ingress]")
+        raise HTTPException(status_code=e.status)
+    except Exception as _:
+        logging.error(f"Error: [{operation} host of ingress]")
+        raise HTTPException(status_code=500)
+
+
+def _apply_if_changed(
+    app_cluster_client: ClusterClient, body: dict, plural: str
+) -> str:
+    """
+    Stamps the manifest with its content hash and applies it only if the live object
+    doesn't already carry the same hash. The live object isn't read when the cached hash
+    already differs from the new one.
+    """
+    digest = content_hash.stamp(body)
+    metadata = body["metadata"]
+    key = (app_cluster_client.context, plural, metadata["namespace"], metadata["name"])
+    current = content_hash.cache.get(key)
+    if current is None or current == digest:
+        # The cache can't tell that the object is still there and unchanged
+        live = app_cluster_client.read(body=body, plural=plural)
+        current = content_hash.read(live) if live is not None else None
+
+    changed = current != digest
+    if changed:
+        app_cluster_client.apply(body=body, plural=plural)
+    content_hash.cache.set(key, digest)
+    content_hash.cache.count(changed)
+    return APPLIED if changed else UNCHANGED
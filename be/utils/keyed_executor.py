@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from be.utils import metrics
+from common import tracing
+import itertools
+import asyncio
+import time
+import os
+
+
+# Maximum number of operations (of different applications) running at the same time
+APP_CONCURRENCY = int(os.environ.get("APP_CONCURRENCY", "32"))
+# Number of keys whose wait times are kept for the stats (least recently used dropped)
+TRACKED_KEYS = 1000
+
+
+class _Queue:
+    def __init__(self):
+        # asyncio.Lock hands the lock over to its waiters in arrival order
+        self.lock = asyncio.Lock()
+        self.waiting: dict[int, float] = {}
+        self.running = False
+
+
+class KeyedExecutor:
+    """
+    Runs the operations of the same key (application) strictly one after the other, in
+    arrival order, and the operations of different keys in parallel, at most `workers`
+    at a time. An operation waits for the previous operations of its key before taking
+    a slot, so the slots are only held by operations that can run.
+    The queues only exist while they hold operations; the wait times of the last
+    TRACKED_KEYS keys are kept for the stats.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._loop = None
+        self._slots = None
+        self._queues: dict = {}
+        self._waits: OrderedDict = OrderedDict()
+        self._tickets = itertools.count()
+        self.running = 0
+        self.operations = 0
+
+    def _bind(self):
+        # The primitives belong to the event loop that created them
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers)
+            self._queues = {}
+            self.running = 0
+
+    async def run(self, key, func, *args, **kwargs):
+        """
+        Awaits func(*args, **kwargs) once the previous operations of key are done and a
+        slot is free, and returns its result.
+        """
+        self._bind()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _Queue()
+        ticket = next(self._tickets)
+        enqueued = time.monotonic()
+        queue.waiting[ticket] = enqueued
+        try:
+            with tracing.start_span("queue", key=str(key)):
+                await queue.lock.acquire()
+                try:
+                    await self._slots.acquire()
+                except BaseException as e:
+                    queue.lock.release()
+                    raise e
+        except BaseException as e:
+            self._release_queue(key, queue, ticket)
+            raise e
+        del queue.waiting[ticket]
+        self._observe(key, time.monotonic() - enqueued)
+
+        queue.running = True
+        self.running += 1
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            queue.running = False
+            self.running -= 1
+            self._slots.release()
+            queue.lock.release()
+            self._release_queue(key, queue)
+
+    def _release_queue(self, key, queue: _Queue, ticket: int | None = None):
+        if ticket is not None:
+            queue.waiting.pop(ticket, None)
+        if not queue.waiting and not queue.lock.locked():
+            if self._queues.get(key) is queue:
+                del self._queues[key]
+
+    def _observe(self, key, wait: float):
+        self.operations += 1
+        metrics.APP_QUEUE_WAIT.observe(wait)
+        operations, total, longest = self._waits.pop(key, (0, 0.0, 0.0))
+        self._waits[key] = (operations + 1, total + wait, max(longest, wait))
+        if len(self._waits) > TRACKED_KEYS:
+            self._waits.popitem(last=False)
+
+    def depths(self) -> dict:
+        """Operations waiting, by key (the running one excluded)."""
+        return {key: len(queue.waiting) for key, queue in list(self._queues.items())}
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        queues = {}
+        for key, queue in list(self._queues.items()):
+            waiting = list(queue.waiting.values())
+            queues[str(key)] = {
+                "depth": len(waiting),
+                "running": queue.running,
+                "oldest_wait": now - min(waiting) if waiting else None,
+            }
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": sum(queue["depth"] for queue in queues.values()),
+            "operations": self.operations,
+            "queues": queues,
+            "waits": {
+                str(key): {
+                    "operations": operations,
+                    "mean": total / operations,
+                    "max": longest,
+                }
+                for key, (operations, total, longest) in list(self._waits.items())
+            },
+        }
+
+
+executor = KeyedExecutor(workers=APP_CONCURRENCY)
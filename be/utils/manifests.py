@@ -0,0 +1,224 @@
+from be.utils import metrics, templates
+import yaml
+import os
+
+
+# "builder" (default) builds the manifests directly as dicts.
+# "jinja" renders the files of TEMPLATE_DIR and parses the yaml output instead.
+MANIFEST_RENDERER = os.environ.get("MANIFEST_RENDERER", "builder")
+
+_resolver = yaml.resolver.Resolver()
+_STR_TAG = "tag:yaml.org,2002:str"
+
+
+def _scalar(value):
+    """
+    Types a value the way yaml.safe_load types it once rendered in a template,
+    so that the builders produce exactly what the templates produce ("80" -> 80, ...).
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    text = "" if value is None else str(value)
+    if _resolver.resolve(yaml.ScalarNode, text, (True, False)) == _STR_TAG:
+        return text
+    return yaml.safe_load(text)
+
+
+# ----------------------------- Builders ----------------------------- #
+def build_deployment(component: dict) -> dict:
+    name = _scalar(component["name"])
+    expose = component.get("expose", "")
+    env = component.get("env", "")
+    cluster_label = component.get("cluster-selector", "")
+
+    container = {"name": name, "image": _scalar(component["image"])}
+    if expose:
+        container["ports"] = [
+            {"containerPort": _scalar(exp.get("containerPort"))} for exp in expose
+        ]
+    if env:
+        variables = [
+            {"name": _scalar(var.get("name")), "value": _scalar(var.get("value"))}
+            for var in env.get("variables", [])
+        ]
+        container["env"] = variables or None
+
+    pod_spec = {"containers": [container]}
+    if cluster_label:
+        pod_spec["affinity"] = {
+            "nodeAffinity": {
+                "requiredDuringSchedulingIgnoredDuringExecution": {
+                    "nodeSelectorTerms": [
+                        {
+                            "matchExpressions": [
+                                {
+                                    "key": "topology.liqo.io/name",
+                                    "operator": "In",
+                                    "values": [_scalar(cluster_label)],
+                                }
+                            ]
+                        }
+                    ]
+                }
+            }
+        }
+
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": name, "namespace": _scalar(component["application"])},
+        "spec": {
+            "replicas": 1,
+            "selector": {"matchLabels": {"app": name}},
+            "template": {"metadata": {"labels": {"app": name}}, "spec": pod_spec},
+        },
+    }
+
+
+def build_service(component_name: str, app_name: str, ports_list: list) -> dict:
+    name = _scalar(component_name)
+    ports = [
+        {
+            "protocol": "TCP",
+            "name": _scalar(f"{component_name}-{exp['clusterPort']}"),
+            "port": _scalar(exp["clusterPort"]),
+            "targetPort": _scalar(exp["containerPort"]),
+        }
+        for exp in ports_list
+    ]
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {
+            "name": name,
+            "namespace": _scalar(app_name),
+            "labels": {"app": name, "service": name},
+        },
+        "spec": {"ports": ports or None, "selector": {"app": name}},
+    }
+
+
+def build_servicemonitor(app_name: str, component_name: str, ports_list: list) -> dict:
+    endpoints = [
+        {
+            "interval": "30s",
+            "path": "/metrics",
+            "port": _scalar(f"{component_name}-{exp['clusterPort']}"),
+        }
+        for exp in ports_list
+    ]
+    return {
+        "apiVersion": "monitoring.coreos.com/v1",
+        "kind": "ServiceMonitor",
+        "metadata": {"name": _scalar(component_name), "namespace": _scalar(app_name)},
+        "spec": {
+            "endpoints": endpoints or None,
+            "selector": {"matchLabels": {"app": _scalar(component_name)}},
+        },
+    }
+
+
+def build_ingress(app_name: str, hosts: list) -> dict:
+    rules = [
+        {
+            "host": _scalar(f"{host['component_name']}.{app_name}.onesource.pt"),
+            "http": {
+                "paths": [
+                    {
+                        "pathType": "Prefix",
+                        "path": "/",
+                        "backend": {
+                            "service": {
+                                "name": _scalar(host["component_name"]),
+                                "port": {"number": _scalar(host["port"])},
+                            }
+                        },
+                    }
+                ]
+            },
+        }
+        for host in hosts
+    ]
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "Ingress",
+        "metadata": {"name": _scalar(f"{app_name}-ingress")},
+        "spec": {"rules": rules or None},
+    }
+
+
+# ----------------------------- Jinja templates ----------------------------- #
+def render_deployment(component: dict) -> dict:
+    rendered_deployment = templates.render(
+        "deployment_template.yaml",
+        name=component["name"],
+        image=component["image"],
+        expose=component.get("expose", ""),
+        env=component.get("env", ""),
+        namespace=component["application"],
+        # secretName=secretName,
+        clusterLabel=component.get("cluster-selector", ""),
+        # service_list=service_list
+        service_list=[],
+    )
+    return yaml.safe_load(rendered_deployment)
+
+
+def render_service(component_name: str, app_name: str, ports_list: list) -> dict:
+    rendered_service = templates.render(
+        "service_template.yaml",
+        name=component_name,
+        expose=ports_list,
+        namespace=app_name,
+    )
+    return yaml.safe_load(rendered_service)
+
+
+def render_servicemonitor(app_name: str, component_name: str, ports_list: list) -> dict:
+    rendered_service_monitor = templates.render(
+        "ServiceMonitor_template.yaml",
+        namespace=app_name,
+        component_name=component_name,
+        expose=ports_list,
+    )
+    return yaml.safe_load(rendered_service_monitor)
+
+
+def render_ingress(app_name: str, hosts: list) -> dict:
+    rendered_ingress = templates.render(
+        "ingress_template.yaml",
+        app_name=app_name,
+        hosts=hosts,
+    )
+    return yaml.safe_load(rendered_ingress)
+
+
+# ----------------------------- Entry points ----------------------------- #
+@metrics.timed_manifest("deployment")
+def deployment_manifest(component: dict) -> dict:
+    if MANIFEST_RENDERER == "jinja":
+        return render_deployment(component)
+    return build_deployment(component)
+
+
+@metrics.timed_manifest("service")
+def service_manifest(component_name: str, app_name: str, ports_list: list) -> dict:
+    if MANIFEST_RENDERER == "jinja":
+        return render_service(component_name, app_name, ports_list)
+    return build_service(component_name, app_name, ports_list)
+
+
+@metrics.timed_manifest("servicemonitor")
+def servicemonitor_manifest(
+    app_name: str, component_name: str, ports_list: list
+) -> dict:
+    if MANIFEST_RENDERER == "jinja":
+        return render_servicemonitor(app_name, component_name, ports_list)
+    return build_servicemonitor(app_name, component_name, ports_list)
+
+
+@metrics.timed_manifest("ingress")
+def ingress_manifest(app_name: str, hosts: list) -> dict:
+    if MANIFEST_RENDERER == "jinja":
+        return render_ingress(app_name, hosts)
+    return build_ingress(app_name, hosts)
@@ -0,0 +1,232 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram
+from prometheus_client import generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from kubernetes.client.rest import ApiException
+import functools
+import time
+
+
+# ---------------------------------- Metrics ---------------------------------- #
+REQUEST_LATENCY = Histogram(
+    "miro_http_request_duration_seconds",
+    "Latency of the requests served by the backend.",
+    ["method", "route", "status"],
+)
+K8S_REQUEST_LATENCY = Histogram(
+    "miro_k8s_api_request_duration_seconds",
+    "Latency of the requests sent to the kubernetes api servers.",
+    ["verb", "kind", "cluster"],
+)
+K8S_REQUEST_ERRORS = Counter(
+    "miro_k8s_api_request_errors_total",
+    "Requests sent to the kubernetes api servers that failed.",
+    ["verb", "kind", "cluster", "status"],
+)
+MANIFEST_BUILD_LATENCY = Histogram(
+    "miro_manifest_build_duration_seconds",
+    "Time spent building (or rendering) a manifest.",
+    ["kind", "renderer"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+APP_QUEUE_WAIT = Histogram(
+    "miro_app_queue_wait_seconds",
+    "Time an operation waited for the previous operations of its application.",
+)
+
+
+# ---------------------------------- Kubernetes api calls ---------------------------------- #
+def describe_call(
+    resource_path: str, method: str, path_params: dict | None, query_params
+) -> tuple[str, str]:
+    """
+    Returns the (verb, kind) of a call of the kubernetes client, from the path template
+    of the generated api ("/api/v1/namespaces/{namespace}/services/{name}" -> get, services).
+    """
+    path_params = path_params or {}
+    segments = [
+        path_params.get(segment[1:-1], segment) if segment.startswith("{") else segment
+        for segment in resource_path.strip("/").split("/")
+    ]
+    # /api/{version}/... or /apis/{group}/{version}/...
+    rest = segments[2:] if segments[0] == "api" else segments[3:]
+    if len(rest) > 2 and rest[0] == "namespaces":
+        rest = rest[2:]
+    kind = rest[0] if rest else "unknown"
+    if len(rest) > 2:
+        # Subresource (status, scale ...)
+        kind = f"{kind}/{rest[2]}"
+
+    named = len(rest) > 1
+    if method == "GET":
+        watch = any(
+            key == "watch" and str(value).lower() == "true"
+            for key, value in query_params or []
+        )
+        verb = "watch" if watch else "get" if named else "list"
+    elif method == "DELETE":
+        verb = "delete" if named else "deletecollection"
+    else:
+        verb = {"POST": "create", "PUT": "update", "PATCH": "patch"}.get(method, method)
+    return verb, kind
+
+
+def observe_call(cluster: str | None, verb: str, kind: str, start: float, error=None):
+    cluster = cluster or "management"
+    K8S_REQUEST_LATENCY.labels(verb, kind, cluster).observe(time.perf_counter() - start)
+    if error is not None:
+        status = str(error.status) if isinstance(error, ApiException) else "error"
+        K8S_REQUEST_ERRORS.labels(verb, kind, cluster, status).inc()
+
+
+# ---------------------------------- Manifests ---------------------------------- #
+def timed_manifest(kind: str):
+    """
+    Decorator of the manifest dispatchers: observes the build time, labeled by renderer
+    (and traces it, see tracing).
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from be.utils.manifests import MANIFEST_RENDERER
+            from common import tracing
+
+            with tracing.start_span(f"build {kind}", renderer=MANIFEST_RENDERER):
+                with MANIFEST_BUILD_LATENCY.labels(kind, MANIFEST_RENDERER).time():
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------------- Caches, threadpool & queues ---------------------------------- #
+class StateCollector:
+    """
+    Reads the counters of the caches, the state of the threadpool and the depth of the
+    application queues when scraped.
+    The modules are imported on collect, they import this module themselves.
+    """
+
+    def describe(self):
+        # Not collected when registered (the modules aren't imported yet)
+        return []
+
+    def collect(self):
+        from be.utils import content_hash, crd_cache, ingress_cache
+        from be.utils.k8s_client_pool import pool
+
+        hits = CounterMetricFamily(
+            "miro_cache_hits", "Lookups served by a cache.", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "miro_cache_misses", "Lookups not served by a cache.", labels=["cache"]
+        )
+        ratio = GaugeMetricFamily(
+            "miro_cache_hit_ratio",
+            "Hits / lookups of a cache since the start.",
+            labels=["cache"],
+        )
+        hash_stats = content_hash.cache.stats()
+        caches = {
+            "client_pool": pool.stats(),
+            "ingress": ingress_cache.cache.stats(),
+            "crd": crd_cache.cache.stats(),
+            "content_hash": {
+                "hits": hash_stats["unchanged"],
+                "misses": hash_stats["applied"],
+            },
+        }
+        for name, stats in caches.items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            lookups = stats["hits"] + stats["misses"]
+            ratio.add_metric([name], stats["hits"] / lookups if lookups else 0)
+        yield hits
+        yield misses
+        yield ratio
+
+        yield from self._threadpool()
+        yield from self._app_queues()
+
+    @staticmethod
+    def _app_queues():
+        from be.utils.keyed_executor import executor
+
+        depth = GaugeMetricFamily(
+            "miro_app_queue_depth",
+            "Operations waiting for the previous operations of their application.",
+            labels=["app"],
+        )
+        for key, waiting in executor.depths().items():
+            depth.add_metric([str(key)], waiting)
+        yield depth
+        yield GaugeMetricFamily(
+            "miro_app_operations_running",
+            "Application operations running.",
+            value=executor.running,
+        )
+
+    @staticmethod
+    def _threadpool():
+        # The limiter of run_in_threadpool (anyio), only reachable from the event loop
+        from anyio import to_thread
+
+        try:
+            statistics = to_thread.current_default_thread_limiter().statistics()
+        except Exception as _:
+            return
+        yield GaugeMetricFamily(
+            "miro_threadpool_threads",
+            "Threads allowed to run blocking calls.",
+            value=statistics.total_tokens,
+        )
+        yield GaugeMetricFamily(
+            "miro_threadpool_busy_threads",
+            "Threads running a blocking call.",
+            value=statistics.borrowed_tokens,
+        )
+        yield GaugeMetricFamily(
+            "miro_threadpool_queue_depth",
+            "Blocking calls waiting for a thread.",
+            value=statistics.tasks_waiting,
+        )
+
+
+REGISTRY.register(StateCollector())
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+# ---------------------------------- Requests ---------------------------------- #
+class MetricsMiddleware:
+    """
+    ASGI middleware observing the latency of each request, labeled by route template
+    (/api/v1/comps/{comp_name}) so that the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], path, str(status["code"])).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,207 @@
+from collections import deque
+from fastapi import HTTPException
+from common import tracing
+from be.utils.keyed_executor import executor
+import asyncio
+import logging
+import time
+import uuid
+import os
+
+
+# Every mutating request is answered 202 + operation id (as with "Prefer: respond-async")
+ASYNC_OPERATIONS = os.environ.get("ASYNC_OPERATIONS", "false") == "true"
+# Seconds during which a finished operation can still be polled
+OPERATION_TTL = float(os.environ.get("OPERATION_TTL", "3600"))
+# Maximum number of finished operations kept
+OPERATION_HISTORY = int(os.environ.get("OPERATION_HISTORY", "10000"))
+# Operations accepted but not finished at most, the next ones are refused (503)
+MAX_PENDING_OPERATIONS = int(os.environ.get("MAX_PENDING_OPERATIONS", "1000"))
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def wants_async(prefer: str | None) -> bool:
+    """
+    True if the request asked to be answered before the work is done (Prefer header,
+    RFC 7240), or if that's the default (ASYNC_OPERATIONS).
+    """
+    if prefer:
+        for preference in prefer.split(","):
+            token = preference.split(";")[0].split("=")[0].strip().lower()
+            if token == "respond-async":
+                return True
+    return ASYNC_OPERATIONS
+
+
+class Operation:
+    """
+    A mutating request processed in the background. The steps are the spans finished so
+    far (queue, kubernetes calls ...), see tracing.
+    """
+
+    def __init__(self, name: str, target: dict):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.target = target
+        self.state = PENDING
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.status_code = None
+        self.result = None
+        self.error = None
+        self.steps = []
+
+    @property
+    def done(self) -> bool:
+        return self.state in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "target": self.target,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "status_code": self.status_code,
+            "result": self.result,
+            "error": self.error,
+            "steps": [
+                {"name": name, "duration_ms": round(duration, 3)}
+                for name, duration in list(self.steps)
+            ],
+        }
+
+
+class OperationStore:
+    """
+    Operations submitted by the routes in asynchronous mode, run as background tasks.
+        - An operation goes through the same per-application queue as the synchronous
+          requests (keyed_executor), so the operations of an application still run in
+          arrival order, and at most APP_CONCURRENCY applications at a time.
+        - on_update(operation) is awaited when the operation is accepted and when it is
+          done (used to write the status of the Component objects).
+        - Finished operations are kept OPERATION_TTL seconds (OPERATION_HISTORY at most).
+        - At most max_pending operations wait or run, beyond that the requests are refused
+          (503 + Retry-After) instead of queueing work that would never catch up.
+    """
+
+    def __init__(self, ttl: float, history: int, max_pending: int):
+        self.ttl = ttl
+        self.history = history
+        self.max_pending = max_pending
+        self.pending = 0
+        self._operations: dict[str, Operation] = {}
+        # Ids of the finished operations, in the order they finished
+        self._finished = deque()
+        self._tasks = set()
+
+    def submit(
+        self,
+        name: str,
+        func,
+        kwargs: dict,
+        status_code: int,
+        target=None,
+        on_update=None,
+    ) -> Operation:
+        """
+        func is a controller operation decorated with _per_application: its key tells the
+        queue of the operation, and the undecorated function is run in that queue.
+        """
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="too many operations in progress",
+                headers={"Retry-After": "1"},
+            )
+        operation = Operation(name, target or {})
+        self._operations[operation.id] = operation
+        self.pending += 1
+        self._prune()
+        key = func.key_of(**kwargs)
+        task = asyncio.get_running_loop().create_task(
+            self._run(operation, key, func.__wrapped__, kwargs, status_code, on_update)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return operation
+
+    async def _run(self, operation, key, func, kwargs, status_code, on_update):
+        with tracing.collect_timings(operation.steps):
+            # The operation joins the queue of its application right away (arrival order),
+            # the notification of the acceptance runs meanwhile
+            accepted = asyncio.create_task(self._notify(operation, on_update))
+            try:
+                await executor.run(key, self._execute, operation, func, kwargs)
+                operation.status_code = status_code
+                operation.state = SUCCEEDED
+            except HTTPException as e:
+                operation.status_code = e.status_code
+                operation.error = e.detail
+                operation.state = FAILED
+            except Exception as e:
+                logging.error(f"Error: [operation {operation.name}] {e!r}")
+                operation.status_code = 500
+                operation.error = "Internal Server Error"
+                operation.state = FAILED
+            operation.finished = time.time()
+            self._finished.append(operation.id)
+            self.pending -= 1
+            await accepted
+            await self._notify(operation, on_update)
+
+    @staticmethod
+    async def _execute(operation: Operation, func, kwargs: dict):
+        operation.state = RUNNING
+        operation.started = time.time()
+        operation.result = await func(**kwargs)
+
+    @staticmethod
+    async def _notify(operation: Operation, on_update):
+        if on_update is None:
+            return
+        try:
+            await on_update(operation)
+        except Exception as e:
+            logging.error(f"Error: [operation {operation.name} update] {e!r}")
+
+    def _prune(self):
+        now = time.time()
+        while self._finished:
+            operation = self._operations[self._finished[0]]
+            if (
+                len(self._finished) <= self.history
+                and now - operation.finished <= self.ttl
+            ):
+                break
+            self._finished.popleft()
+            del self._operations[operation.id]
+
+    def get(self, operation_id: str) -> Operation | None:
+        operation = self._operations.get(operation_id)
+        if operation is not None and operation.done:
+            if time.time() - operation.finished > self.ttl:
+                return None
+        return operation
+
+    def stats(self) -> dict:
+        states = {PENDING: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        for operation in list(self._operations.values()):
+            states[operation.state] += 1
+        return {
+            "operations": len(self._operations),
+            "max_pending": self.max_pending,
+            "states": states,
+        }
+
+
+store = OperationStore(
+    ttl=OPERATION_TTL, history=OPERATION_HISTORY, max_pending=MAX_PENDING_OPERATIONS
+)
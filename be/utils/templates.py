@@ -0,0 +1,38 @@
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+import tempfile
+import threading
+import os
+
+
+TEMPLATE_DIR = os.environ.get("TEMPLATE_DIR")
+# Compiled templates are kept on disk so a restarted backend doesn't compile them again
+TEMPLATE_CACHE_DIR = os.environ.get(
+    "TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "miro-template-cache")
+)
+
+_environment = None
+_lock = threading.Lock()
+
+
+def get_environment() -> Environment:
+    """
+    Returns the environment shared by all the resource operations.
+        - Templates are compiled once and kept in memory.
+        - auto_reload compares the mtime of the template file before each use, so an
+          edited template is recompiled without restarting the backend.
+    """
+    global _environment
+    if _environment is None:
+        with _lock:
+            if _environment is None:
+                os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+                _environment = Environment(
+                    loader=FileSystemLoader(TEMPLATE_DIR),
+                    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+                    auto_reload=True,
+                )
+    return _environment
+
+
+def render(template_name: str, **kwargs) -> str:
+    return get_environment().get_template(template_name).render(**kwargs)
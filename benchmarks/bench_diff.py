@@ -0,0 +1,34 @@
+"""
+Times get_changes of common/helpers.py against the former get_changes (list membership,
+O(n²)) for a growing number of components. Both return the same changes: see
+tests/test_helpers.py.
+Run from the repository root: python -m benchmarks.bench_diff
+"""
+
+import random
+import timeit
+
+from common.helpers import get_changes
+from tests.fixtures import legacy_get_changes, mutate_components, random_components
+
+
+def run(sizes=(10, 100, 1000), number=5):
+    print(f"{'components':>11}{'former (us)':>14}{'hashed (us)':>14}{'speedup':>9}")
+    rng = random.Random(1)
+    for size in sizes:
+        old = random_components(rng, size)
+        new = mutate_components(rng, old)
+        former = min(
+            timeit.repeat(lambda: legacy_get_changes(old, new), number=number, repeat=3)
+        )
+        hashed = min(
+            timeit.repeat(lambda: get_changes(old, new), number=number, repeat=3)
+        )
+        print(
+            f"{size:>11}{former / number * 1e6:>14.1f}{hashed / number * 1e6:>14.1f}"
+            f"{former / hashed:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,68 @@
+"""
+Times the manifest builders of be/utils/manifests.py against the Jinja templates
+(rendering + yaml.safe_load) for a growing number of ports / hosts. Both produce the same
+manifests: see tests/test_manifests.py.
+Run from the repository root: python -m benchmarks.bench_manifests
+"""
+
+import os
+import timeit
+
+
+os.environ.setdefault(
+    "TEMPLATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates"),
+)
+
+from be.utils import manifests  # noqa: E402
+from tests.fixtures import component, hosts, ports  # noqa: E402
+
+
+# (kind, builder, renderer, args)
+def cases(size: int) -> list:
+    return [
+        (
+            "deployment",
+            manifests.build_deployment,
+            manifests.render_deployment,
+            (component(size),),
+        ),
+        (
+            "service",
+            manifests.build_service,
+            manifests.render_service,
+            ("nginx-component", "test-app", ports(size)),
+        ),
+        (
+            "servicemonitor",
+            manifests.build_servicemonitor,
+            manifests.render_servicemonitor,
+            ("test-app", "nginx-component", ports(size)),
+        ),
+        (
+            "ingress",
+            manifests.build_ingress,
+            manifests.render_ingress,
+            ("test-app", hosts(size)),
+        ),
+    ]
+
+
+def run(sizes=(1, 10, 100), number=20):
+    print(
+        f"{'kind':<16}{'size':>6}{'jinja+yaml (us)':>18}{'builder (us)':>15}{'speedup':>9}"
+    )
+    for size in sizes:
+        for kind, builder, renderer, args in cases(size):
+            rendered = min(
+                timeit.repeat(lambda: renderer(*args), number=number, repeat=3)
+            )
+            built = min(timeit.repeat(lambda: builder(*args), number=number, repeat=3))
+            print(
+                f"{kind:<16}{size:>6}{rendered / number * 1e6:>18.1f}"
+                f"{built / number * 1e6:>15.1f}{rendered / built:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    run()
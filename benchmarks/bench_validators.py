@@ -0,0 +1,216 @@
+"""
+Compares the admission validation of llo/kopf_operator/validators.py with the former
+validate_app / validate_comp handlers (regex compiled and FORBIDDEN_NAMES split on every
+call, components walked several times).
+    - First checks that both accept and reject the same objects (conformance).
+    - Then times both for a growing size (components of the application, ports of the
+      component), with and without the decisions cache.
+Run from the repository root: python -m benchmarks.bench_validators
+"""
+
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+
+CLUSTERS = [f"kind-workload-{i}" for i in range(1, 11)]
+MANAGEMENT_CLUSTER = "kind-management-cluster"
+
+
+def _write_kubeconfig() -> str:
+    # The cluster registry only needs the contexts of the kubeconfig
+    clusters = CLUSTERS + [MANAGEMENT_CLUSTER]
+    lines = ["apiVersion: v1", "kind: Config", "clusters:"]
+    for cluster in clusters:
+        lines += [f"- name: {cluster}", "  cluster:", "    server: https://127.0.0.1"]
+    lines.append("contexts:")
+    for cluster in clusters:
+        lines += [f"- name: {cluster}", "  context:", f"    cluster: {cluster}"]
+        lines.append(f"    user: {cluster}")
+    lines.append("users:")
+    for cluster in clusters:
+        lines += [f"- name: {cluster}", "  user: {}"]
+    lines.append(f"current-context: {MANAGEMENT_CLUSTER}")
+    path = os.path.join(tempfile.mkdtemp(), "config")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+os.environ["KUBECONFIG"] = _write_kubeconfig()
+os.environ["MANAGEMENT_CLUSTER"] = MANAGEMENT_CLUSTER
+os.environ.setdefault(
+    "FORBIDDEN_NAMES",
+    "local-path-storage,kube-system,kube-public,kube-node-lease,ingress-nginx,monitoring,default",
+)
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "llo", "kopf_operator")
+)
+
+from common import cluster_registry  # noqa: E402
+import validators  # noqa: E402
+
+
+# ---------------------------------- Former handlers ---------------------------------- #
+def legacy_validate_app(body, spec) -> str | None:
+    regex = re.compile("^(?![0-9]+$)(?!-)[a-zA-Z0-9-]{,63}(?<!-)$")
+    if regex.match(spec.get("name")) is None:
+        return "application name must be a valid DNS label name."
+    for component in spec.get("components"):
+        if regex.match(component.get("name")) is None:
+            return "component name must be a valid DNS label name."
+    forbidden_names = os.environ.get("FORBIDDEN_NAMES").split(",")
+    if spec.get("name") in forbidden_names:
+        return "application name forbidden, please choose another name for your application."
+    management_cluster = os.environ.get("MANAGEMENT_CLUSTER")
+    if spec.get("cluster") == management_cluster:
+        return f"cluster must not be the {management_cluster}"
+    for component in spec.get("components"):
+        if component.get("cluster") == management_cluster:
+            return f"cluster must not be the {management_cluster}"
+    if not cluster_registry.registry.has_cluster(spec.get("cluster")):
+        return "Application cluster doesn't exist"
+    for component in spec.get("components"):
+        if not cluster_registry.registry.has_cluster(component.get("cluster")):
+            return f"Cluster of component {component.get('name')} doesn't exist"
+    if (
+        "namespace" in body.get("metadata")
+        and body.get("metadata").get("namespace") != "default"
+    ):
+        return "namespace must be set to default"
+    if body.get("metadata").get("name", "") != spec.get("name"):
+        return "metatdata.name must be the same as spec.name"
+    return None
+
+
+def legacy_validate_comp(body, spec) -> str | None:
+    regex = re.compile("^(?![0-9]+$)(?!-)[a-zA-Z0-9-]{,63}(?<!-)$")
+    if regex.match(spec.get("name")) is None:
+        return "component name must be a valid DNS label name."
+    if regex.match(spec.get("application")) is None:
+        return "application name must be a valid DNS label name."
+    if sum([exp.get("is-public") for exp in spec.get("expose", [])]) > 1:
+        return "is-public set to true for two deffirent ports"
+    for exp in spec.get("expose", []):
+        if exp.get("is-public") == True and exp.get("is-peered") == False:
+            return "is-public set to true but is-peered set to false"
+    for exp in spec.get("expose", []):
+        if exp.get("is-exposing-metrics") == True and exp.get("is-peered") == False:
+            return "is-exposing-metrics set to true but is-peered set to false"
+    if "namespace" in body.get("metadata") and body.get("metadata").get(
+        "namespace"
+    ) != spec.get("application"):
+        return f"namespace must be set to {spec.get('application')}"
+    if body.get("metadata").get("name", "") != spec.get("name"):
+        return "metatdata.name must be the same as spec.name"
+    return None
+
+
+# ---------------------------------- Objects ---------------------------------- #
+def _application(count: int, **overrides) -> dict:
+    spec = {
+        "name": "test-app",
+        "cluster": CLUSTERS[0],
+        "components": [
+            {"name": f"comp-{i}", "cluster": CLUSTERS[i % len(CLUSTERS)]}
+            for i in range(count)
+        ],
+    }
+    spec.update(overrides)
+    return {"metadata": {"name": spec["name"], "namespace": "default"}, "spec": spec}
+
+
+def _component(ports: int = 2, **overrides) -> dict:
+    spec = {
+        "name": "nginx-component",
+        "application": "test-app",
+        "expose": [
+            {"is-public": i == 0, "is-peered": True, "is-exposing-metrics": i % 2 == 0}
+            for i in range(ports)
+        ],
+    }
+    spec.update(overrides)
+    return {"metadata": {"name": spec["name"], "namespace": "test-app"}, "spec": spec}
+
+
+def check_conformance():
+    applications = [
+        _application(3),
+        _application(3, name="-bad"),
+        _application(3, name="default"),
+        _application(3, cluster=MANAGEMENT_CLUSTER),
+        _application(3, cluster="unknown"),
+        _application(0, components=[{"name": "x", "cluster": "unknown"}]),
+        _application(0, components=[{"name": "x_", "cluster": CLUSTERS[0]}]),
+        {**_application(1), "metadata": {"name": "test-app", "namespace": "ns"}},
+        {**_application(1), "metadata": {"name": "other"}},
+    ]
+    components = [
+        _component(),
+        _component(name="-bad"),
+        _component(application="bad_"),
+        _component(expose=[{"is-public": True, "is-peered": True}] * 2),
+        _component(expose=[{"is-public": True, "is-peered": False}]),
+        _component(
+            expose=[
+                {"is-public": False, "is-exposing-metrics": True, "is-peered": False}
+            ]
+        ),
+        {**_component(), "metadata": {"name": "nginx-component", "namespace": "x"}},
+        {**_component(), "metadata": {"name": "other"}},
+    ]
+    for body in applications:
+        legacy = legacy_validate_app(body, body["spec"])
+        violations = validators.check_app(body, cluster_registry.registry.clusters())
+        assert (legacy is None) == (not violations), f"{body}: {legacy} / {violations}"
+    for body in components:
+        legacy = legacy_validate_comp(body, body["spec"])
+        violations = validators.check_comp(body)
+        assert (legacy is None) == (not violations), f"{body}: {legacy} / {violations}"
+    print(f"conformance: {len(applications) + len(components)} cases OK")
+
+
+def run(sizes=(10, 100, 1000), number=20):
+    print(
+        f"{'kind':<13}{'size':>11}{'former (us)':>14}{'single-pass (us)':>18}"
+        f"{'cached (us)':>13}{'speedup':>9}"
+    )
+    clusters = cluster_registry.registry.clusters
+    cached = validators.Validator(size=16)
+    for size in sizes:
+        cases = [
+            (
+                "application",
+                _application(size),
+                legacy_validate_app,
+                lambda body: validators.check_app(body, clusters()),
+                cached.validate_app,
+            ),
+            (
+                "component",
+                _component(size),
+                legacy_validate_comp,
+                validators.check_comp,
+                cached.validate_comp,
+            ),
+        ]
+        for kind, body, legacy, single_pass, cache in cases:
+            timings = [
+                min(timeit.repeat(call, number=number, repeat=3)) / number * 1e6
+                for call in (
+                    lambda: legacy(body, body["spec"]),
+                    lambda: single_pass(body),
+                    lambda: cache(body),
+                )
+            ]
+            print(
+                f"{kind:<13}{size:>11}{timings[0]:>14.1f}{timings[1]:>18.1f}"
+                f"{timings[2]:>13.1f}{timings[0] / min(timings[1:]):>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    check_conformance()
+    run()
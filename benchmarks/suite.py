@@ -0,0 +1,251 @@
+"""
+Benchmark suite of the hot paths of the backend, run with pytest-benchmark so that the
+results are stored as json per commit and the regressions show up between commits.
+    - templates: jinja rendering + yaml.safe_load of each template (and the builders).
+    - diff: helpers.get_changes for 10, 1k and 10k components.
+    - ingress: _get_existing_hosts / add_host_to_ingress for a growing number of hosts.
+    - validation: validate_app / validate_comp (single pass, and cached).
+    - flows: full create_comp / delete_comp against an in-memory api client (no I/O).
+Run from the repository root (pip install -r requirements-dev.txt):
+    python -m pytest benchmarks/suite.py --benchmark-storage=benchmarks/results --benchmark-autosave
+        # writes benchmarks/results/<machine>/<run>_<commit>.json
+    python -m pytest benchmarks/suite.py --benchmark-storage=benchmarks/results \\
+        --benchmark-compare --benchmark-compare-fail=median:20%
+        # compares with the last saved run, fails when a median got 20% slower
+    python -m pytest benchmarks/suite.py -k hosts --benchmark-json=hosts.json
+"""
+
+import asyncio
+import os
+
+
+os.environ.setdefault(
+    "TEMPLATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates"),
+)
+# The flows run against an in-memory client: no watch-backed cache
+os.environ["INGRESS_CACHE_ENABLED"] = "false"
+os.environ["CRD_CACHE_ENABLED"] = "false"
+
+import pytest  # noqa: E402
+
+from benchmarks import bench_validators  # noqa: E402  (sets the kubeconfig up)
+from kubernetes import client  # noqa: E402
+from kubernetes.client.rest import ApiException  # noqa: E402
+from be.controllers import app_controller  # noqa: E402
+from be.utils import ingress_writer, k8s_resource_manager, manifests  # noqa: E402
+from be.utils.k8s_client_pool import ClusterClient  # noqa: E402
+from common import helpers  # noqa: E402
+from tests import fixtures  # noqa: E402
+
+CLUSTERS = bench_validators.CLUSTERS
+
+
+# ---------------------------------- In-memory api client ---------------------------------- #
+class StubApiClient(client.ApiClient):
+    """
+    ApiClient answering every call from memory, without sending any request: the objects
+    written are kept by path, so that the flows (read, apply, create, delete) behave as
+    against an api server, and the responses are deserialized like real ones.
+    """
+
+    def __init__(self):
+        super().__init__(client.Configuration())
+        self.objects: dict[str, dict] = {}
+
+    def call_api(
+        self,
+        resource_path,
+        method,
+        path_params=None,
+        query_params=None,
+        header_params=None,
+        body=None,
+        *args,
+        response_type=None,
+        **kwargs,
+    ):
+        path = resource_path.format(**(path_params or {}))
+        if body is not None:
+            body = self.sanitize_for_serialization(body)
+        if method == "POST":
+            path = f"{path}/{body['metadata']['name']}"
+            if path in self.objects:
+                raise ApiException(status=409, reason="Conflict")
+            self.objects[path] = body
+            result = body
+        elif method in ("PUT", "PATCH"):
+            self.objects[path] = body
+            result = body
+        elif method == "GET":
+            if path not in self.objects:
+                raise ApiException(status=404, reason="Not Found")
+            result = self.objects[path]
+        elif path in self.objects:
+            result = self.objects.pop(path)
+        else:
+            # Collection: every object under the path
+            deleted = [key for key in self.objects if key.startswith(f"{path}/")]
+            if not deleted:
+                raise ApiException(status=404, reason="Not Found")
+            result = {"items": [self.objects.pop(key) for key in deleted]}
+        if response_type is None or response_type == "object":
+            return result
+        return self._ApiClient__deserialize(result, response_type)
+
+
+def stub_cluster_client(context: str = CLUSTERS[0]) -> ClusterClient:
+    return ClusterClient(context, StubApiClient())
+
+
+# ---------------------------------- Objects ---------------------------------- #
+def _components(count: int, migrated: int = 0) -> list:
+    return [
+        {"name": f"comp-{i}", "cluster": CLUSTERS[(i + migrated) % len(CLUSTERS)]}
+        for i in range(count)
+    ]
+
+
+def _stub_with_ingress(hosts: int) -> ClusterClient:
+    cluster_client = stub_cluster_client()
+    if hosts:
+        body = manifests.ingress_manifest(
+            app_name="test-app", hosts=fixtures.hosts(hosts)
+        )
+        body["metadata"].update(namespace="test-app", resourceVersion="1")
+        path = "/apis/networking.k8s.io/v1/namespaces/test-app/ingresses"
+        cluster_client.api_client.objects[f"{path}/test-app-ingress"] = body
+    return cluster_client
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+# ---------------------------------- templates ---------------------------------- #
+TEMPLATE_ARGUMENTS = {
+    "deployment": lambda size: (fixtures.component(size),),
+    "service": lambda size: ("nginx-component", "test-app", fixtures.ports(size)),
+    "servicemonitor": lambda size: (
+        "test-app",
+        "nginx-component",
+        fixtures.ports(size),
+    ),
+    "ingress": lambda size: ("test-app", fixtures.hosts(size)),
+}
+
+
+@pytest.mark.benchmark(group="templates")
+@pytest.mark.parametrize("size", [1, 10])
+@pytest.mark.parametrize("renderer", ["render", "build"])
+@pytest.mark.parametrize("kind", list(TEMPLATE_ARGUMENTS))
+def test_templates(benchmark, kind, renderer, size):
+    func = getattr(manifests, f"{renderer}_{kind}")
+    benchmark(func, *TEMPLATE_ARGUMENTS[kind](size))
+
+
+# ---------------------------------- diff ---------------------------------- #
+@pytest.mark.benchmark(group="diff")
+@pytest.mark.parametrize("components", [10, 1000, 10000])
+def test_get_changes(benchmark, components):
+    # A tenth of the components removed, added and migrated
+    tenth = components // 10
+    old = _components(components)
+    new = _components(components - tenth)
+    new += [{"name": f"new-{i}", "cluster": CLUSTERS[0]} for i in range(tenth)]
+    for component in new[:tenth]:
+        component["cluster"] = CLUSTERS[-1]
+    benchmark(helpers.get_changes, old, new)
+
+
+# ---------------------------------- ingress ---------------------------------- #
+@pytest.mark.benchmark(group="ingress")
+@pytest.mark.parametrize("hosts", [1, 10, 100, 1000])
+def test_get_existing_hosts(benchmark, hosts):
+    cluster_client = _stub_with_ingress(hosts)
+    benchmark(
+        ingress_writer._get_existing_hosts, cluster_client, "test-app", use_cache=False
+    )
+
+
+@pytest.mark.benchmark(group="ingress")
+@pytest.mark.parametrize("hosts", [1, 10, 100, 1000])
+def test_add_and_remove_host(benchmark, hosts):
+    cluster_client = _stub_with_ingress(hosts)
+
+    def add():
+        # Adds a host then removes it, so that every call writes the ingress
+        k8s_resource_manager.add_host_to_ingress(
+            app_name="test-app",
+            app_cluster_client=cluster_client,
+            component_name="added-component",
+            port=7000,
+        )
+        k8s_resource_manager.remove_host_from_ingress(
+            component_name="added-component",
+            app_name="test-app",
+            app_cluster_client=cluster_client,
+        )
+
+    benchmark(add)
+
+
+# ---------------------------------- validation ---------------------------------- #
+@pytest.mark.benchmark(group="validation")
+@pytest.mark.parametrize("cached", [False, True])
+@pytest.mark.parametrize("components", [10, 100, 1000])
+def test_validate_app(benchmark, components, cached):
+    validators = bench_validators.validators
+    body = bench_validators._application(components)
+    if cached:
+        # The decision is cached by the first call, the timed calls only hash the object
+        check = validators.Validator(size=16).validate_app
+        check(body)
+        benchmark(check, body)
+    else:
+        clusters = bench_validators.cluster_registry.registry.clusters
+        benchmark(lambda: validators.check_app(body, clusters()))
+
+
+@pytest.mark.benchmark(group="validation")
+@pytest.mark.parametrize("cached", [False, True])
+@pytest.mark.parametrize("ports", [10, 100, 1000])
+def test_validate_comp(benchmark, ports, cached):
+    validators = bench_validators.validators
+    body = bench_validators._component(ports)
+    if cached:
+        check = validators.Validator(size=16).validate_comp
+        check(body)
+        benchmark(check, body)
+    else:
+        benchmark(validators.check_comp, body)
+
+
+# ---------------------------------- flows ---------------------------------- #
+@pytest.mark.benchmark(group="flows")
+@pytest.mark.parametrize("ports", [1, 10])
+def test_create_and_delete_comp(benchmark, loop, ports):
+    cluster_client = stub_cluster_client()
+    spec = fixtures.component(ports)
+
+    async def cycle():
+        await app_controller._create_comp(spec, cluster_client)
+        await app_controller._delete_comp(spec, cluster_client)
+
+    benchmark(lambda: loop.run_until_complete(cycle()))
+
+
+@pytest.mark.benchmark(group="flows")
+@pytest.mark.parametrize("ports", [1, 10])
+def test_create_unchanged_comp(benchmark, loop, ports):
+    cluster_client = stub_cluster_client()
+    spec = fixtures.component(ports)
+    loop.run_until_complete(app_controller._create_comp(spec, cluster_client))
+    benchmark(
+        lambda: loop.run_until_complete(
+            app_controller._create_comp(spec, cluster_client)
+        )
+    )
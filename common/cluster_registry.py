@@ -0,0 +1,70 @@
+from kubernetes import config
+import threading
+import os
+
+
+def kubeconfig_paths() -> list[str]:
+    # KUBECONFIG may hold several files separated by ":" (same rule as kubectl)
+    paths = config.KUBE_CONFIG_DEFAULT_LOCATION.split(os.pathsep)
+    return [os.path.expanduser(path) for path in paths if path]
+
+
+def kubeconfig_signature() -> tuple:
+    signature = []
+    for path in kubeconfig_paths():
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class ClusterRegistry:
+    """
+    Maps every cluster of the kubeconfig to its context.
+        - The kubeconfig is parsed once, lookups are dict lookups.
+        - The map is rebuilt when the kubeconfig file changes on disk.
+    Shared by the backend (get_context) and the admission webhooks of the operator.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._contexts: dict[str, str] = {}
+        self.reloads = 0
+
+    def _refresh(self) -> dict[str, str]:
+        signature = kubeconfig_signature()
+        if signature == self._signature:
+            return self._contexts
+        with self._lock:
+            if signature != self._signature:
+                contexts, _ = config.list_kube_config_contexts()
+                cluster_contexts = {}
+                for context in contexts:
+                    # Keep the first context of each cluster, like the former linear scan
+                    cluster_contexts.setdefault(
+                        context["context"]["cluster"], context["name"]
+                    )
+                self._contexts = cluster_contexts
+                self._signature = signature
+                self.reloads += 1
+            return self._contexts
+
+    def get_context(self, cluster: str) -> str | None:
+        return self._refresh().get(cluster)
+
+    def has_cluster(self, cluster: str) -> bool:
+        return cluster in self._refresh()
+
+    def clusters(self) -> set[str]:
+        return set(self._refresh())
+
+    def generation(self) -> int:
+        """Changes every time the map is rebuilt, so that callers can cache decisions."""
+        self._refresh()
+        return self.reloads
+
+
+registry = ClusterRegistry()
@@ -0,0 +1,138 @@
+def get_changes(old: dict | None, new: dict | None) -> tuple[list, list, list]:
+    """
+    This function compares between the old and new dict and returns the changes detected, which could be:
+        - New components added to the application.
+        - Some components Deleted from the application.
+        - Some components changed the cluster (migration).
+    """
+    # All the components were added
+    if old is None:
+        return new, [], []
+
+    # All the components were removed
+    if new is None:
+        return [], old, []
+
+    # Set lookups instead of list lookups: O(n) instead of O(n²), same result
+    old_frozen = [_freeze(obj) for obj in old]
+    new_frozen = [_freeze(obj) for obj in new]
+    old_keys, new_keys = set(old_frozen), set(new_frozen)
+    added_components = [obj for obj, key in zip(new, new_frozen) if key not in old_keys]
+    removed_components = [
+        obj for obj, key in zip(old, old_frozen) if key not in new_keys
+    ]
+
+    old_dict = {obj["name"]: obj["cluster"] for obj in old}
+    new_dict = {obj["name"]: obj["cluster"] for obj in new}
+
+    migrated_components = [
+        {"name": name, "old_cluster": old_dict[name], "new_cluster": cluster}
+        for name, cluster in new_dict.items()
+        if name in old_dict and old_dict[name] != cluster
+    ]
+
+    return added_components, removed_components, migrated_components
+
+
+def _freeze(value):
+    """
+    This function returns a hashable copy of a json value (dicts and lists become frozensets
+    and tuples), equal for equal values.
+    """
+    if isinstance(value, dict):
+        try:
+            # Fast path: flat dicts (name, cluster ...)
+            return frozenset(value.items())
+        except TypeError:
+            return frozenset((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# ------------------------------------------------------------ #
+# Field classification of the changes of a Component spec
+PORT_KEY = "containerPort"
+PORT_FLAGS = ("is-public", "is-peered", "is-exposing-metrics")
+# The spec fields used by the deployment manifest, see manifests.build_deployment
+DEPLOYMENT_FIELDS = frozenset(["image", "env", "cluster", "ports"])
+
+
+def diff_by_key(old: list | None, new: list | None, key) -> tuple[list, list, list]:
+    """
+    This function compares two lists of dicts matched by key(obj) in O(n) and returns:
+        - The objects added (in new only).
+        - The objects removed (in old only).
+        - The objects changed: (old_obj, new_obj, set of the fields that differ).
+    The order of the lists is ignored. If a key is duplicated, the lists can't be matched:
+    every old object is reported as removed and every new object as added.
+    """
+    old, new = old or [], new or []
+    old_dict = {key(obj): obj for obj in old}
+    new_dict = {key(obj): obj for obj in new}
+    if len(old_dict) != len(old) or len(new_dict) != len(new):
+        return list(new), list(old), []
+
+    added = [obj for k, obj in new_dict.items() if k not in old_dict]
+    removed = [obj for k, obj in old_dict.items() if k not in new_dict]
+    changed = []
+    for k, new_obj in new_dict.items():
+        old_obj = old_dict.get(k)
+        if old_obj is None or old_obj == new_obj:
+            continue
+        fields = {
+            field
+            for field in old_obj.keys() | new_obj.keys()
+            if old_obj.get(field) != new_obj.get(field)
+        }
+        changed.append((old_obj, new_obj, fields))
+    return added, removed, changed
+
+
+def diff_ports(old: list | None, new: list | None) -> tuple[list, list, list]:
+    """
+    This function compares the expose lists of a component, ports matched by containerPort.
+    """
+    return diff_by_key(old, new, key=lambda port: port.get(PORT_KEY))
+
+
+def port_flag_changed(ports_diff: tuple[list, list, list], flag: str) -> bool:
+    """
+    This function tells whether the ports having the flag (is-peered, is-exposing-metrics ...)
+    changed: a port with the flag added or removed, the flag switched, or the clusterPort
+    of a port with the flag changed.
+    """
+    added, removed, changed = ports_diff
+    if any(port.get(flag) == True for port in added + removed):
+        return True
+    for old_port, new_port, fields in changed:
+        if flag in fields:
+            return True
+        if new_port.get(flag) == True and fields - set(PORT_FLAGS):
+            return True
+    return False
+
+
+def diff_component(old: dict | None, new: dict | None) -> set[str]:
+    """
+    This function classifies the changes between two Component specs by field:
+        - "image", "env", "replicas", "tls" ... : the top level field changed.
+        - "cluster": the cluster-selector changed.
+        - "ports": a port was added or removed (containerPort).
+        - "clusterPort", "is-public", "is-peered", "is-exposing-metrics": changed in a port.
+    """
+    old, new = old or {}, new or {}
+    fields = set()
+    for field in old.keys() | new.keys():
+        if field == "expose" or old.get(field) == new.get(field):
+            continue
+        fields.add("cluster" if field == "cluster-selector" else field)
+
+    added, removed, changed = diff_ports(old.get("expose"), new.get("expose"))
+    if added or removed:
+        fields.add("ports")
+        for port in added + removed:
+            fields.update(flag for flag in PORT_FLAGS if port.get(flag) == True)
+    for _, _, port_fields in changed:
+        fields.update(port_fields)
+    return fields
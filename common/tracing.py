@@ -0,0 +1,247 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import threading
+import asyncio
+import logging
+import json
+import time
+import os
+import re
+
+
+# Spans are written to this file, one json object per line (OTLP field names), if set
+TRACE_FILE = os.environ.get("TRACE_FILE")
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true") == "true"
+
+# W3C trace context: version-traceid-parentid-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_NOT_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+class Span:
+    """
+    A timed step of a trace. The trace id is shared by the spans of the same kopf event,
+    from the handler of the operator to the kubernetes api calls of the backend.
+    """
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: str | None, attributes: dict
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time_ns()) - self.start) / 1e6
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start,
+            "endTimeUnixNano": self.end,
+            "attributes": self.attributes,
+            "status": (
+                {"code": "ERROR", "message": self.error}
+                if self.error
+                else {"code": "OK"}
+            ),
+        }
+
+
+class FileExporter:
+    """
+    Appends the finished spans to TRACE_FILE (json lines), which can be shipped to any
+    OTLP collector (filelog receiver) or read directly.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if not self.path:
+            return
+        line = json.dumps(span.to_dict(), default=str)
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logging.error(f"Error: [trace export] {e!r}")
+
+
+exporter = FileExporter(TRACE_FILE)
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+# Durations of the finished spans of the current request, see Server-Timing
+_timings: ContextVar[list | None] = ContextVar("timings", default=None)
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    match = _TRACEPARENT.match(value or "")
+    if match is None:
+        return None
+    return match.group(1), match.group(2)
+
+
+def in_trace() -> bool:
+    return _current_span.get() is not None
+
+
+def current_traceparent() -> str | None:
+    span = _current_span.get()
+    return span.traceparent() if span is not None else None
+
+
+@contextmanager
+def start_span(name: str, traceparent: str | None = None, **attributes):
+    """
+    Opens a span, child of the current span, or of the remote parent given as a
+    traceparent header, or the root of a new trace.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    parent = _current_span.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote is not None:
+        trace_id, parent_id = remote
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+
+    span = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = repr(e)
+        raise e
+    finally:
+        span.end = time.time_ns()
+        _current_span.reset(token)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((span.name, span.duration_ms))
+        exporter.export(span)
+
+
+@contextmanager
+def collect_timings(timings: list):
+    """
+    Appends the (name, duration) of the spans finished in the block to timings, instead
+    of the timings of the current request.
+    """
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def traced(name: str | None = None):
+    """
+    Decorator opening a span around each call of the function (sync or async).
+    """
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing(timings: list, total_ms: float) -> str:
+    """
+    Server-Timing header value: the time spent in each step (summed by span name).
+    """
+    steps = {}
+    for name, duration in timings:
+        token = _NOT_TOKEN.sub("_", name)
+        count, total = steps.get(token, (0, 0.0))
+        steps[token] = (count + 1, total + duration)
+    entries = [
+        (
+            f'{token};dur={total:.1f};desc="x{count}"'
+            if count > 1
+            else f"{token};dur={total:.1f}"
+        )
+        for token, (count, total) in steps.items()
+    ]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the span of each request (child of the traceparent header
+    sent by the operator) and adding the Server-Timing header to the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode() or None
+        timings = []
+        timings_token = _timings.set(timings)
+        start = time.perf_counter()
+
+        with start_span(
+            f"{scope['method']} {scope['path']}",
+            traceparent=traceparent,
+            method=scope["method"],
+            path=scope["path"],
+        ) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    route = scope.get("route")
+                    if route is not None:
+                        span.name = f"{scope['method']} {route.path_format}"
+                    span.attributes["status"] = message["status"]
+                    value = server_timing(
+                        list(timings), (time.perf_counter() - start) * 1000
+                    )
+                    message["headers"] = list(message.get("headers") or []) + [
+                        (b"server-timing", value.encode()),
+                        (b"traceresponse", span.traceparent().encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                _timings.reset(timings_token)
@@ -1,131 +1,196 @@
-import requests
+from app_module.http_client import BackendResponse, client
+import aiohttp
+import asyncio
 import os
 import logging
 
+
 # API_URL = "http://orch-backend.orchestration.miro.onesource.pt/v1"
 API_URL = os.environ.get("API_URL")
+# The backend answers 202 right away and does the work in the background (the outcome is
+# written to the status of the Component), so the handlers don't wait for it
+API_ASYNC_OPERATIONS = os.environ.get("API_ASYNC_OPERATIONS", "false") == "true"
+HEADERS = {"Prefer": "respond-async"} if API_ASYNC_OPERATIONS else {}
 
 
+# The requests share the pooled, retrying aiohttp session of http_client (timeouts included)
 # -------------------------------------------------------------------- #
-def create_app(spec: dict) -> requests.Response | None:
+async def create_app(spec: dict) -> BackendResponse | None:
     logging.info("create_app function is called.")
     url = API_URL + "/apps"
     try:
-        response = requests.post(url=url, json=spec)
+        response = await client.post(url=url, json=spec, headers=HEADERS)
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error("A connection error occurred. [create_app function]")
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [create_app function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [create_app function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [create_app function]")
     return None
 
 
-def delete_app(spec: dict) -> requests.Response | None:
+async def delete_app(spec: dict) -> BackendResponse | None:
     logging.info("delete_app function is called.")
     url = API_URL + f"/apps/{spec['name']}"
     try:
-        response = requests.delete(url=url, json=spec)
+        response = await client.delete(url=url, json=spec, headers=HEADERS)
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error("A connection error occurred. [delete_app function]")
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [delete_app function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [delete_app function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [delete_app function]")
     return None
 
 
-def update_app(spec: dict, old: list, new: list) -> requests.Response | None:
+async def update_app(spec: dict, old: list, new: list) -> BackendResponse | None:
     logging.info("update_app function is called.")
     url = API_URL + f"/apps/{spec['name']}"
     try:
-        response = requests.put(url=url, json={"spec": spec, "old": old, "new": new})
+        response = await client.put(
+            url=url, json={"spec": spec, "old": old, "new": new}, headers=HEADERS
+        )
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error("A connection error occurred. [update_app function]")
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [update_app function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [update_app function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [update_app function]")
     return None
 
 
 # -------------------------------------------------------------------- #
-def create_comp(spec: dict) -> requests.Response | None:
+async def create_comp(spec: dict) -> BackendResponse | None:
     logging.info("create_comp function is called.")
     url = API_URL + "/comps"
     try:
-        response = requests.post(url=url, json=spec)
+        response = await client.post(url=url, json=spec, headers=HEADERS)
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error("A connection error occurred. [create_comp function]")
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [create_comp function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [create_comp function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [create_comp function]")
     return None
 
 
-def delete_comp(spec: dict) -> requests.Response | None:
+async def delete_comp(spec: dict) -> BackendResponse | None:
     logging.info("delete_comp function is called.")
     url = API_URL + f"/comps/{spec['name']}"
     try:
-        response = requests.delete(url=url, json=spec)
+        response = await client.delete(url=url, json=spec, headers=HEADERS)
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error("A connection error occurred. [delete_comp function]")
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [delete_comp function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [delete_comp function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [delete_comp function]")
     return None
 
 
-def update_comp_deployment(spec: dict) -> requests.Response | None:
+async def update_comp_deployment(spec: dict) -> BackendResponse | None:
     logging.info("update_comp_deployment function is called.")
     url = API_URL + f"/comps/{spec['name']}/deployment"
     try:
-        response = requests.put(url=url, json=spec)
+        response = await client.put(url=url, json=spec, headers=HEADERS)
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error("A connection error occurred. [update_comp_deployment function]")
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [update_comp_deployment function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [update_comp_deployment function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [update_comp_deployment function]")
     return None
 
 
-def update_comp_expose_field(
+async def update_comp_expose_field(
     spec: dict, old: list, new: list
-) -> requests.Response | None:
+) -> BackendResponse | None:
     logging.info("update_comp_expose_field function is called.")
     url = API_URL + f"/comps/{spec['name']}/expose"
     try:
-        response = requests.put(url=url, json={"spec": spec, "old": old, "new": new})
+        response = await client.put(
+            url=url, json={"spec": spec, "old": old, "new": new}, headers=HEADERS
+        )
         return response
-    except requests.exceptions.ConnectionError:
+    except aiohttp.ClientConnectionError:
         logging.error(
             "A connection error occurred. [update_comp_expose_field function]"
         )
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         logging.error("The request timed out. [update_comp_expose_field function]")
-    except requests.exceptions.HTTPError as _:
+    except aiohttp.ClientResponseError as _:
         logging.error("HTTP Error. [update_comp_expose_field function]")
-    except requests.exceptions.RequestException as _:
+    except aiohttp.ClientError as _:
         logging.error("An error occurred. [update_comp_expose_field function]")
     return None
+
+
+# -------------------------------------------------------------------- #
+# Batch: many components of the same application in one request
+async def create_comps(app_name: str, specs: list) -> BackendResponse | None:
+    logging.info("create_comps function is called.")
+    url = API_URL + f"/apps/{app_name}/comps:batch"
+    try:
+        response = await client.post(url=url, json=specs, headers=HEADERS)
+        return response
+    except aiohttp.ClientConnectionError:
+        logging.error("A connection error occurred. [create_comps function]")
+    except asyncio.TimeoutError:
+        logging.error("The request timed out. [create_comps function]")
+    except aiohttp.ClientResponseError as _:
+        logging.error("HTTP Error. [create_comps function]")
+    except aiohttp.ClientError as _:
+        logging.error("An error occurred. [create_comps function]")
+    return None
+
+
+async def update_comps(app_name: str, items: list) -> BackendResponse | None:
+    logging.info("update_comps function is called.")
+    url = API_URL + f"/apps/{app_name}/comps:batch"
+    try:
+        response = await client.put(url=url, json=items, headers=HEADERS)
+        return response
+    except aiohttp.ClientConnectionError:
+        logging.error("A connection error occurred. [update_comps function]")
+    except asyncio.TimeoutError:
+        logging.error("The request timed out. [update_comps function]")
+    except aiohttp.ClientResponseError as _:
+        logging.error("HTTP Error. [update_comps function]")
+    except aiohttp.ClientError as _:
+        logging.error("An error occurred. [update_comps function]")
+    return None
+
+
+async def delete_comps(app_name: str, specs: list) -> BackendResponse | None:
+    logging.info("delete_comps function is called.")
+    url = API_URL + f"/apps/{app_name}/comps:batch"
+    try:
+        response = await client.delete(url=url, json=specs, headers=HEADERS)
+        return response
+    except aiohttp.ClientConnectionError:
+        logging.error("A connection error occurred. [delete_comps function]")
+    except asyncio.TimeoutError:
+        logging.error("The request timed out. [delete_comps function]")
+    except aiohttp.ClientResponseError as _:
+        logging.error("HTTP Error. [delete_comps function]")
+    except aiohttp.ClientError as _:
+        logging.error("An error occurred. [delete_comps function]")
+    return None
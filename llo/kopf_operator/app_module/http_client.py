@@ -0,0 +1,171 @@
+from common import tracing
+from collections import deque
+import aiohttp
+import asyncio
+import logging
+import random
+import time
+import os
+
+
+# Timeouts (seconds) of the requests sent to the backend
+CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "60"))
+# Keep-alive connections kept open to the backend
+POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "20"))
+# Retries of the idempotent requests (and of the connection failures of every request)
+RETRIES = int(os.environ.get("API_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.environ.get("API_BACKOFF_FACTOR", "0.2"))
+BACKOFF_JITTER = float(os.environ.get("API_BACKOFF_JITTER", "0.2"))
+
+# The number of latencies kept to compute the percentiles
+LATENCY_SAMPLES = 1000
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
+RETRY_STATUSES = frozenset([502, 503, 504])
+
+
+class BackendResponse:
+    """
+    Status code and (json) body of a response of the backend, read before the connection
+    is released to the pool.
+    """
+
+    def __init__(self, status_code: int, body, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers if headers is not None else {}
+
+    def json(self):
+        return self.body
+
+
+class BackendClient:
+    """
+    Shared aiohttp session used by the handlers to call the backend:
+        - Keep-alive connections, pooled (at most POOL_SIZE) and reused by all the handlers.
+        - Connect and read timeouts on every request, so that a handler never hangs forever.
+        - Bounded retries with jittered exponential backoff. Read errors and 502/503/504 are
+          only retried for the idempotent verbs (GET, PUT, DELETE); a POST is only retried
+          when the connection couldn't be established (nothing was sent).
+    The session is created by the first request, inside the event loop of the operator.
+    """
+
+    def __init__(self):
+        self._session = None
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.in_flight = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(
+                    connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+                ),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return BACKOFF_FACTOR * (2**attempt) + random.uniform(0, BACKOFF_JITTER)
+
+    async def _send(self, method: str, url: str, **kwargs) -> BackendResponse:
+        async with self._get_session().request(method, url, **kwargs) as response:
+            body = None
+            if response.content_type == "application/json":
+                body = await response.json()
+            else:
+                await response.read()
+            return BackendResponse(
+                status_code=response.status,
+                body=body,
+                headers=response.headers.copy(),
+            )
+
+    async def request(self, method: str, url: str, **kwargs) -> BackendResponse:
+        # The span of the HTTP hop, its context is sent to the backend (traceparent header)
+        with tracing.start_span(f"{method} backend", url=url) as span:
+            if span is not None:
+                headers = dict(kwargs.pop("headers", None) or {})
+                headers["traceparent"] = span.traceparent()
+                kwargs["headers"] = headers
+            response = await self._request(method, url, **kwargs)
+            if span is not None:
+                span.attributes["status"] = response.status_code
+            return response
+
+    async def _request(self, method: str, url: str, **kwargs) -> BackendResponse:
+        idempotent = method in IDEMPOTENT_METHODS
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await self._send(method, url, **kwargs)
+                    if (
+                        response.status_code not in RETRY_STATUSES
+                        or not idempotent
+                        or attempt >= RETRIES
+                    ):
+                        return response
+                except aiohttp.ClientConnectorError as e:
+                    # The request wasn't sent, it can be retried whatever the verb
+                    if attempt >= RETRIES:
+                        raise e
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if not idempotent or attempt >= RETRIES:
+                        raise e
+                logging.info(f"Retrying {method} {url} [attempt {attempt + 1}]")
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            raise e
+        finally:
+            self.in_flight -= 1
+            self.requests += 1
+            self._latencies.append(time.perf_counter() - start)
+
+    async def post(self, url: str, **kwargs) -> BackendResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> BackendResponse:
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> BackendResponse:
+        return await self.request("DELETE", url, **kwargs)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "pool_size": POOL_SIZE,
+            "latency": {
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+
+client = BackendClient()
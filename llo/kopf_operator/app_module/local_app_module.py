@@ -0,0 +1,74 @@
+from app_module.http_client import BackendResponse
+from http import HTTPStatus
+import logging
+
+
+# Same functions as app_module, but the backend controller is called in the operator
+# process instead of through the API (no serialization, no HTTP hop).
+# The errors are returned the way the API returns them: a response with the status code of
+# the HTTPException and {"detail": ...} as body, 500 for the unexpected errors.
+# be is imported on the first call, so that the operator doesn't need it in HTTP mode.
+async def _call(name: str, status_code: int, **kwargs) -> BackendResponse:
+    from be.controllers import app_controller
+    from fastapi import HTTPException
+
+    logging.info(f"{name} function is called. [local]")
+    try:
+        body = await getattr(app_controller, name)(**kwargs)
+        return BackendResponse(status_code=status_code, body=body)
+    except HTTPException as e:
+        logging.error(f"Error {e.status_code}. [{name} function]")
+        return BackendResponse(
+            status_code=e.status_code, body={"detail": e.detail}, headers=e.headers
+        )
+    except Exception as e:
+        logging.error(f"An error occurred. [{name} function] {e!r}")
+        return BackendResponse(
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+            body={"detail": "Internal Server Error"},
+        )
+
+
+# -------------------------------------------------------------------- #
+async def create_app(spec: dict) -> BackendResponse:
+    return await _call("create_app", HTTPStatus.CREATED, spec=spec)
+
+
+async def delete_app(spec: dict) -> BackendResponse:
+    return await _call("delete_app", HTTPStatus.NO_CONTENT, spec=spec)
+
+
+async def update_app(spec: dict, old: list, new: list) -> BackendResponse:
+    return await _call("update_app", HTTPStatus.OK, spec=spec, old=old, new=new)
+
+
+# -------------------------------------------------------------------- #
+async def create_comp(spec: dict) -> BackendResponse:
+    return await _call("create_comp", HTTPStatus.CREATED, spec=spec)
+
+
+async def delete_comp(spec: dict) -> BackendResponse:
+    return await _call("delete_comp", HTTPStatus.NO_CONTENT, spec=spec)
+
+
+async def update_comp_deployment(spec: dict) -> BackendResponse:
+    return await _call("update_comp_deployment", HTTPStatus.OK, spec=spec)
+
+
+async def update_comp_expose_field(spec: dict, old: list, new: list) -> BackendResponse:
+    return await _call(
+        "update_comp_expose_field", HTTPStatus.OK, spec=spec, old=old, new=new
+    )
+
+
+# -------------------------------------------------------------------- #
+async def create_comps(app_name: str, specs: list) -> BackendResponse:
+    return await _call("create_comps", HTTPStatus.OK, app_name=app_name, specs=specs)
+
+
+async def update_comps(app_name: str, items: list) -> BackendResponse:
+    return await _call("update_comps", HTTPStatus.OK, app_name=app_name, items=items)
+
+
+async def delete_comps(app_name: str, specs: list) -> BackendResponse:
+    return await _call("delete_comps", HTTPStatus.OK, app_name=app_name, specs=specs)
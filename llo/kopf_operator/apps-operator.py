@@ -1,9 +1,13 @@
 import kopf
-import kubernetes
 from http import HTTPStatus
+from common.helpers import DEPLOYMENT_FIELDS, diff_component
+from common import tracing
+from datetime import datetime, timezone
+import functools
+from app_module.http_client import BackendResponse, client
+from validators import validator
+from comp_batcher import batcher
 import config
-import os
-import re
 import logging
 
 
@@ -13,106 +17,118 @@ def setup(settings: kopf.OperatorSettings, **_):
     settings.admission.managed = "auto.kopf.dev"
     settings.admission.server = kopf.WebhookAutoTunnel()
 
+    # Runtime settings, see config.py
+    settings.batching.worker_limit = config.WORKER_LIMIT
+    if config.BATCH_WINDOW is not None:
+        settings.batching.batch_window = config.BATCH_WINDOW
+    if config.IDLE_TIMEOUT is not None:
+        settings.batching.idle_timeout = config.IDLE_TIMEOUT
+    settings.watching.server_timeout = config.WATCH_SERVER_TIMEOUT
+    settings.watching.client_timeout = config.WATCH_CLIENT_TIMEOUT
+    if config.EXECUTOR_SIZE is not None:
+        settings.execution.max_workers = config.EXECUTOR_SIZE
+
+
+@kopf.on.cleanup()
+async def close_backend_client(**_):
+    await client.close()
+
+
+# Statistics of the connections to the backend, served by the liveness endpoint (--liveness)
+@kopf.on.probe(id="backend_client")
+def backend_client_stats(**_):
+    return client.stats()
+
+
+@kopf.on.probe(id="validator")
+def validator_stats(**_):
+    return validator.stats()
+
+
+@kopf.on.probe(id="comp_batcher")
+def comp_batcher_stats(**_):
+    return batcher.stats()
+
 
 # ---------------------------------- Application-validation ---------------------------------- #
+# The rules are compiled once and all the violations are reported together, see validators.py
 @kopf.on.validate("Application")
 def validate_app(body, spec, warnings: list[str], **_):
-    # application name will be used as a DNS label
-    regex = re.compile("^(?![0-9]+$)(?!-)[a-zA-Z0-9-]{,63}(?<!-)$")
-    is_match = regex.match(spec.get("name")) is not None
-    if not is_match:
-        raise kopf.AdmissionError("application name must be a valid DNS label name.")
-
-    # Similarly componnet name must also be valid DNS label.
-    for component in spec.get("components"):
-        is_match = regex.match(component.get("name")) is not None
-        if not is_match:
-            raise kopf.AdmissionError("component name must be a valid DNS label name.")
-
-    # Forbidden names : There are some pre-created namespaces when creating a new k8s cluster, for example "default" and "kube-system"..
-    # So the application name must not be one of those names.
-
-    forbidden_names = os.environ.get("FORBIDDEN_NAMES").split(",")
-
-    if spec.get("name") in forbidden_names:
-        raise kopf.AdmissionError(
-            "application name forbidden, please choose another name for your application."
-        )
-
-    # Cluster must not be the management cluster
-    management_cluster = os.environ.get("MANAGEMENT_CLUSTER")
-    if spec.get("cluster") == management_cluster:
-        raise kopf.AdmissionError(f"cluster must not be the {management_cluster}")
-
-    for component in spec.get("components"):
-        if component.get("cluster") == management_cluster:
-            raise kopf.AdmissionError(f"cluster must not be the {management_cluster}")
-
-    contexts, _ = kubernetes.config.list_kube_config_contexts()
-    clusters = [context.get("context").get("cluster") for context in contexts]
-    if spec.get("cluster") not in clusters:
-        raise kopf.AdmissionError("Application cluster doesn't exist")
-
-    for component in spec.get("components"):
-        if component.get("cluster") not in clusters:
-            raise kopf.AdmissionError(
-                f"Cluster of component {component.get('name')} doesn't exist"
-            )
-
-    if (
-        "namespace" in body.get("metadata")
-        and body.get("metadata").get("namespace") != "default"
-    ):
-        raise kopf.AdmissionError("namespace must be set to default")
-
-    if body.get("metadata").get("name", "") != spec.get("name"):
-        raise kopf.AdmissionError("metatdata.name must be the same as spec.name")
+    violations = validator.validate_app(body)
+    if violations:
+        raise kopf.AdmissionError("; ".join(violations))
 
 
 # ---------------------------------- Component-validation ---------------------------------- #
 @kopf.on.validate("Component")
 def validate_comp(body, spec, warnings: list[str], **_):
-    # application name and component name will be used as a DNS label, see ingress template to understand
-    regex = re.compile("^(?![0-9]+$)(?!-)[a-zA-Z0-9-]{,63}(?<!-)$")
-    is_match = regex.match(spec.get("name")) is not None
-    if not is_match:
-        raise kopf.AdmissionError("component name must be a valid DNS label name.")
-
-    is_match = regex.match(spec.get("application")) is not None
-    if not is_match:
-        raise kopf.AdmissionError("application name must be a valid DNS label name.")
-
-    # is-public must be true only in one port at most
-    temp_list = [exp.get("is-public") for exp in spec.get("expose", [])]
-    if sum(temp_list) > 1:
-        raise kopf.AdmissionError("is-public set to true for two deffirent ports")
-
-    # if is-public = true, is-peered must be true too
-    for exp in spec.get("expose", []):
-        if exp.get("is-public") == True and exp.get("is-peered") == False:
-            raise kopf.AdmissionError(
-                "is-public set to true but is-peered set to false"
-            )
-
-    # if is-exposing-metrics = true, is-peered muse be true too
-    for exp in spec.get("expose", []):
-        if exp.get("is-exposing-metrics") == True and exp.get("is-peered") == False:
-            raise kopf.AdmissionError(
-                "is-exposing-metrics set to true but is-peered set to false"
-            )
-
-    if "namespace" in body.get("metadata") and body.get("metadata").get(
-        "namespace"
-    ) != spec.get("application"):
-        raise kopf.AdmissionError(f"namespace must be set to {spec.get('application')}")
-
-    if body.get("metadata").get("name", "") != spec.get("name"):
-        raise kopf.AdmissionError("metatdata.name must be the same as spec.name")
+    violations = validator.validate_comp(body)
+    if violations:
+        raise kopf.AdmissionError("; ".join(violations))
+
+
+# ---------------------------------- Tracing ---------------------------------- #
+def traced_handler(name: str):
+    """
+    Opens the root span of the trace of a kopf event, propagated to the backend by app_module.
+    The time the event waited before the handler (kopf queue, retries) is an attribute.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            body = kwargs.get("body") or {}
+            metadata = body.get("metadata") or {}
+            attributes = {
+                "object": f"{metadata.get('namespace')}/{metadata.get('name')}",
+                "retry": kwargs.get("retry"),
+            }
+            started = kwargs.get("started")
+            if started is not None:
+                attributes["handling_seconds"] = (
+                    datetime.now(timezone.utc) - started.replace(tzinfo=timezone.utc)
+                ).total_seconds()
+            created = metadata.get("creationTimestamp")
+            if name.startswith("create") and created:
+                created_at = datetime.fromisoformat(created.replace("Z", "+00:00"))
+                attributes["queue_seconds"] = (
+                    datetime.now(timezone.utc) - created_at
+                ).total_seconds()
+            with tracing.start_span(name, **attributes):
+                return await handler(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------------- Backpressure ---------------------------------- #
+# Seconds before the handler is retried when the backend doesn't say (no Retry-After)
+BUSY_RETRY_DELAY = 10
+
+
+def _retry_if_busy(response: BackendResponse | None):
+    """
+    A 503 means the backend refused the request without doing anything (too many operations
+    in progress with API_ASYNC_OPERATIONS ...): the handler is retried by kopf after the
+    Retry-After delay instead of the event being dropped.
+    """
+    if response is None or response.status_code != HTTPStatus.SERVICE_UNAVAILABLE:
+        return
+    try:
+        delay = float(response.headers.get("Retry-After", BUSY_RETRY_DELAY))
+    except ValueError:
+        # Retry-After can also be an HTTP date
+        delay = BUSY_RETRY_DELAY
+    raise kopf.TemporaryError("The backend is busy.", delay=delay)
 
 
 # ---------------------------------- APPLICATION-CRD Handlers---------------------------------- #
+# The handlers are async: they wait for the backend without holding a thread of the executor.
+# With API_ASYNC_OPERATIONS the backend answers 202 (accepted) without waiting for the work.
 @kopf.on.create("Application")
-def create_app_handler(spec, **_):
+@traced_handler("create Application")
+async def create_app_handler(spec, **_):
     """
     This handler:
         - Creates the namespace in the application cluster.
@@ -120,13 +136,18 @@ def create_app_handler(spec, **_):
         - Performs namespace offloading between app clusters and components clusters.
     """
     app_module = config.APPS["apps"]
-    response = app_module.create_app(spec=spec.__dict__["_src"]["spec"])
-    if response.status_code != HTTPStatus.CREATED:
+    response = await app_module.create_app(spec=spec.__dict__["_src"]["spec"])
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.CREATED,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [create_app_handler]")
 
 
 @kopf.on.delete("Application")
-def delete_app_handler(spec, **_):
+@traced_handler("delete Application")
+async def delete_app_handler(spec, **_):
     """
     This handler:
         - Deletes all the components of an application
@@ -135,8 +156,12 @@ def delete_app_handler(spec, **_):
         - Deletes the namespace of the application from the application cluster.
     """
     app_module = config.APPS["apps"]
-    response = app_module.delete_app(spec=spec.__dict__["_src"]["spec"])
-    if response.status_code != HTTPStatus.NO_CONTENT:
+    response = await app_module.delete_app(spec=spec.__dict__["_src"]["spec"])
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.NO_CONTENT,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [delete_app_handler]")
 
 
@@ -146,7 +171,8 @@ def delete_app_handler(spec, **_):
 # - 02: a component was removed from the application
 # - 03: a component migrated (changed cluster)
 @kopf.on.update("Application", field="spec.components")
-def update_app_handler(spec, old, new, **_):
+@traced_handler("update Application")
+async def update_app_handler(spec, old, new, **_):
     """
     This function:
         - Does all the peering and namespace offloading needed for the new added components to the application.
@@ -154,63 +180,112 @@ def update_app_handler(spec, old, new, **_):
         - Trigger the migration of a component if a component changed the cluster.
     """
     app_module = config.APPS["apps"]
-    response = app_module.update_app(
+    response = await app_module.update_app(
         spec=spec.__dict__["_src"]["spec"], old=old, new=new
     )
-    if response.status_code != HTTPStatus.OK:
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.OK,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [update_app_handler]")
 
 
 # ---------------------------------- COMPONENT-CRD Handlers ---------------------------------- #
+# The events of the Components of an application are sent together in batch requests
+# (comps:batch), see comp_batcher.py. With COMPONENT_BATCH_WINDOW=0 each one is sent alone.
 @kopf.on.create("Component")
-def create_comp_handler(spec, **_):
+@traced_handler("create Component")
+async def create_comp_handler(spec, **_):
     """
     This handler:
         - Creates deployment, service, servicemonitor, ingress ... related to the component.
     """
     app_module = config.APPS["apps"]
-    response = app_module.create_comp(spec=spec.__dict__["_src"]["spec"])
-    if response.status_code != HTTPStatus.CREATED:
+    comp_spec = spec.__dict__["_src"]["spec"]
+    if batcher.window > 0:
+        response = await batcher.submit(
+            app_module.create_comps, comp_spec["application"], comp_spec
+        )
+    else:
+        response = await app_module.create_comp(spec=comp_spec)
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.CREATED,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [create_comp_handler]")
 
 
 @kopf.on.delete("Component")
-def delete_comp_handler(spec, **_):
+@traced_handler("delete Component")
+async def delete_comp_handler(spec, **_):
     """
     This handler:
         - Deletes deployment, service, servicemonitor, ingress ... related to the component.
     """
     app_module = config.APPS["apps"]
-    response = app_module.delete_comp(spec=spec.__dict__["_src"]["spec"])
-    if response.status_code != HTTPStatus.NO_CONTENT:
+    comp_spec = spec.__dict__["_src"]["spec"]
+    if batcher.window > 0:
+        response = await batcher.submit(
+            app_module.delete_comps, comp_spec["application"], comp_spec
+        )
+    else:
+        response = await app_module.delete_comp(spec=comp_spec)
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.NO_CONTENT,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [delete_comp_handler]")
 
 
 # Note that this handler doesn't handle the update of "expose", "tls" fields. They are handled seperately
 @kopf.on.update("Component", field="spec")
-def update_comp_handler_deployment(spec, **_):
+@traced_handler("update Component deployment")
+async def update_comp_handler_deployment(spec, old, new, **_):
     """
     - This function:
         - update the deployment related to the component.
     """
+    # The backend isn't called if only fields unused by the deployment changed (flags of the ports ...)
+    changed_fields = diff_component(old, new)
+    if not changed_fields & DEPLOYMENT_FIELDS:
+        logging.info(f"Deployment not impacted by {sorted(changed_fields)}.")
+        return
     # It will return "unchanged" if the deployment didn't change.
     app_module = config.APPS["apps"]
-    response = app_module.update_comp_deployment(spec=spec.__dict__["_src"]["spec"])
-    if response.status_code != HTTPStatus.OK:
+    comp_spec = spec.__dict__["_src"]["spec"]
+    if batcher.window > 0:
+        response = await batcher.submit(
+            app_module.update_comps, comp_spec["application"], {"spec": comp_spec}
+        )
+    else:
+        response = await app_module.update_comp_deployment(spec=comp_spec)
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.OK,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [update_comp_handler_deployment]")
 
 
 # Handler for the expose field
 @kopf.on.update("Component", field="spec.expose")
-def update_comp_handler_expose_field(spec, old, new, **_):
+@traced_handler("update Component expose")
+async def update_comp_handler_expose_field(spec, old, new, **_):
     """
     - This function:
         - update the service, ingress, ServiceMonitor, By regenerating the yaml files and applying them again.
         - Delete the service, ingress, srvicemonitor if there is no longer need for them.
     """
     app_module = config.APPS["apps"]
-    response = app_module.update_comp_expose_field(
+    response = await app_module.update_comp_expose_field(
         spec=spec.__dict__["_src"]["spec"], old=old, new=new
     )
-    if response.status_code != HTTPStatus.OK:
+    _retry_if_busy(response)
+    if response is None or response.status_code not in (
+        HTTPStatus.OK,
+        HTTPStatus.ACCEPTED,
+    ):
         logging.error("Something went wrong. [update_comp_handler_expose_field]")
@@ -0,0 +1,88 @@
+from app_module.http_client import BackendResponse
+from http import HTTPStatus
+import asyncio
+import os
+
+
+# Seconds during which the Component events of an application are merged into one batch
+# request (onboarding of an application ...), 0 sends one request per Component
+COMPONENT_BATCH_WINDOW = float(os.environ.get("COMPONENT_BATCH_WINDOW", "0.1"))
+# Maximum number of components of a batch request
+COMPONENT_BATCH_SIZE = int(os.environ.get("COMPONENT_BATCH_SIZE", "100"))
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.response = asyncio.get_running_loop().create_future()
+
+
+class ComponentBatcher:
+    """
+    Merges the Component events of the same application into batch requests
+    (create_comps, update_comps, delete_comps of app_module):
+        - The first event of an application opens a batch, which is sent after the window;
+          the events arriving meanwhile join it (at most `size` items per batch).
+        - Every handler gets the result of its own component, as a response of its own.
+          The other responses (202 accepted, errors of the whole batch) are shared.
+    The batch is sent by its own task, so a cancelled handler doesn't cancel it.
+    """
+
+    def __init__(self, window: float, size: int):
+        self.window = window
+        self.size = size
+        self._pending: dict[tuple, _Batch] = {}
+        self._tasks = set()
+        self.items = 0
+        self.batches = 0
+
+    async def submit(self, send, app_name: str, item) -> BackendResponse | None:
+        """
+        Sends item with the other items of app_name through send(app_name, items) and
+        returns the response of the item.
+        """
+        key = (send, app_name)
+        batch = self._pending.get(key)
+        if batch is None or len(batch.items) >= self.size:
+            batch = self._pending[key] = _Batch()
+            task = asyncio.get_running_loop().create_task(
+                self._send(key, batch, send, app_name)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        index = len(batch.items)
+        batch.items.append(item)
+        self.items += 1
+        response = await asyncio.shield(batch.response)
+        return self._response_of(response, index)
+
+    async def _send(self, key: tuple, batch: _Batch, send, app_name: str):
+        await asyncio.sleep(self.window)
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        self.batches += 1
+        try:
+            batch.response.set_result(await send(app_name, batch.items))
+        except Exception as e:
+            batch.response.set_exception(e)
+
+    @staticmethod
+    def _response_of(
+        response: BackendResponse | None, index: int
+    ) -> BackendResponse | None:
+        if response is None or response.status_code != HTTPStatus.OK:
+            return response
+        result = response.json()["results"][index]
+        return BackendResponse(status_code=result["status_code"], body=result)
+
+    def stats(self) -> dict:
+        return {
+            "window": self.window,
+            "size": self.size,
+            "pending": sum(len(batch.items) for batch in self._pending.values()),
+            "items": self.items,
+            "batches": self.batches,
+        }
+
+
+batcher = ComponentBatcher(window=COMPONENT_BATCH_WINDOW, size=COMPONENT_BATCH_SIZE)
@@ -1,5 +1,34 @@
-from app_module import app_module
+from app_module import app_module, local_app_module
+import os
+
+# "http": the backend is called through its API (API_URL)
+# "local": the backend controller is called in the operator process (needs the backend env)
+APPS_BACKEND = os.environ.get("APPS_BACKEND", "http")
+APPS_BACKENDS = {
+    "http": app_module,
+    "local": local_app_module,
+}
 
 APPS = {
-    "apps": app_module
-}
\ No newline at end of file
+    "apps": APPS_BACKENDS[APPS_BACKEND]
+}
+
+
+def _optional(name: str, cast=float):
+    value = os.environ.get(name)
+    return cast(value) if value else None
+
+
+# ---------------------------------- Operator runtime settings ---------------------------------- #
+# Applied by the startup handler, None keeps the default of kopf.
+# Maximum number of CR events processed at the same time (None: unlimited)
+WORKER_LIMIT = _optional("OPERATOR_WORKER_LIMIT", int)
+# Seconds during which the events of the same object are merged before being processed
+BATCH_WINDOW = _optional("OPERATOR_BATCH_WINDOW")
+# Seconds after which the worker of an object without events is stopped
+IDLE_TIMEOUT = _optional("OPERATOR_IDLE_TIMEOUT")
+# Timeouts of the watch requests (the server one is the one sent to the api server)
+WATCH_SERVER_TIMEOUT = _optional("OPERATOR_WATCH_SERVER_TIMEOUT", int)
+WATCH_CLIENT_TIMEOUT = _optional("OPERATOR_WATCH_CLIENT_TIMEOUT")
+# Threads of the executor running the sync handlers (validation webhooks)
+EXECUTOR_SIZE = _optional("OPERATOR_EXECUTOR_SIZE", int)
@@ -0,0 +1,179 @@
+from common import cluster_registry
+from collections import OrderedDict
+from typing import Mapping
+import threading
+import hashlib
+import marshal
+import os
+import re
+
+
+# ---------------------------------- Rules ---------------------------------- #
+# Compiled once when the operator starts.
+# Application and component names are used as DNS labels (namespace, ingress hosts ...)
+DNS_LABEL = re.compile("^(?![0-9]+$)(?!-)[a-zA-Z0-9-]{,63}(?<!-)$")
+# Namespaces created with every k8s cluster ("default", "kube-system" ...)
+# (empty entries of the list ignored: unset variable, trailing comma ...)
+FORBIDDEN_NAMES = frozenset(
+    name.strip()
+    for name in os.environ.get("FORBIDDEN_NAMES", "").split(",")
+    if name.strip()
+)
+MANAGEMENT_CLUSTER = os.environ.get("MANAGEMENT_CLUSTER")
+# The number of validation decisions kept in memory
+VALIDATION_CACHE_SIZE = int(os.environ.get("VALIDATION_CACHE_SIZE", "1024"))
+
+
+def _is_dns_label(value) -> bool:
+    return isinstance(value, str) and DNS_LABEL.match(value) is not None
+
+
+# ---------------------------------- Application ---------------------------------- #
+def check_app(body: Mapping, clusters: set[str]) -> list[str]:
+    """
+    Validates an Application in a single pass over its components.
+    Returns all the violations (empty list if the Application is valid).
+    """
+    spec = body.get("spec") or {}
+    metadata = body.get("metadata") or {}
+    violations = []
+
+    name = spec.get("name")
+    if not _is_dns_label(name):
+        violations.append("application name must be a valid DNS label name.")
+    if name in FORBIDDEN_NAMES:
+        violations.append(
+            "application name forbidden, please choose another name for your application."
+        )
+
+    cluster = spec.get("cluster")
+    if cluster == MANAGEMENT_CLUSTER:
+        violations.append(f"cluster must not be the {MANAGEMENT_CLUSTER}")
+    elif cluster not in clusters:
+        violations.append("Application cluster doesn't exist")
+
+    for component in spec.get("components") or []:
+        component_name = component.get("name")
+        if not _is_dns_label(component_name):
+            violations.append(
+                f"component name must be a valid DNS label name. [{component_name}]"
+            )
+        component_cluster = component.get("cluster")
+        if component_cluster == MANAGEMENT_CLUSTER:
+            violations.append(
+                f"cluster must not be the {MANAGEMENT_CLUSTER} [{component_name}]"
+            )
+        elif component_cluster not in clusters:
+            violations.append(f"Cluster of component {component_name} doesn't exist")
+
+    if metadata.get("namespace", "default") != "default":
+        violations.append("namespace must be set to default")
+    if metadata.get("name", "") != name:
+        violations.append("metatdata.name must be the same as spec.name")
+    return violations
+
+
+# ---------------------------------- Component ---------------------------------- #
+def check_comp(body: Mapping) -> list[str]:
+    """
+    Validates a Component in a single pass over its exposed ports.
+    Returns all the violations (empty list if the Component is valid).
+    """
+    spec = body.get("spec") or {}
+    metadata = body.get("metadata") or {}
+    violations = []
+
+    name = spec.get("name")
+    application = spec.get("application")
+    if not _is_dns_label(name):
+        violations.append("component name must be a valid DNS label name.")
+    if not _is_dns_label(application):
+        violations.append("application name must be a valid DNS label name.")
+
+    public_ports = 0
+    for exp in spec.get("expose") or []:
+        is_peered = exp.get("is-peered")
+        if exp.get("is-public") == True:
+            public_ports += 1
+            # if is-public = true, is-peered must be true too
+            if is_peered == False:
+                violations.append("is-public set to true but is-peered set to false")
+        # if is-exposing-metrics = true, is-peered muse be true too
+        if exp.get("is-exposing-metrics") == True and is_peered == False:
+            violations.append(
+                "is-exposing-metrics set to true but is-peered set to false"
+            )
+    # is-public must be true only in one port at most
+    if public_ports > 1:
+        violations.append("is-public set to true for two deffirent ports")
+
+    if "namespace" in metadata and metadata.get("namespace") != application:
+        violations.append(f"namespace must be set to {application}")
+    if metadata.get("name", "") != name:
+        violations.append("metatdata.name must be the same as spec.name")
+    return violations
+
+
+# ---------------------------------- Decisions cache ---------------------------------- #
+class Validator:
+    """
+    Caches the violations of the validated objects by hash of (kind, metadata, spec):
+    the same object is sent again by the api server on every retry / dry-run / re-apply.
+    The application decisions also depend on the clusters of the kubeconfig, so they are
+    keyed by the generation of the cluster registry as well.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._decisions: OrderedDict[bytes, tuple[str, ...]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(kind: str, body: Mapping, *extra) -> bytes:
+        # marshal is several times faster than json (the objects are decoded json anyway),
+        # the key only depends on the order of the keys sent by the api server.
+        metadata = body.get("metadata") or {}
+        payload = (
+            kind,
+            metadata.get("name"),
+            metadata.get("namespace"),
+            body.get("spec"),
+            *extra,
+        )
+        return hashlib.blake2b(marshal.dumps(payload)).digest()
+
+    def _cached(self, key: bytes, check) -> list[str]:
+        with self._lock:
+            violations = self._decisions.get(key)
+            if violations is not None:
+                self._decisions.move_to_end(key)
+                self.hits += 1
+                return list(violations)
+            self.misses += 1
+        violations = check()
+        with self._lock:
+            self._decisions[key] = tuple(violations)
+            if len(self._decisions) > self.size:
+                self._decisions.popitem(last=False)
+        return violations
+
+    def validate_app(self, body: Mapping) -> list[str]:
+        registry = cluster_registry.registry
+        key = self._key("Application", body, registry.generation())
+        return self._cached(key, lambda: check_app(body, registry.clusters()))
+
+    def validate_comp(self, body: Mapping) -> list[str]:
+        return self._cached(self._key("Component", body), lambda: check_comp(body))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._decisions),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+validator = Validator(size=VALIDATION_CACHE_SIZE)
@@ -0,0 +1,520 @@
+"""
+In-memory stand-in for the kubernetes api servers of several clusters, to load-test the
+backend without kind clusters.
+    - Implements the subset of the api used by be/: get / list / watch / create / apply
+      (PATCH) / delete / deletecollection of namespaces, deployments, services, ingresses and
+      custom objects (servicemonitors, applications, components ...), with resourceVersions,
+      preconditions and 409 conflicts like the real api server.
+    - Every cluster is served under /clusters/{name} and gets a context in the generated
+      kubeconfig (context name = cluster name).
+    - Latency, 500 errors and 409 conflicts can be injected per cluster, from the command line
+      or at runtime (POST /_control/clusters/{name}).
+    - Every request is logged (GET /_control/log, and --log file as json lines).
+Run from the repository root:
+    python -m loadtest.fake_apiserver --clusters kind-management-cluster,kind-workload-1 \\
+        --kubeconfig /tmp/fake-kubeconfig --latency-ms 20 --jitter-ms 10
+then start the backend with KUBECONFIG=/tmp/fake-kubeconfig.
+"""
+
+from aiohttp import web
+from collections import deque
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import random
+import json
+import time
+import uuid
+import yaml
+
+
+KINDS = {
+    "namespaces": "Namespace",
+    "deployments": "Deployment",
+    "services": "Service",
+    "ingresses": "Ingress",
+    "servicemonitors": "ServiceMonitor",
+    "applications": "Application",
+    "components": "Component",
+}
+# Watch events kept to resume the watches (older resourceVersions get 410 Gone)
+EVENTS_KEPT = 10000
+LOG_KEPT = 10000
+
+
+def _status(code: int, reason: str, message: str) -> web.Response:
+    return web.json_response(
+        {
+            "kind": "Status",
+            "apiVersion": "v1",
+            "metadata": {},
+            "status": "Failure",
+            "message": message,
+            "reason": reason,
+            "code": code,
+        },
+        status=code,
+    )
+
+
+def _merge(target: dict, patch: dict) -> dict:
+    # JSON merge patch (RFC 7386), also used for the strategic merge patches
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+class Faults:
+    """
+    What is injected in the requests of a cluster.
+        - latency_ms + uniform jitter (0..jitter_ms) before each response.
+        - error_rate: share of the requests answered 500.
+        - conflict_rate: share of the writes answered 409 Conflict.
+    """
+
+    def __init__(
+        self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, conflict_rate=0.0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.conflict_rate = conflict_rate
+
+    def update(self, values: dict):
+        for key in ("latency_ms", "jitter_ms", "error_rate", "conflict_rate"):
+            if key in values:
+                setattr(self, key, float(values[key]))
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class FakeCluster:
+    """
+    Objects of one cluster: (group/version, plural, namespace, name) -> object.
+    """
+
+    def __init__(self, name: str, faults: Faults):
+        self.name = name
+        self.faults = faults
+        self.objects: dict[tuple, dict] = {}
+        self.resource_version = 0
+        self.events = deque(maxlen=EVENTS_KEPT)
+        self.changed = asyncio.Condition()
+
+    def _next_version(self) -> str:
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    async def _notify(self, event_type: str, key: tuple, obj: dict):
+        self.events.append(
+            (int(obj["metadata"]["resourceVersion"]), event_type, key, obj)
+        )
+        async with self.changed:
+            self.changed.notify_all()
+
+    def select(self, group_version: str, plural: str, namespace: str | None) -> list:
+        return [
+            obj
+            for (gv, p, ns, _), obj in self.objects.items()
+            if gv == group_version
+            and p == plural
+            and (namespace is None or ns == namespace)
+        ]
+
+    async def put(self, key: tuple, obj: dict, event_type: str) -> dict:
+        obj["metadata"]["resourceVersion"] = self._next_version()
+        self.objects[key] = obj
+        await self._notify(event_type, key, obj)
+        return obj
+
+    async def delete(self, key: tuple) -> dict:
+        obj = self.objects.pop(key)
+        obj = {**obj, "metadata": {**obj["metadata"]}}
+        obj["metadata"]["resourceVersion"] = self._next_version()
+        await self._notify("DELETED", key, obj)
+        # A deleted namespace takes its objects with it
+        if key[1] == "namespaces" and key[0] == "v1":
+            for other in [k for k in self.objects if k[2] == key[3]]:
+                await self.delete(other)
+        return obj
+
+
+class FakeApiServer:
+    def __init__(
+        self, clusters: list[str], faults: dict, seed: int | None, log_file=None
+    ):
+        self.random = random.Random(seed)
+        self.clusters = {name: FakeCluster(name, Faults(**faults)) for name in clusters}
+        self.log = deque(maxlen=LOG_KEPT)
+        self.log_file = open(log_file, "a") if log_file else None
+        self.counts: dict[tuple, int] = {}
+
+    # ---------------------------------- app ---------------------------------- #
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024**2)
+        app.router.add_get("/_control/log", self.get_log)
+        app.router.add_get("/_control/stats", self.get_stats)
+        app.router.add_post("/_control/reset", self.reset)
+        app.router.add_get("/_control/clusters/{cluster}", self.get_faults)
+        app.router.add_post("/_control/clusters/{cluster}", self.set_faults)
+        app.router.add_route("*", "/clusters/{cluster}/{path:.*}", self.handle)
+        return app
+
+    # ---------------------------------- control ---------------------------------- #
+    async def get_log(self, request):
+        limit = int(request.query.get("limit", "1000"))
+        return web.json_response(list(self.log)[-limit:])
+
+    async def get_stats(self, request):
+        stats = {}
+        for (cluster, verb, status), count in self.counts.items():
+            stats.setdefault(cluster, {}).setdefault(verb, {})[str(status)] = count
+        return web.json_response(stats)
+
+    async def reset(self, request):
+        for cluster in self.clusters.values():
+            cluster.objects.clear()
+        self.log.clear()
+        self.counts.clear()
+        return web.json_response({})
+
+    async def get_faults(self, request):
+        cluster = self.clusters.get(request.match_info["cluster"])
+        if cluster is None:
+            return _status(404, "NotFound", "unknown cluster")
+        return web.json_response(cluster.faults.to_dict())
+
+    async def set_faults(self, request):
+        cluster = self.clusters.get(request.match_info["cluster"])
+        if cluster is None:
+            return _status(404, "NotFound", "unknown cluster")
+        cluster.faults.update(await request.json())
+        return web.json_response(cluster.faults.to_dict())
+
+    # ---------------------------------- api ---------------------------------- #
+    @staticmethod
+    def _parse(path: str):
+        """
+        Returns (group_version, plural, namespace, name, subresource) of an api path.
+        """
+        segments = [segment for segment in path.split("/") if segment]
+        if segments[:1] == ["api"] and len(segments) >= 2:
+            group_version, rest = segments[1], segments[2:]
+        elif segments[:1] == ["apis"] and len(segments) >= 3:
+            group_version, rest = f"{segments[1]}/{segments[2]}", segments[3:]
+        else:
+            return None
+        namespace = None
+        if len(rest) > 2 and rest[0] == "namespaces":
+            namespace, rest = rest[1], rest[2:]
+        if not rest:
+            return None
+        plural = rest[0]
+        name = rest[1] if len(rest) > 1 else None
+        subresource = rest[2] if len(rest) > 2 else None
+        return group_version, plural, namespace, name, subresource
+
+    @staticmethod
+    def _verb(method: str, named: bool, watch: bool) -> str:
+        if method == "GET":
+            return "watch" if watch else "get" if named else "list"
+        if method == "DELETE":
+            return "delete" if named else "deletecollection"
+        return {"POST": "create", "PUT": "update", "PATCH": "patch"}.get(method, method)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        start = time.perf_counter()
+        cluster = self.clusters.get(request.match_info["cluster"])
+        parsed = self._parse(request.match_info["path"])
+        watch = request.query.get("watch", "").lower() in ("true", "1")
+        verb = self._verb(request.method, bool(parsed and parsed[3]), watch)
+        injected = None
+
+        if cluster is None or parsed is None:
+            response = _status(
+                404, "NotFound", "the server could not find the resource"
+            )
+        else:
+            faults = cluster.faults
+            delay = faults.latency_ms + self.random.uniform(0, faults.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            if self.random.random() < faults.error_rate:
+                injected = "error"
+                response = _status(500, "InternalError", "injected error")
+            elif (
+                verb in ("create", "update", "patch", "delete")
+                and self.random.random() < faults.conflict_rate
+            ):
+                injected = "conflict"
+                response = _status(
+                    409, "Conflict", "the object has been modified (injected conflict)"
+                )
+            else:
+                response = await self._serve(request, cluster, verb, *parsed)
+
+        self._record(request, cluster, verb, response.status, start, injected)
+        return response
+
+    def _record(self, request, cluster, verb, status, start, injected):
+        name = cluster.name if cluster is not None else request.match_info["cluster"]
+        entry = {
+            "time": time.time(),
+            "cluster": name,
+            "method": request.method,
+            "path": request.path,
+            "verb": verb,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "injected": injected,
+        }
+        self.log.append(entry)
+        key = (name, verb, status)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self.log_file is not None:
+            self.log_file.write(json.dumps(entry) + "\n")
+            self.log_file.flush()
+
+    async def _body(self, request) -> dict:
+        text = await request.text()
+        return (yaml.safe_load(text) if text else None) or {}
+
+    def _new_object(self, body: dict, group_version, plural, namespace, name) -> dict:
+        obj = dict(body)
+        metadata = dict(obj.get("metadata") or {})
+        metadata["name"] = name
+        if namespace is not None:
+            metadata["namespace"] = namespace
+        metadata.setdefault("uid", str(uuid.uuid4()))
+        metadata.setdefault(
+            "creationTimestamp",
+            datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+        metadata["generation"] = metadata.get("generation", 0) + 1
+        obj["metadata"] = metadata
+        obj.setdefault("apiVersion", group_version)
+        obj.setdefault("kind", KINDS.get(plural, plural.rstrip("s").capitalize()))
+        return obj
+
+    async def _serve(
+        self,
+        request,
+        cluster,
+        verb,
+        group_version,
+        plural,
+        namespace,
+        name,
+        subresource,
+    ) -> web.StreamResponse:
+        key = (group_version, plural, namespace, name)
+        current = cluster.objects.get(key)
+
+        if verb == "get":
+            if current is None:
+                return _status(404, "NotFound", f'{plural} "{name}" not found')
+            return web.json_response(current)
+
+        if verb == "list":
+            return web.json_response(
+                {
+                    "kind": f"{KINDS.get(plural, plural)}List",
+                    "apiVersion": group_version,
+                    "metadata": {"resourceVersion": str(cluster.resource_version)},
+                    "items": cluster.select(group_version, plural, namespace),
+                }
+            )
+
+        if verb == "watch":
+            return await self._watch(request, cluster, group_version, plural, namespace)
+
+        if verb == "deletecollection":
+            items = cluster.select(group_version, plural, namespace)
+            for obj in items:
+                metadata = obj["metadata"]
+                await cluster.delete(
+                    (group_version, plural, metadata.get("namespace"), metadata["name"])
+                )
+            return web.json_response(
+                {"kind": "List", "apiVersion": "v1", "metadata": {}, "items": items}
+            )
+
+        body = await self._body(request)
+        wanted_version = (body.get("metadata") or {}).get("resourceVersion")
+
+        if verb == "delete":
+            if current is None:
+                return _status(404, "NotFound", f'{plural} "{name}" not found')
+            preconditions = body.get("preconditions") or {}
+            expected = preconditions.get("resourceVersion")
+            if expected and expected != current["metadata"]["resourceVersion"]:
+                return _status(409, "Conflict", "precondition failed: resourceVersion")
+            await cluster.delete(key)
+            return web.json_response(
+                {"kind": "Status", "apiVersion": "v1", "status": "Success"}
+            )
+
+        if verb == "create":
+            name = (body.get("metadata") or {}).get("name")
+            if plural == "namespaces" and namespace is None:
+                key = (group_version, plural, None, name)
+            else:
+                key = (group_version, plural, namespace, name)
+            if key in cluster.objects:
+                return _status(
+                    409, "AlreadyExists", f'{plural} "{name}" already exists'
+                )
+            obj = self._new_object(body, group_version, plural, namespace, name)
+            obj = await cluster.put(key, obj, "ADDED")
+            return web.json_response(obj, status=201)
+
+        # update (PUT) and patch (PATCH): the resourceVersion of the body is a precondition
+        if wanted_version and (
+            current is None or wanted_version != current["metadata"]["resourceVersion"]
+        ):
+            if current is None:
+                return _status(404, "NotFound", f'{plural} "{name}" not found')
+            return _status(409, "Conflict", "the object has been modified")
+        content_type = request.headers.get("Content-Type", "")
+        if verb == "update" or "apply-patch" in content_type or current is None:
+            if verb == "update" and current is None:
+                return _status(404, "NotFound", f'{plural} "{name}" not found')
+            obj = self._new_object(body, group_version, plural, namespace, name)
+            if current is not None:
+                # Server side fields survive the apply
+                for field in ("uid", "creationTimestamp", "generation"):
+                    obj["metadata"][field] = current["metadata"].get(field)
+                obj["metadata"]["generation"] = (
+                    current["metadata"].get("generation") or 0
+                ) + 1
+                if "status" in current and "status" not in obj:
+                    obj["status"] = current["status"]
+        else:
+            obj = _merge(json.loads(json.dumps(current)), body)
+            obj["metadata"]["generation"] = (
+                current["metadata"].get("generation") or 0
+            ) + 1
+        obj["metadata"].pop("resourceVersion", None)
+        event_type = "ADDED" if current is None else "MODIFIED"
+        obj = await cluster.put(key, obj, event_type)
+        return web.json_response(obj, status=201 if current is None else 200)
+
+    async def _watch(self, request, cluster, group_version, plural, namespace):
+        since = int(request.query.get("resourceVersion") or cluster.resource_version)
+        timeout = float(request.query.get("timeoutSeconds") or 60)
+        deadline = time.monotonic() + timeout
+
+        response = web.StreamResponse()
+        response.content_type = "application/json"
+        await response.prepare(request)
+
+        oldest = (
+            cluster.events[0][0] if cluster.events else cluster.resource_version + 1
+        )
+        if since + 1 < oldest and since < cluster.resource_version:
+            gone = {
+                "type": "ERROR",
+                "object": {
+                    "kind": "Status",
+                    "apiVersion": "v1",
+                    "status": "Failure",
+                    "reason": "Expired",
+                    "message": "too old resource version",
+                    "code": 410,
+                },
+            }
+            await response.write((json.dumps(gone) + "\n").encode())
+            return response
+
+        while True:
+            for version, event_type, (gv, p, ns, _), obj in list(cluster.events):
+                if version <= since:
+                    continue
+                since = version
+                if gv != group_version or p != plural:
+                    continue
+                if namespace is not None and ns != namespace:
+                    continue
+                event = {"type": event_type, "object": obj}
+                await response.write((json.dumps(event) + "\n").encode())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return response
+            async with cluster.changed:
+                try:
+                    await asyncio.wait_for(cluster.changed.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return response
+
+
+def write_kubeconfig(path: str, clusters: list[str], host: str, port: int):
+    """
+    Writes a kubeconfig with one context per fake cluster (context name = cluster name),
+    the first cluster being the current context (the management cluster).
+    """
+    kubeconfig = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [
+            {
+                "name": name,
+                "cluster": {"server": f"http://{host}:{port}/clusters/{name}"},
+            }
+            for name in clusters
+        ],
+        "users": [{"name": "fake", "user": {"token": "fake"}}],
+        "contexts": [
+            {"name": name, "context": {"cluster": name, "user": "fake"}}
+            for name in clusters
+        ],
+        "current-context": clusters[0],
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump(kubeconfig, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--clusters",
+        default="kind-management-cluster,kind-workload-1,kind-workload-2",
+        help="comma separated names, the first one is the management cluster",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18443)
+    parser.add_argument("--kubeconfig", default="fake-kubeconfig")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--conflict-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log", default=None, help="request log file (json lines)")
+    args = parser.parse_args()
+
+    clusters = [name for name in args.clusters.split(",") if name]
+    server = FakeApiServer(
+        clusters,
+        faults={
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "conflict_rate": args.conflict_rate,
+        },
+        seed=args.seed,
+        log_file=args.log,
+    )
+    write_kubeconfig(args.kubeconfig, clusters, args.host, args.port)
+    print(f"kubeconfig written to {args.kubeconfig} (current context: {clusters[0]})")
+    web.run_app(server.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
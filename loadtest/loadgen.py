@@ -0,0 +1,427 @@
+"""
+Load generator of the backend: synthesizes N applications x M components shaped like
+example/app.yaml and example/comp-*.yaml, and drives the /api/v1/apps and /api/v1/comps
+endpoints with them.
+    - setup: creates the applications, then their components.
+    - steady: for --duration seconds, a mix of deployment updates (image / env change),
+      expose changes (a port flag or cluster port toggled) and unchanged re-applies, either
+      at a target --rate (requests/s, open loop) or with --concurrency workers (closed loop).
+    - teardown: deletes the components and the applications (unless --keep).
+Reports the throughput, p50/p95/p99 latency and the errors (by status) of each route,
+per phase, and optionally writes them as json (--json).
+create_comp reads the Application object of the management cluster: --register creates
+them first with the kubeconfig (KUBECONFIG, current context), e.g. against
+loadtest.fake_apiserver.
+Run from the repository root:
+    python -m loadtest.loadgen --apps 20 --comps 5 --rate 50 --duration 60 --register
+"""
+
+from collections import defaultdict
+import argparse
+import asyncio
+import aiohttp
+import random
+import glob
+import json
+import copy
+import time
+import yaml
+import os
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "update=6,expose=3,reapply=1"
+
+
+# ---------------------------------- Synthetic objects ---------------------------------- #
+def load_templates(example_dir: str) -> tuple[dict, list]:
+    with open(os.path.join(example_dir, "app.yaml")) as f:
+        app = yaml.safe_load(f)
+    comps = []
+    for path in sorted(glob.glob(os.path.join(example_dir, "comp-*.yaml"))):
+        with open(path) as f:
+            comps.append(yaml.safe_load(f))
+    return app, comps
+
+
+class Workload:
+    """
+    The applications and components of the run, and the current spec of each component
+    (updated once a change is accepted, so that old / new of the expose changes match
+    what the backend applied).
+    """
+
+    def __init__(self, app_template: dict, comp_templates: list, args):
+        self.app_template = app_template
+        self.apps = []
+        self.comps = []
+        self.locks = {}
+        clusters = args.clusters.split(",")
+        for i in range(args.apps):
+            app_name = f"{args.prefix}-{i:04d}"
+            app_cluster = clusters[i % len(clusters)]
+            components = []
+            for j in range(args.comps):
+                template = comp_templates[j % len(comp_templates)]["spec"]
+                comp = copy.deepcopy(template)
+                comp["name"] = f"{template['name']}-{j}"
+                comp["application"] = app_name
+                components.append(
+                    {"name": comp["name"], "cluster": clusters[(i + j) % len(clusters)]}
+                )
+                self.comps.append(comp)
+                self.locks[(app_name, comp["name"])] = asyncio.Lock()
+            spec = copy.deepcopy(app_template["spec"])
+            spec.update(name=app_name, cluster=app_cluster, components=components)
+            self.apps.append(spec)
+
+    def application_object(self, spec: dict) -> dict:
+        # The Application custom object read by the backend (see --register)
+        body = copy.deepcopy(self.app_template)
+        body["metadata"] = {"name": spec["name"], "namespace": "default"}
+        body["spec"] = spec
+        return body
+
+
+# ---------------------------------- Recording ---------------------------------- #
+def percentile(samples: list, p: float) -> float | None:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, round(p * len(samples)) - 1))]
+
+
+class Recorder:
+    """
+    Latencies and statuses of the requests, by (phase, route template).
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.durations = {}
+
+    def record(self, phase: str, route: str, latency: float, status: str):
+        self.latencies[(phase, route)].append(latency)
+        self.statuses[(phase, route)][status] += 1
+
+    def report(self) -> dict:
+        report = {}
+        for (phase, route), latencies in self.latencies.items():
+            statuses = self.statuses[(phase, route)]
+            errors = {
+                status: count
+                for status, count in statuses.items()
+                if not status.startswith("2")
+            }
+            duration = self.durations.get(phase) or 0
+            report.setdefault(phase, {"duration": duration, "routes": {}})
+            report[phase]["routes"][route] = {
+                "requests": len(latencies),
+                "throughput": len(latencies) / duration if duration else None,
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                "max": max(latencies),
+                "errors": sum(errors.values()),
+                "statuses": dict(statuses),
+            }
+        return report
+
+
+def print_report(report: dict):
+    for phase, result in report.items():
+        print(f"\n{phase} ({result['duration']:.1f}s)")
+        print(
+            f"  {'route':<40}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'errors':>8}"
+        )
+        for route, stats in sorted(result["routes"].items()):
+            print(
+                f"  {route:<40}{stats['requests']:>9}{stats['throughput'] or 0:>8.1f}"
+                f"{stats['p50'] * 1000:>9.1f}{stats['p95'] * 1000:>9.1f}"
+                f"{stats['p99'] * 1000:>9.1f}{stats['errors']:>8}"
+            )
+            errors = {
+                status: count
+                for status, count in stats["statuses"].items()
+                if not status.startswith("2")
+            }
+            if errors:
+                breakdown = ", ".join(f"{s}: {c}" for s, c in sorted(errors.items()))
+                print(f"  {'':<40}{breakdown}")
+
+
+# ---------------------------------- Load ---------------------------------- #
+class LoadGenerator:
+    def __init__(self, args, workload: Workload):
+        self.args = args
+        self.workload = workload
+        self.recorder = Recorder()
+        self.random = random.Random(args.seed)
+        self.mix = parse_mix(args.mix)
+        self.session = None
+        # Only measures the acceptance of the operations (202), see --respond-async
+        self.headers = {"Prefer": "respond-async"} if args.respond_async else {}
+
+    async def call(self, phase: str, method: str, route: str, path: str, body) -> bool:
+        start = time.perf_counter()
+        try:
+            async with self.session.request(
+                method, f"{self.args.url}{path}", json=body, headers=self.headers
+            ) as response:
+                await response.read()
+                status = str(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        self.recorder.record(phase, route, time.perf_counter() - start, status)
+        return status.startswith("2")
+
+    async def run_all(self, phase: str, calls: list):
+        # Runs the calls of the setup / teardown with --concurrency at most in flight
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def bounded(call):
+            async with semaphore:
+                await call()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(call) for call in calls))
+        durations = self.recorder.durations
+        durations[phase] = durations.get(phase, 0) + time.perf_counter() - start
+
+    # ---------------- operations ---------------- #
+    def create_app(self, spec: dict):
+        return lambda: self.call("setup", "POST", "POST /apps", "/apps", spec)
+
+    def delete_app(self, spec: dict):
+        path = f"/apps/{spec['name']}"
+        return lambda: self.call(
+            "teardown", "DELETE", "DELETE /apps/{app_name}", path, spec
+        )
+
+    def create_comp(self, spec: dict):
+        return lambda: self.call("setup", "POST", "POST /comps", "/comps", spec)
+
+    def delete_comp(self, spec: dict):
+        path = f"/comps/{spec['name']}"
+        return lambda: self.call(
+            "teardown", "DELETE", "DELETE /comps/{comp_name}", path, spec
+        )
+
+    async def steady_operation(self):
+        comp = self.random.choice(self.workload.comps)
+        operation = self.random.choices(
+            list(self.mix), weights=list(self.mix.values())
+        )[0]
+        lock = self.workload.locks[(comp["application"], comp["name"])]
+        async with lock:
+            path = f"/comps/{comp['name']}"
+            if operation == "expose" and comp.get("expose"):
+                old = comp["expose"]
+                new = copy.deepcopy(old)
+                port = self.random.choice(new)
+                if self.random.random() < 0.5:
+                    port["is-exposing-metrics"] = not port.get("is-exposing-metrics")
+                else:
+                    port["clusterPort"] = port["clusterPort"] ^ 1
+                spec = {**comp, "expose": new}
+                accepted = await self.call(
+                    "steady",
+                    "PUT",
+                    "PUT /comps/{comp_name}/expose",
+                    f"{path}/expose",
+                    {"spec": spec, "old": old, "new": new},
+                )
+            else:
+                spec = comp
+                if operation == "update":
+                    # Alternates an env variable, so that the deployment really changes
+                    spec = copy.deepcopy(comp)
+                    variables = spec.setdefault("env", {}).setdefault("variables", [])
+                    variables[:] = [v for v in variables if v["name"] != "LOADGEN_REV"]
+                    variables.append(
+                        {
+                            "name": "LOADGEN_REV",
+                            "value": str(self.random.randrange(10**6)),
+                        }
+                    )
+                accepted = await self.call(
+                    "steady",
+                    "PUT",
+                    "PUT /comps/{comp_name}/deployment",
+                    f"{path}/deployment",
+                    spec,
+                )
+            if accepted and spec is not comp:
+                comp.clear()
+                comp.update(spec)
+
+    async def steady_closed_loop(self, deadline: float):
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.steady_operation()
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def steady_open_loop(self, deadline: float):
+        # Requests are started on schedule whatever the latency; at most --concurrency
+        # are in flight, the ones that can't start on time are counted as late.
+        interval = 1 / self.args.rate
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        tasks = set()
+        late = 0
+        next_start = time.perf_counter()
+        while next_start < deadline:
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if semaphore.locked():
+                late += 1
+            await semaphore.acquire()
+            task = asyncio.create_task(self.steady_operation())
+            task.add_done_callback(lambda _: semaphore.release())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_start += interval
+        await asyncio.gather(*tasks)
+        return late
+
+    # ---------------- run ---------------- #
+    async def run(self) -> dict:
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=self.args.concurrency)
+        async with aiohttp.ClientSession(
+            timeout=timeout, connector=connector
+        ) as session:
+            self.session = session
+            workload = self.workload
+            await self.run_all("setup", [self.create_app(s) for s in workload.apps])
+            await self.run_all("setup", [self.create_comp(s) for s in workload.comps])
+
+            late = None
+            if self.args.duration > 0:
+                start = time.perf_counter()
+                deadline = start + self.args.duration
+                if self.args.rate:
+                    late = await self.steady_open_loop(deadline)
+                else:
+                    await self.steady_closed_loop(deadline)
+                self.recorder.durations["steady"] = time.perf_counter() - start
+
+            if not self.args.keep:
+                await self.run_all(
+                    "teardown", [self.delete_comp(s) for s in workload.comps]
+                )
+                await self.run_all(
+                    "teardown", [self.delete_app(s) for s in workload.apps]
+                )
+
+        report = self.recorder.report()
+        if late is not None and "steady" in report:
+            report["steady"]["late"] = late
+        return report
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("update", "expose", "reapply"):
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ---------------------------------- Application objects ---------------------------------- #
+def register_apps(workload: Workload, delete: bool = False):
+    """
+    Creates (or deletes) the Application objects in the management cluster, through the
+    kubeconfig, as kubectl apply -f app.yaml would.
+    """
+    from kubernetes import client, config
+    from kubernetes.client.rest import ApiException
+
+    config.load_kube_config()
+    api = client.CustomObjectsApi()
+    group, version = workload.app_template["apiVersion"].split("/")
+    group = os.environ.get("CRD_GROUP", group)
+    version = os.environ.get("CRD_VERSION", version)
+    for spec in workload.apps:
+        try:
+            if delete:
+                api.delete_namespaced_custom_object(
+                    group, version, "default", "applications", spec["name"]
+                )
+            else:
+                api.create_namespaced_custom_object(
+                    group,
+                    version,
+                    "default",
+                    "applications",
+                    workload.application_object(spec),
+                )
+        except ApiException as e:
+            # Already there / already gone
+            if e.status not in (404, 409):
+                raise e
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--apps", type=int, default=10, help="number of applications")
+    parser.add_argument("--comps", type=int, default=3, help="components per app")
+    parser.add_argument(
+        "--clusters",
+        default="kind-workload-1,kind-workload-2",
+        help="workload clusters the apps and components are spread on",
+    )
+    parser.add_argument("--prefix", default="load", help="prefix of the app names")
+    parser.add_argument("--examples", default=os.path.join(ROOT, "example"))
+    parser.add_argument("--duration", type=float, default=30, help="steady phase (s)")
+    parser.add_argument(
+        "--rate", type=float, default=None, help="steady requests/s (open loop)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=10, help="requests in flight at most"
+    )
+    parser.add_argument(
+        "--mix", default=DEFAULT_MIX, help=f"operation weights ({DEFAULT_MIX})"
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="per request (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--register", action="store_true", help="create the Application objects"
+    )
+    parser.add_argument("--keep", action="store_true", help="skip the teardown")
+    parser.add_argument(
+        "--respond-async",
+        action="store_true",
+        help="ask for 202 + operation id (Prefer: respond-async)",
+    )
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    app_template, comp_templates = load_templates(args.examples)
+    workload = Workload(app_template, comp_templates, args)
+    if args.register:
+        register_apps(workload)
+
+    report = asyncio.run(LoadGenerator(args, workload).run())
+    if args.register and not args.keep:
+        register_apps(workload, delete=True)
+
+    print_report(report)
+    if "late" in report.get("steady", {}):
+        print(f"\nsteady: {report['steady']['late']} requests started late")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "report": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
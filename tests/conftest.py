@@ -0,0 +1,6 @@
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules of be read their settings when imported
+os.environ.setdefault("TEMPLATE_DIR", os.path.join(ROOT, "templates"))
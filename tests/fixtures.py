@@ -0,0 +1,113 @@
+"""
+Inputs shared by the tests and the benchmarks (python -m benchmarks.*).
+"""
+
+import random
+
+from common.helpers import PORT_FLAGS
+
+
+CLUSTERS = ["kind-workload-1", "kind-workload-2", "kind-workload-3"]
+
+
+# ---------------------------------- Random inputs ---------------------------------- #
+def random_components(rng: random.Random, count: int) -> list:
+    components = [
+        {"name": f"comp-{rng.randrange(count * 2)}", "cluster": rng.choice(CLUSTERS)}
+        for _ in range(count)
+    ]
+    for component in components:
+        if rng.random() < 0.1:
+            component["extra"] = {"labels": [rng.randrange(3)]}
+    return components
+
+
+def mutate_components(rng: random.Random, components: list) -> list:
+    new = [dict(component) for component in components if rng.random() > 0.2]
+    for component in new:
+        if rng.random() < 0.2:
+            component["cluster"] = rng.choice(CLUSTERS)
+    new += random_components(rng, rng.randrange(3))
+    rng.shuffle(new)
+    return new
+
+
+def random_ports(rng: random.Random, count: int) -> list:
+    return [
+        {
+            "containerPort": port,
+            "clusterPort": rng.choice([9000, 9001]),
+            **{flag: rng.random() < 0.5 for flag in PORT_FLAGS},
+        }
+        for port in rng.sample(range(8000, 8020), count)
+    ]
+
+
+def mutate_ports(rng: random.Random, ports: list) -> list:
+    new = [dict(port) for port in ports if rng.random() > 0.2]
+    for port in new:
+        if rng.random() < 0.3:
+            field = rng.choice(PORT_FLAGS + ("clusterPort",))
+            port[field] = (not port[field]) if field in PORT_FLAGS else 9002
+    new += random_ports(rng, rng.randrange(2))
+    rng.shuffle(new)
+    # containerPort is the key of the ports
+    return list({port["containerPort"]: port for port in new}.values())
+
+
+# ---------------------------------- Manifests ---------------------------------- #
+def ports(count: int) -> list:
+    return [
+        {
+            "is-public": i == 0,
+            "is-peered": True,
+            "is-exposing-metrics": i % 2 == 0,
+            "containerPort": 8000 + i,
+            "clusterPort": 9000 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def component(ports_count: int, **fields) -> dict:
+    spec = {
+        "name": "nginx-component",
+        "application": "test-app",
+        "image": "nginx:latest",
+        "expose": ports(ports_count),
+        "env": {
+            "variables": [
+                {"name": "MODE", "value": "production"},
+                {"name": "WORKERS", "value": "4"},
+                {"name": "DEBUG", "value": "false"},
+                {"name": "RATIO", "value": "1.5"},
+                {"name": "EMPTY", "value": "null"},
+            ]
+        },
+        "cluster-selector": CLUSTERS[0],
+    }
+    spec.update(fields)
+    return spec
+
+
+def hosts(count: int) -> list:
+    return [{"component_name": f"comp-{i}", "port": 8000 + i} for i in range(count)]
+
+
+# ---------------------------------- Former functions ---------------------------------- #
+def legacy_get_changes(old, new):
+    # The former list membership version (O(n²))
+    if old is None:
+        return new, [], []
+    if new is None:
+        return [], old, []
+    added_components = [obj for obj in new if obj not in old]
+    removed_components = [obj for obj in old if obj not in new]
+    old_dict = {obj["name"]: obj["cluster"] for obj in old}
+    new_dict = {obj["name"]: obj["cluster"] for obj in new}
+    migrated_components = [
+        {"name": name, "old_cluster": old_dict[name], "new_cluster": new_dict[name]}
+        for name in set(old_dict) & set(new_dict)
+        if old_dict[name] != new_dict[name]
+    ]
+    return added_components, removed_components, migrated_components
@@ -0,0 +1,187 @@
+"""
+Property tests of the diff functions of common/helpers.py, on seeded random inputs.
+"""
+
+import copy
+import random
+
+import pytest
+
+from common.helpers import (
+    DEPLOYMENT_FIELDS,
+    PORT_FLAGS,
+    diff_component,
+    diff_ports,
+    get_changes,
+    port_flag_changed,
+)
+from be.utils.manifests import build_deployment
+from tests.fixtures import (
+    CLUSTERS,
+    legacy_get_changes,
+    mutate_components,
+    mutate_ports,
+    random_components,
+    random_ports,
+)
+
+
+SEEDS = range(20)
+CASES = 50
+
+
+# Random value of each optional field of a Component spec
+OPTIONAL_FIELDS = {
+    "env": lambda rng: {
+        "variables": [
+            {"name": f"VAR_{i}", "value": rng.choice(["a", "1", "true"])}
+            for i in range(rng.randrange(3))
+        ]
+    },
+    "cluster-selector": lambda rng: rng.choice(CLUSTERS),
+    "replicas": lambda rng: rng.randrange(1, 4),
+    "tls": lambda rng: rng.random() < 0.5,
+}
+IMAGES = ["nginx:latest", "nginx:1.21.5", "busybox"]
+
+
+def _component(rng: random.Random) -> dict:
+    component = {
+        "name": "nginx-component",
+        "application": "test-app",
+        "image": rng.choice(IMAGES),
+        "expose": random_ports(rng, rng.randrange(4)),
+    }
+    for field, value in OPTIONAL_FIELDS.items():
+        if rng.random() < 0.5:
+            component[field] = value(rng)
+    return component
+
+
+def _mutate_component(rng: random.Random, component: dict) -> dict:
+    # name and application are immutable
+    new = copy.deepcopy(component)
+    for _ in range(rng.randrange(3)):
+        field = rng.choice(["image", "expose"] + list(OPTIONAL_FIELDS))
+        if field == "image":
+            new["image"] = rng.choice(IMAGES)
+        elif field == "expose":
+            new["expose"] = mutate_ports(rng, new["expose"])
+        elif field in new and rng.random() < 0.3:
+            del new[field]
+        else:
+            new[field] = OPTIONAL_FIELDS[field](rng)
+    return new
+
+
+def _flagged(ports: list, flag: str) -> set:
+    return {(p["containerPort"], p["clusterPort"]) for p in ports if p[flag]}
+
+
+def _deployment(component: dict) -> dict:
+    # The order of the container ports doesn't matter to kubernetes
+    deployment = build_deployment(component)
+    container = deployment["spec"]["template"]["spec"]["containers"][0]
+    if "ports" in container:
+        container["ports"].sort(key=lambda port: port["containerPort"])
+    return deployment
+
+
+# ---------------------------------- get_changes ---------------------------------- #
+@pytest.mark.parametrize("seed", SEEDS)
+def test_get_changes_matches_list_membership(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        old = random_components(rng, rng.randrange(8))
+        new = mutate_components(rng, old)
+        for args in [(old, new), (None, new), (old, None)]:
+            added, removed, migrated = get_changes(*args)
+            expected_added, expected_removed, expected_migrated = (
+                legacy_get_changes(*args)
+            )
+            assert added == expected_added
+            assert removed == expected_removed
+            key = lambda change: change["name"]
+            assert sorted(migrated, key=key) == sorted(expected_migrated, key=key)
+
+
+# ---------------------------------- Ports ---------------------------------- #
+@pytest.mark.parametrize("seed", SEEDS)
+def test_port_flag_changed_iff_flagged_ports_changed(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        old = random_ports(rng, rng.randrange(5))
+        new = mutate_ports(rng, old)
+        ports_diff = diff_ports(old, new)
+        for flag in PORT_FLAGS:
+            expected = _flagged(old, flag) != _flagged(new, flag)
+            assert port_flag_changed(ports_diff, flag) == expected, (flag, old, new)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_diff_ports_ignores_order(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        ports = random_ports(rng, rng.randrange(5))
+        shuffled = [dict(port) for port in ports]
+        rng.shuffle(shuffled)
+        assert diff_ports(ports, shuffled) == ([], [], [])
+
+
+# ---------------------------------- diff_component ---------------------------------- #
+@pytest.mark.parametrize("seed", SEEDS)
+def test_diff_component_of_equal_specs_is_empty(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        component = _component(rng)
+        same = copy.deepcopy(component)
+        rng.shuffle(same["expose"])
+        assert diff_component(component, same) == set()
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_diff_component_is_symmetric(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        old = _component(rng)
+        new = _mutate_component(rng, old)
+        assert diff_component(old, new) == diff_component(new, old)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_diff_component_reports_the_changed_field(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        old = _component(rng)
+        new = copy.deepcopy(old)
+        new["image"] = old["image"] + "-next"
+        assert diff_component(old, new) == {"image"}
+
+        new = copy.deepcopy(old)
+        new["cluster-selector"] = "kind-workload-4"
+        assert diff_component(old, new) == {"cluster"}
+
+        if old["expose"]:
+            new = copy.deepcopy(old)
+            new["expose"][0]["clusterPort"] = 9100
+            assert diff_component(old, new) == {"clusterPort"}
+
+        new = copy.deepcopy(old)
+        new["expose"].append(
+            {"containerPort": 7000, "clusterPort": 9000, "is-public": True}
+        )
+        assert diff_component(old, new) == {"ports", "is-public"}
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_deployment_fields_cover_the_deployment(seed):
+    # update_comp_handler_deployment skips the backend when no DEPLOYMENT_FIELDS changed:
+    # the deployment built from the new spec must then be the same
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        old = _component(rng)
+        new = _mutate_component(rng, old)
+        if not diff_component(old, new) & DEPLOYMENT_FIELDS:
+            assert _deployment(old) == _deployment(new), (old, new)
+        if _deployment(old) != _deployment(new):
+            assert diff_component(old, new) & DEPLOYMENT_FIELDS, (old, new)
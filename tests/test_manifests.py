@@ -0,0 +1,60 @@
+"""
+Conformance of the manifest builders of be/utils/manifests.py with the Jinja templates:
+each build_* must produce what the matching render_* produces from templates/*.yaml.
+"""
+
+import os
+
+import pytest
+
+from be.utils import manifests
+from be.utils.templates import TEMPLATE_DIR
+from tests.fixtures import component, hosts, ports
+
+
+# template file -> (builder, renderer)
+PAIRS = {
+    "deployment_template.yaml": (
+        manifests.build_deployment,
+        manifests.render_deployment,
+    ),
+    "service_template.yaml": (manifests.build_service, manifests.render_service),
+    "ServiceMonitor_template.yaml": (
+        manifests.build_servicemonitor,
+        manifests.render_servicemonitor,
+    ),
+    "ingress_template.yaml": (manifests.build_ingress, manifests.render_ingress),
+}
+
+
+# (template file, args)
+CASES = [
+    ("deployment_template.yaml", (component(3),)),
+    ("deployment_template.yaml", (component(1, env={}),)),
+    ("deployment_template.yaml", (component(0, env={"variables": []}),)),
+    ("deployment_template.yaml", (component(2, **{"cluster-selector": ""}),)),
+    ("deployment_template.yaml", (component(1, name="1234", image="nginx:1.21"),)),
+    (
+        "deployment_template.yaml",
+        ({"name": "minimal", "application": "test-app", "image": "busybox"},),
+    ),
+    ("service_template.yaml", ("nginx-component", "test-app", ports(3))),
+    ("service_template.yaml", ("nginx-component", "test-app", [])),
+    ("service_template.yaml", ("123", "test-app", ports(1))),
+    ("ServiceMonitor_template.yaml", ("test-app", "nginx-component", ports(3))),
+    ("ServiceMonitor_template.yaml", ("test-app", "nginx-component", [])),
+    ("ingress_template.yaml", ("test-app", hosts(3))),
+    ("ingress_template.yaml", ("test-app", [])),
+]
+
+
+def test_every_template_has_a_builder():
+    templates = {name for name in os.listdir(TEMPLATE_DIR) if name.endswith(".yaml")}
+    assert templates == set(PAIRS)
+    assert templates == {template for template, _ in CASES}
+
+
+@pytest.mark.parametrize("template, args", CASES)
+def test_builder_matches_template(template, args):
+    builder, renderer = PAIRS[template]
+    assert builder(*args) == renderer(*args)